@@ -24,6 +24,13 @@ def get_parser():
     parser.add_argument("--verbose", type=str2bool, default=True)
     parser.add_argument("--seed", type=int, default=0)
     parser.add_argument("--num_procs", type=int, default=4)
+    # BLAS/OpenMP threads of each worker process, and whether to pin the
+    # workers to their own cores (see tabriskscore.core.resources).
+    parser.add_argument("--threads_per_proc", type=int, default=1)
+    parser.add_argument("--pin_cpus", type=str2bool, default=False)
+    # Native threads of the C QBS for each batch of queries (the answers do not
+    # depend on it).
+    parser.add_argument("--qbs_threads", type=int, default=1)
     # Path for the dataset.
     parser.add_argument("--dataset_path", type=str, default="datasets/adults")
     parser.add_argument("--dataset_name", type=str, default="adults")
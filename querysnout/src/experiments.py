@@ -1,5 +1,4 @@
 import copy
-import multiprocessing
 import os
 import pickle
 import time
@@ -12,7 +11,8 @@ from sklearn.preprocessing import StandardScaler
 from src.dataset_loader import DatasetLoader
 from src.dataset_sampler import TargetDatasetSampler, init_dataset_sampler
 from src.helpers.generation_logger import GenerationLogger
-from src.helpers.utils import get_indexes_unique, init_qbs
+from src.helpers.utils import (get_indexes_unique, init_qbs, resource_policy,
+                               worker_pool)
 from src.qbs_environment import QBSEnvironment
 from src.query_search import (EvolutionaryQuerySearch, MutationProbabilities,
                               RandomQuerySearch)
@@ -33,6 +33,7 @@ def search(environment, save_path, args):
             mutation_probs,
             args.model_type,
             args.num_procs,
+            resource_policy(args),
         )
     else:
         query_search = RandomQuerySearch(
@@ -42,6 +43,7 @@ def search(environment, save_path, args):
             args.num_queries,
             args.model_type,
             args.num_procs,
+            resource_policy(args),
         )
 
     print("Initialising the population...")
@@ -86,6 +88,7 @@ def init_environment(dataset_sampler, args, qbs_seeds_to_exclude):
         verbose=args.verbose,
         num_procs=args.num_procs,
         qbs_seeds_to_exclude=qbs_seeds_to_exclude,
+        qbs_threads=args.qbs_threads,
     )
     return environment
 
@@ -449,7 +452,7 @@ def main_experiment(save_dir, args):
                     seed,
                 )
             )
-        with multiprocessing.Pool(args.num_procs) as pool:
+        with worker_pool(args.num_procs, resource_policy(args)) as pool:
             results_batch = pool.starmap(load_or_generate_results, args_list)
         for ti, results_tar_user in enumerate(results_batch):
             print(f"Results for the target user {ti_start+ti}")
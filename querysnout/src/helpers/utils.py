@@ -1,7 +1,9 @@
+import multiprocessing
 from collections import Counter
 
 import numpy as np
 from scipy.stats import bernoulli
+from tabriskscore.core.resources import ResourcePolicy
 
 from ..optimized_qbs.qbs import Diffix, DPLaplace, SimpleQBS, TableBuilder
 
@@ -19,27 +21,52 @@ def get_indexes_unique(dataset, skip_last_col=False):
     return unique_idxs
 
 
-def init_qbs(dataset, qbs_type, threshold, noise_scale, epsilon, seed):
-    # The QBS expects this format.
-    tupled_dataset = [tuple(x) for x in dataset]
+def init_qbs(dataset, qbs_type, threshold, noise_scale, epsilon, seed, bitmap_index=64):
+    # The QBS copies the records from a C-contiguous array of C ints.
+    int_dataset = np.ascontiguousarray(dataset, dtype=np.intc)
+    # Attributes with at most `bitmap_index` values are indexed with bitsets,
+    # which speeds up the queries without changing the answers (0 disables it).
     if qbs_type == "diffix":
-        qbs = Diffix(tupled_dataset, seed=seed)
+        qbs = Diffix(int_dataset, seed=seed, bitmap_index=bitmap_index)
     elif qbs_type == "simple":
         qbs = SimpleQBS(
-            tupled_dataset,
+            int_dataset,
             bucket_threshold=threshold,
             noise_scale=noise_scale,
             seed=seed,
+            bitmap_index=bitmap_index,
         )
     elif qbs_type == "table-builder":
-        qbs = TableBuilder(tupled_dataset, seed=seed)
+        qbs = TableBuilder(int_dataset, seed=seed, bitmap_index=bitmap_index)
     elif qbs_type == "dp-laplace":
-        qbs = DPLaplace(tupled_dataset, epsilon, seed=seed)
+        qbs = DPLaplace(int_dataset, epsilon, seed=seed, bitmap_index=bitmap_index)
     else:
         raise ValueError("Invalid value for the `qbs_type` parameter.")
     return qbs
 
 
+def resource_policy(args):
+    """
+    Resource policy of the worker pools of an experiment: `args.threads_per_proc`
+    BLAS/OpenMP threads per worker, pinned to their own cores if `args.pin_cpus`.
+    """
+    return ResourcePolicy(
+        threads_per_worker=args.threads_per_proc, pin_cpus=args.pin_cpus
+    )
+
+
+def worker_pool(num_procs, resources=None):
+    """
+    Returns a `multiprocessing.Pool` of `num_procs` processes, which apply the
+    `resources` policy (thread caps and CPU pinning, see `ResourcePolicy`).
+    Each worker is capped to one BLAS/OpenMP thread by default, since every
+    worker otherwise starts as many threads as there are cores.
+    """
+    if resources is None:
+        resources = ResourcePolicy()
+    return multiprocessing.Pool(num_procs, **resources.pool_kwargs())
+
+
 def add_occurrences_to_list(l):
     """
     Given a list `l` of objects (that can be hashed), returns the list of
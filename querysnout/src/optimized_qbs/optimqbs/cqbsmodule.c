@@ -5,54 +5,15 @@
 
 
 
-// Create a new QBS object with a data array.
-static PyObject *cqbs_new_instance(PyObject *self, PyObject *args){
-	// The list of tuples (data) to be extracted.
-	PyObject *DataList;
-	// Dictionary containing the Query-Based System's arguments.
-	PyObject *QBSArguments;
-	// Perform and parse the query.
-	if (!PyArg_ParseTuple(args, "O!O!", &PyList_Type, &DataList, &PyDict_Type, &QBSArguments)) {
-		PyErr_SetString(PyExc_TypeError, "Data must be a list of tuples. Second argument must be the seed.");
-		return NULL;
-	}
-	// It's a list! Get it's length = data size.
-	int n_data = PyList_Size(DataList);
-	// Get the number of records from the first element.
-	PyObject *element = PyList_GetItem(DataList, 0);
-	if(!PyTuple_Check(element)){
-		PyErr_SetString(PyExc_TypeError, "Data elements must be tuples.");
-		return NULL;
-	}
-	// Get the number of features from the tuple.
-	int n_features = PyTuple_Size(element);
-	// Create the QBS instance with (n_data, n_features);
-	Dataset *dataset = makeDataset(n_features, n_data);
-	// Populate the QBS instance with the data.
-	PyObject *data_entry;
-	for(int i=0; i<n_data; i++){
-		element = PyList_GetItem(DataList, i);
-		if(!PyTuple_Check(element)){
-			PyErr_SetString(PyExc_TypeError, "Data elements must be tuples.");
-			freeDataset(dataset);
-			return NULL;
-		}
-		if(PyTuple_Size(element) != n_features){
-			PyErr_SetString(PyExc_IndexError, "Data elements must all be of same size.");
-			freeDataset(dataset);
-			return NULL;
-		}
-		for(int j=0; j<n_features; j++){
-			data_entry = PyTuple_GetItem(element, j);
-			dataset->data[i*n_features + j] = (int) PyLong_AsLong(data_entry);
-		}
-	}
+// Create the QBS instance described by the arguments dictionary on a dataset.
+// On error, the dataset is freed and NULL is returned with a Python exception set.
+static QBSInstance *instance_from_arguments(Dataset *dataset, PyObject *QBSArguments){
 	// Read the parameters from the dictionary.
 	// Parse the type of the Query-Based System.
 	PyObject *py_QBS_type = PyDict_GetItemString(QBSArguments, "type");
 	QBS_TYPE qbs_type;
 	if(!py_QBS_type){
-		PyErr_SetString(PyExc_ValueError, "Data elements must all be of same size.");
+		PyErr_SetString(PyExc_ValueError, "The QBS arguments must contain a type.");
 		freeDataset(dataset);
 		return NULL;
 	} else {
@@ -156,14 +117,287 @@ static PyObject *cqbs_new_instance(PyObject *self, PyObject *args){
 		instance = makeDPLaplace(dataset, epsilon, seed);
 	} else {
 		// Unknown QBS type: abort.
+		PyErr_SetString(PyExc_ValueError, "Unknown QBS type.");
 		freeDataset(dataset);
 		return NULL;
 	}
+	// Optionally, index the attributes with at most bitmap_index distinct values (for all QBS types).
+	PyObject *py_bitmap_index = PyDict_GetItemString(QBSArguments, "bitmap_index");
+	if(py_bitmap_index){
+		int max_values = (int) PyLong_AsLong(py_bitmap_index);
+#ifdef DEBUG
+		printf("Setting: bitmap_index=%d\n", max_values);
+#endif
+		if(max_values > 0){
+			buildBitmapIndex(dataset, max_values);
+		}
+	}
+	return instance;
+}
+
+
+// Get a C-contiguous buffer with ndim dimensions from a Python object (e.g. a NumPy array),
+//  of C ints (kind 'i') or doubles (kind 'd'). The buffer is borrowed: no data is copied.
+// Returns -1 with a Python exception set if the object does not provide such a buffer.
+static int get_buffer(PyObject *obj, Py_buffer *view, int ndim, char kind, int writable){
+	int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT;
+	if(writable){
+		flags |= PyBUF_WRITABLE;
+	}
+	if(PyObject_GetBuffer(obj, view, flags) < 0){
+		return -1;
+	}
+	// Native byte order only: skip the optional prefix ('<' or '>' only if it is the native one).
+	const unsigned int one = 1;
+	const char native = (*(const char *) &one) ? '<' : '>';
+	const char *format = view->format ? view->format : "B";
+	if(*format == '@' || *format == '=' || *format == native){
+		format++;
+	}
+	int valid_format;
+	if(kind == 'd'){
+		valid_format = (format[0] == 'd') && (view->itemsize == sizeof(double));
+	} else {
+		valid_format = (format[0] == 'i' || (format[0] == 'l' && sizeof(long) == sizeof(int)))
+			&& (view->itemsize == sizeof(int));
+	}
+	if(!valid_format || format[1] != '\0' || view->ndim != ndim){
+		PyErr_Format(PyExc_TypeError, "Expected a C-contiguous %d-dimensional array of %s.",
+			ndim, kind == 'd' ? "float64" : "C int (int32)");
+		PyBuffer_Release(view);
+		return -1;
+	}
+	return 0;
+}
+
+
+// Create a new QBS object with a data array.
+static PyObject *cqbs_new_instance(PyObject *self, PyObject *args){
+	// The list of tuples (data) to be extracted.
+	PyObject *DataList;
+	// Dictionary containing the Query-Based System's arguments.
+	PyObject *QBSArguments;
+	// Perform and parse the query.
+	if (!PyArg_ParseTuple(args, "O!O!", &PyList_Type, &DataList, &PyDict_Type, &QBSArguments)) {
+		PyErr_SetString(PyExc_TypeError, "Data must be a list of tuples. Second argument must be the seed.");
+		return NULL;
+	}
+	// It's a list! Get it's length = data size.
+	int n_data = PyList_Size(DataList);
+	// Get the number of records from the first element.
+	PyObject *element = PyList_GetItem(DataList, 0);
+	if(!PyTuple_Check(element)){
+		PyErr_SetString(PyExc_TypeError, "Data elements must be tuples.");
+		return NULL;
+	}
+	// Get the number of features from the tuple.
+	int n_features = PyTuple_Size(element);
+	// Create the QBS instance with (n_data, n_features);
+	Dataset *dataset = makeDataset(n_features, n_data);
+	// Populate the QBS instance with the data.
+	PyObject *data_entry;
+	for(int i=0; i<n_data; i++){
+		element = PyList_GetItem(DataList, i);
+		if(!PyTuple_Check(element)){
+			PyErr_SetString(PyExc_TypeError, "Data elements must be tuples.");
+			freeDataset(dataset);
+			return NULL;
+		}
+		if(PyTuple_Size(element) != n_features){
+			PyErr_SetString(PyExc_IndexError, "Data elements must all be of same size.");
+			freeDataset(dataset);
+			return NULL;
+		}
+		for(int j=0; j<n_features; j++){
+			data_entry = PyTuple_GetItem(element, j);
+			dataset->data[i*n_features + j] = (int) PyLong_AsLong(data_entry);
+		}
+	}
+	QBSInstance *instance = instance_from_arguments(dataset, QBSArguments);
+	if(!instance){
+		return NULL;
+	}
 	// Return the pointer to the QBS instance!
 	return PyLong_FromLong((long) instance);
 }
 
 
+// Create a new QBS object from a 2-dimensional buffer of C ints (n_data, n_attrs), e.g. a NumPy array.
+// The records are copied into the QBS with a single memcpy, instead of being read cell by cell.
+static PyObject *cqbs_new_instance_from_buffer(PyObject *self, PyObject *args){
+	PyObject *DataBuffer;
+	PyObject *QBSArguments;
+	if (!PyArg_ParseTuple(args, "OO!", &DataBuffer, &PyDict_Type, &QBSArguments)) {
+		return NULL;
+	}
+	Py_buffer view;
+	if(get_buffer(DataBuffer, &view, 2, 'i', 0) < 0){
+		return NULL;
+	}
+	if(view.shape[0] == 0 || view.shape[1] == 0){
+		PyErr_SetString(PyExc_ValueError, "The dataset must not be empty.");
+		PyBuffer_Release(&view);
+		return NULL;
+	}
+	Dataset *dataset = makeDataset((int) view.shape[1], (int) view.shape[0]);
+	memcpy(dataset->data, view.buf, view.len);
+	PyBuffer_Release(&view);
+	QBSInstance *instance = instance_from_arguments(dataset, QBSArguments);
+	if(!instance){
+		return NULL;
+	}
+	return PyLong_FromLong((long) instance);
+}
+
+
+
+// Perform n_queries queries (values and conditions are n_queries x n_attrs arrays) on the QBS,
+//  and write the answers in result. The budget fractions (one per query, may be NULL) are
+//  required by DP Laplace, and ignored by other QBS types.
+// Returns -1 with a Python exception set on error.
+static int run_queries(QBSInstance *instance, int n_queries, int *values, int *conditions,
+		double *budget_fractions, int *result){
+	if(budget_fractions){
+		for(int i=0; i<n_queries; i++){
+			if((budget_fractions[i] <= 0) || (budget_fractions[i] > 1)){
+				PyErr_SetString(PyExc_ValueError, "Budget fractions must be in (0, 1].");
+				return -1;
+			}
+		}
+	}
+	// The queries only use C memory: release the GIL while they run, so that other Python
+	//  threads (e.g., querying other QBS instances) can run at the same time.
+	if(instance->type == DPLAPLACE){
+		if(!budget_fractions){
+			PyErr_SetString(PyExc_ValueError, "Must have BudgetFractions as an argument for DP Laplace.");
+			return -1;
+		}
+		Py_BEGIN_ALLOW_THREADS
+		performQueriesWithBudget((DPLaplaceInstance*) instance->instance,
+			n_queries, values, conditions, budget_fractions, result);
+		Py_END_ALLOW_THREADS
+	} else {
+		if(budget_fractions){
+			fprintf(stderr, "[WARNING] BudgetFractions provided but not used by this QBS type.\n");
+		}
+		Py_BEGIN_ALLOW_THREADS
+		performQueries(instance, n_queries, values, conditions, result);
+		Py_END_ALLOW_THREADS
+	}
+	return 0;
+}
+
+
+// Perform structured queries: each of the n_conditions condition rules (n_conditions x n_attrs)
+//  is asked for each of the n_users users (ids of records in the QBS dataset), and the answers
+//  are written in result (n_users x n_conditions, each user's answers are consecutive).
+// The budget fractions (one per condition, may be NULL) are duplicated for each user.
+// Returns -1 with a Python exception set on error.
+static int run_structured_queries(QBSInstance *instance, int n_users, int *user_ids,
+		int n_conditions, int *condition_rules, double *condition_budgets, int *result){
+	Dataset *dataset = instance->data;
+	int n_queries = n_users * n_conditions;
+	int n_attrs = dataset->n_attrs;
+	for(int u=0; u<n_users; u++){
+		if((user_ids[u] < 0) || (user_ids[u] >= dataset->n_data)){
+			PyErr_SetString(PyExc_IndexError, "User ids must be rows of the QBS dataset.");
+			return -1;
+		}
+	}
+	// Fill in the array with the users data. It is then processed, with the condition rules,
+	//  to have the values and conditions arrays.
+	int *users_data = (int*) malloc(sizeof(int)*n_users*n_attrs);
+	for(int u=0; u<n_users; u++){
+		// Copy the memory from the data.
+		memcpy(&(users_data[n_attrs*u]), &(dataset->data[n_attrs*user_ids[u]]), sizeof(int)*n_attrs);
+		// Note that users_data currently contains the sensitive attribute. However, that attribute is
+		//  not known to the attacker. Hence, we interpret the semantics of the condition rules differently.
+		// We assume that +1 means "sensitive == 1", -1 means "sensitive == 0", 0 means "no condition".
+		// This can simply be enforced by setting the value of the sensitive attribute to 1 in the user data.
+		// This attribute is assumed to be _the last_.
+		users_data[n_attrs*u+n_attrs-1] = 1;
+	}
+	// Finally, *if* the budget fractions are not NULL, we create an array that stores the budget
+	//  of individual queries, after duplication (in the same order as below: each user's queries
+	//  are consecutive, hence the array is condition_budgets repeated n_users times).
+	double *budget_fractions = NULL;
+	if(condition_budgets){
+		budget_fractions = (double*) malloc(sizeof(double)*n_queries);  // n_users * n_conditions
+		for(int u=0; u<n_users; u++){
+			memcpy(&(budget_fractions[u*n_conditions]), condition_budgets, sizeof(double)*n_conditions);
+		}
+	}
+#ifdef DEBUG
+	fprintf(stderr, "RULES\n");
+	for(int i=0;i<n_conditions;i++){
+		for(int j=0;j<n_attrs;j++){
+			fprintf(stderr, "%d ", condition_rules[i*n_attrs+j]);
+		}
+		fprintf(stderr, "\n");
+	}
+#endif
+	// Now, we duplicate the memory from these users.
+	// The values of the users are duplicated n_conditions times, for each user (all data from
+	//  the same user is consecutive).
+	int *values = (int*) malloc(sizeof(int)*n_queries*n_attrs);
+	for(int i=0; i<n_users; i++){  // Each user's row.
+		for(int j=0; j<n_conditions; j++){  // Repetition of the same row.
+			memcpy(&(values[(i*n_conditions+j)*n_attrs]), &(users_data[n_attrs*i]), sizeof(int)*n_attrs);
+		}
+	}
+#ifdef DEBUG
+	fprintf(stderr, "VALUES\n");
+	for(int i=0;i<n_queries;i++){
+		for(int j=0;j<n_attrs;j++){
+			fprintf(stderr, "%d ", values[i*n_attrs+j]);
+		}
+		fprintf(stderr, "\n");
+	}
+#endif
+	// Conditions are duplicated, all as a block, for each user.
+	int *conditions = (int*) malloc(sizeof(int)*n_queries*n_attrs);
+	for(int i=0; i<n_users; i++){
+		memcpy(&(conditions[i*n_conditions*n_attrs]), condition_rules, sizeof(int)*n_attrs*n_conditions);
+	}
+#ifdef DEBUG
+	fprintf(stderr, "CONDITIONS\n");
+	for(int i=0;i<n_queries;i++){
+		for(int j=0;j<n_attrs;j++){
+			fprintf(stderr, "%d ", conditions[i*n_attrs+j]);
+		}
+		fprintf(stderr, "\n");
+	}
+	if(budget_fractions){
+		fprintf(stderr, "BUDGET FRACTIONS\n");
+		for(int i=0;i<n_users;i++){
+			for(int j=0;j<n_conditions;j++){
+				fprintf(stderr, "%.2f ", budget_fractions[i*n_conditions+j]);
+			}
+			fprintf(stderr, "\n");
+		}
+	}
+#endif
+	// Perform the queries.
+	int status = run_queries(instance, n_queries, values, conditions, budget_fractions, result);
+	// Free the memory.
+	free(users_data);
+	free(values);
+	free(conditions);
+	if(budget_fractions){ free(budget_fractions); }
+	return status;
+}
+
+
+// Transform an array of answers to a Python list.
+static PyObject *answers_to_list(int n_queries, int *result){
+	PyObject *output = PyList_New(n_queries);
+	for(int i=0; i<n_queries; i++){
+		PyList_SetItem(output, i, PyLong_FromLong((long)result[i]));
+	}
+	return output;
+}
+
+
 
 static PyObject *cqbs_query(PyObject *self, PyObject *args){
 	// Parse the input to retrieve the QBS instance, and two lists.
@@ -215,37 +449,13 @@ static PyObject *cqbs_query(PyObject *self, PyObject *args){
 		for(int i=0; i<n_queries; i++){
 			fraction_entry = PyList_GetItem(PyBudgetFractions, i);
 			budget_fractions[i] = (double) PyFloat_AsDouble(fraction_entry);
-			if((budget_fractions[i] <= 0) || (budget_fractions[i] > 1)){
-				PyErr_SetString(PyExc_ValueError, "Budget fractions must be in (0, 1].");
-				free(values);
-				free(conditions);
-				free(budget_fractions);
-				return NULL;
-			}
 		}
 	}
-	// Perform the queries on the QBS.
+	// Perform the queries on the QBS, and transform the result to a Python list.
 	int *result = (int *) malloc(sizeof(int)*n_queries);
-	if(instance->type == DPLAPLACE){
-		if(!budget_fractions){
-			PyErr_SetString(PyExc_ValueError, "Must have BudgetFractions as an argument for DP Laplace.");
-			free(result);
-			free(values);
-			free(conditions);
-			return NULL;
-		}
-		performQueriesWithBudget((DPLaplaceInstance*) instance->instance,
-			n_queries, values, conditions, budget_fractions, result);
-	} else {
-		if(budget_fractions){
-			fprintf(stderr, "[WARNING] BudgetFractions provided but not used by this QBS type.\n");
-		}
-		performQueries(instance, n_queries, values, conditions, result);
-	}
-	// Transform the result to a Python list.
-	PyObject *output = PyList_New(n_queries);
-	for(int i=0; i<n_queries; i++){
-		PyList_SetItem(output, i, PyLong_FromLong((long)result[i]));
+	PyObject *output = NULL;
+	if(run_queries(instance, n_queries, values, conditions, budget_fractions, result) == 0){
+		output = answers_to_list(n_queries, result);
 	}
 	// Free the memory allocared for input arrays.
 	free(values);
@@ -259,6 +469,50 @@ static PyObject *cqbs_query(PyObject *self, PyObject *args){
 }
 
 
+// Query the QBS with buffers (e.g. NumPy arrays) of C ints: values and conditions (n_queries x n_attrs)
+//  are read in place, and the answers are written in the writable output buffer (n_queries),
+//  so that no Python object is created per query. The optional budget fractions are float64.
+static PyObject *cqbs_query_buffer(PyObject *self, PyObject *args){
+	long QBSInstanceAddress;
+	PyObject *PyValues, *PyConditions, *PyOutput;
+	PyObject *PyBudgetFractions = Py_None;
+	if (!PyArg_ParseTuple(args, "lOOO|O", &QBSInstanceAddress,
+			&PyValues, &PyConditions, &PyOutput, &PyBudgetFractions)){
+		return NULL;
+	}
+	QBSInstance *instance = (QBSInstance*) QBSInstanceAddress;  // Open the QBS instance.
+	int n_attrs = instance->data->n_attrs;
+	Py_buffer values = {NULL}, conditions = {NULL}, output = {NULL}, budgets = {NULL};
+	PyObject *status = NULL;
+	if((get_buffer(PyValues, &values, 2, 'i', 0) < 0)
+			|| (get_buffer(PyConditions, &conditions, 2, 'i', 0) < 0)
+			|| (get_buffer(PyOutput, &output, 1, 'i', 1) < 0)
+			|| ((PyBudgetFractions != Py_None) && (get_buffer(PyBudgetFractions, &budgets, 1, 'd', 0) < 0))){
+		goto done;
+	}
+	Py_ssize_t n_queries = values.shape[0];
+	if((values.shape[1] != n_attrs) || (conditions.shape[0] != n_queries) || (conditions.shape[1] != n_attrs)){
+		PyErr_SetString(PyExc_IndexError, "Values and conditions must both be (n_queries, n_attrs) arrays.");
+		goto done;
+	}
+	if((output.shape[0] != n_queries) || (budgets.obj && (budgets.shape[0] != n_queries))){
+		PyErr_SetString(PyExc_IndexError, "Output and budgets must have one entry per query.");
+		goto done;
+	}
+	if(run_queries(instance, (int) n_queries, (int*) values.buf, (int*) conditions.buf,
+			budgets.obj ? (double*) budgets.buf : NULL, (int*) output.buf) == 0){
+		status = Py_None;
+		Py_INCREF(status);
+	}
+done:
+	PyBuffer_Release(&values);
+	PyBuffer_Release(&conditions);
+	PyBuffer_Release(&output);
+	PyBuffer_Release(&budgets);
+	return status;
+}
+
+
 static PyObject *cqbs_structured_query(PyObject *self, PyObject *args){
 	// Parse the inputs.
 	long QBSInstanceAddress;
@@ -275,155 +529,103 @@ static PyObject *cqbs_structured_query(PyObject *self, PyObject *args){
 	}
 	// From the lists, get the number of conditions and the number of users (product = #queries).
 	QBSInstance *instance = (QBSInstance*) QBSInstanceAddress;  // Open the QBS instance.
-	Dataset *dataset = instance->data;
 	int n_users = PyList_Size(PyUsersList);
 	int n_conditions = PyList_Size(PyConditions);
 	int n_queries = n_users * n_conditions;
-	int n_attrs = dataset->n_attrs;
-	// Fill in the arrays with the users data and the condition rules.
-	// These will then be processed to have the values and conditions arrays.
-	int *users_data = (int*) malloc(sizeof(int)*n_users*n_attrs);
-	int *condition_rules = (int*) malloc(sizeof(int)*n_queries*n_attrs);
+	int n_attrs = instance->data->n_attrs;
+	if(PyBudgetFractions && (PyList_Size(PyBudgetFractions) != n_conditions)){
+		PyErr_SetString(PyExc_ValueError, "length(budgets) must be equal to length(conditions).");
+		return NULL;
+	}
+	// Read the user ids, the condition rules and the budget fractions from the lists.
+	int *user_ids = (int*) malloc(sizeof(int)*n_users);
+	int *condition_rules = (int*) malloc(sizeof(int)*n_conditions*n_attrs);
+	double *condition_budgets = NULL;
+	int *result = NULL;
+	PyObject *output = NULL;
 	for(int u=0; u<n_users; u++){
-		PyObject *element = PyList_GetItem(PyUsersList, u);
-		int userid = (int) PyLong_AsLong(element);
-		// Copy the memory from the data.
-		memcpy(&(users_data[n_attrs*u]), &(dataset->data[n_attrs*userid]), sizeof(int)*n_attrs);
-		// Note that users_data currently contains the sensitive attribute. However, that attribute is
-		//  not known to the attacker. Hence, we interpret the semantics of the condition rules differently.
-		// We assume that +1 means "sensitive == 1", -1 means "sensitive == 0", 0 means "no condition".
-		// This can simply be enforced by setting the value of the sensitive attribute to 1 in the user data.
-		// This attribute is assumed to be _the last_.
-		users_data[n_attrs*u+n_attrs-1] = 1;
+		user_ids[u] = (int) PyLong_AsLong(PyList_GetItem(PyUsersList, u));
 	}
 	for(int c=0; c<n_conditions; c++){
 		PyObject *element = PyList_GetItem(PyConditions, c);
 		if(!PyTuple_Check(element)){
 			PyErr_SetString(PyExc_TypeError, "Condition elements must be tuples.");
-			free(users_data);
-			free(condition_rules);
-			return NULL;
+			goto done;
 		}
 		for(int i=0; i<n_attrs; i++){
 			PyObject *entry = PyTuple_GetItem(element, i);
 			condition_rules[c*n_attrs+i] = (int) PyLong_AsLong(entry);
 		}
 	}
-	// Finally, *if* the budget_fractions is not NULL, we create an array that stores the budget
-	//  of individual queries, after duplication (in the same order as below: each user's queries
-	//  are consecutive, hence the array is PyBudgetFractions repeated n_users times).
-	double *budget_fractions = NULL;
 	if(PyBudgetFractions){
-		if(PyList_Size(PyBudgetFractions) != n_conditions){
-			PyErr_SetString(PyExc_ValueError, "length(budgets) must be equal to length(conditions).");
-			free(users_data);
-			free(condition_rules);
-			return NULL;
-		}
-		// This array maintains, for each *query*, the budget allocated to it.
-		// For this, we duplicate the budget fractions for each user (similarly to conditions).
-		budget_fractions = (double*) malloc(sizeof(double)*n_queries);  // n_users * n_conditions
+		condition_budgets = (double*) malloc(sizeof(double)*n_conditions);
 		for(int c=0; c<n_conditions; c++){
-			PyObject *element = PyList_GetItem(PyBudgetFractions, c);
-			double budget_for_this_query = PyFloat_AsDouble(element);
-			if((budget_for_this_query <= 0) || (budget_for_this_query > 1)){
-				PyErr_SetString(PyExc_ValueError, "Budget fractions must be in (0, 1].");
-				free(users_data);
-				free(condition_rules);
-				free(budget_fractions);
-				return NULL;
-			}
-			for(int u=0; u<n_users; u++){
-				budget_fractions[u*n_conditions + c] = budget_for_this_query;
-			}
+			condition_budgets[c] = PyFloat_AsDouble(PyList_GetItem(PyBudgetFractions, c));
 		}
 	}
-#ifdef DEBUG
-	fprintf(stderr, "RULES\n");
-	for(int i=0;i<n_conditions;i++){
-		for(int j=0;j<n_attrs;j++){
-			fprintf(stderr, "%d ", condition_rules[i*n_attrs+j]);
-		}
-		fprintf(stderr, "\n");
+	// Perform the queries, and transform the result to a Python list.
+	result = (int*) malloc(sizeof(int)*n_queries);
+	if(run_structured_queries(instance, n_users, user_ids, n_conditions, condition_rules,
+			condition_budgets, result) == 0){
+		output = answers_to_list(n_queries, result);
 	}
-#endif
-	// Now, we duplicate the memory from these users.
-	// The values of the users are duplicated n_conditions times, for each user (all data from
-	//  the same user is consecutive).
-	int *values = (int*) malloc(sizeof(int)*n_queries*n_attrs);
-	for(int i=0; i<n_users; i++){  // Each user's row.
-		for(int j=0; j<n_conditions; j++){  // Repetition of the same row.
-			memcpy(&(values[(i*n_conditions+j)*n_attrs]), &(users_data[n_attrs*i]), sizeof(int)*n_attrs);
-		}
+done:
+	// Free the memory.
+	free(result);
+	free(user_ids);
+	free(condition_rules);
+	if(condition_budgets){ free(condition_budgets); }
+	// Return the result (as a list).
+	return output;
+}
+
+
+// Structured queries with buffers (e.g. NumPy arrays) of C ints: user ids (n_users) and condition
+//  rules (n_conditions x n_attrs) are read in place, and the answers are written in the writable
+//  output buffer (n_users * n_conditions). The optional budget fractions (n_conditions) are float64.
+static PyObject *cqbs_structured_query_buffer(PyObject *self, PyObject *args){
+	long QBSInstanceAddress;
+	PyObject *PyUsers, *PyConditions, *PyOutput;
+	PyObject *PyBudgetFractions = Py_None;
+	if (!PyArg_ParseTuple(args, "lOOO|O", &QBSInstanceAddress,
+			&PyUsers, &PyConditions, &PyOutput, &PyBudgetFractions)){
+		return NULL;
 	}
-#ifdef DEBUG
-	fprintf(stderr, "VALUES\n");
-	for(int i=0;i<n_queries;i++){
-		for(int j=0;j<n_attrs;j++){
-			fprintf(stderr, "%d ", values[i*n_attrs+j]);
-		}
-		fprintf(stderr, "\n");
+	QBSInstance *instance = (QBSInstance*) QBSInstanceAddress;  // Open the QBS instance.
+	int n_attrs = instance->data->n_attrs;
+	Py_buffer users = {NULL}, conditions = {NULL}, output = {NULL}, budgets = {NULL};
+	PyObject *status = NULL;
+	if((get_buffer(PyUsers, &users, 1, 'i', 0) < 0)
+			|| (get_buffer(PyConditions, &conditions, 2, 'i', 0) < 0)
+			|| (get_buffer(PyOutput, &output, 1, 'i', 1) < 0)
+			|| ((PyBudgetFractions != Py_None) && (get_buffer(PyBudgetFractions, &budgets, 1, 'd', 0) < 0))){
+		goto done;
 	}
-#endif
-	// Conditions are duplicated, all as a block, for each user.
-	int *conditions = (int*) malloc(sizeof(int)*n_queries*n_attrs);
-	for(int i=0; i<n_users; i++){
-		memcpy(&(conditions[i*n_conditions*n_attrs]), condition_rules, sizeof(int)*n_attrs*n_conditions);
+	Py_ssize_t n_users = users.shape[0];
+	Py_ssize_t n_conditions = conditions.shape[0];
+	if(conditions.shape[1] != n_attrs){
+		PyErr_SetString(PyExc_IndexError, "Conditions must be a (n_conditions, n_attrs) array.");
+		goto done;
 	}
-#ifdef DEBUG
-	fprintf(stderr, "CONDITIONS\n");
-	for(int i=0;i<n_queries;i++){
-		for(int j=0;j<n_attrs;j++){
-			fprintf(stderr, "%d ", conditions[i*n_attrs+j]);
-		}
-		fprintf(stderr, "\n");
+	if(budgets.obj && (budgets.shape[0] != n_conditions)){
+		PyErr_SetString(PyExc_ValueError, "length(budgets) must be equal to length(conditions).");
+		goto done;
 	}
-	if(budget_fractions){
-		fprintf(stderr, "BUDGET FRACTIONS\n");
-		for(int i=0;i<n_users;i++){
-			for(int j=0;j<n_conditions;j++){
-				fprintf(stderr, "%.2f ", budget_fractions[i*n_conditions+j]);
-			}
-			fprintf(stderr, "\n");
-		}
+	if(output.shape[0] != n_users * n_conditions){
+		PyErr_SetString(PyExc_IndexError, "Output must have one entry per (user, condition) pair.");
+		goto done;
 	}
-#endif
-	// Perform the queries.
-	int *result = (int*) malloc(sizeof(int)*n_queries);
-	// If the QBS uses differential privacy, we additionally use the budget argument.
-	if(instance->type == DPLAPLACE){
-		// If budget fractions are not given, throw an error.
-		if(!budget_fractions){
-			PyErr_SetString(PyExc_ValueError, "Must have BudgetFractions as an argument for DP Laplace.");
-			free(result);
-			free(users_data);
-			free(condition_rules);
-			free(values);
-			free(conditions);
-			return NULL;
-		}
-		performQueriesWithBudget((DPLaplaceInstance*) instance->instance,
-			n_queries, values, conditions, budget_fractions, result);
-	} else {
-		if(budget_fractions){
-			fprintf(stderr, "[WARNING] BudgetFractions provided but not used by this QBS type.\n");
-		}
-		performQueries(instance, n_queries, values, conditions, result);
-	}
-	// Transform the result to a Python list.
-	PyObject *output = PyList_New(n_queries);
-	for(int i=0; i<n_queries; i++){
-		PyList_SetItem(output, i, PyLong_FromLong((long)result[i]));
+	if(run_structured_queries(instance, (int) n_users, (int*) users.buf, (int) n_conditions,
+			(int*) conditions.buf, budgets.obj ? (double*) budgets.buf : NULL, (int*) output.buf) == 0){
+		status = Py_None;
+		Py_INCREF(status);
 	}
-	// Free the memory.
-	free(result);
-	free(users_data);
-	free(condition_rules);
-	free(values);
-	free(conditions);
-	if(budget_fractions){ free(budget_fractions); }
-	// Return the result (as a list).
-	return output;
+done:
+	PyBuffer_Release(&users);
+	PyBuffer_Release(&conditions);
+	PyBuffer_Release(&output);
+	PyBuffer_Release(&budgets);
+	return status;
 }
 
 
@@ -435,11 +637,28 @@ static PyObject *cqbs_free(PyObject *self, PyObject *args){
 		return NULL;
 	}
 	QBSInstance *instance = (QBSInstance*) QBSInstanceAddress;
+	// Each instance created by this module has its own dataset (and bitmap index).
+	Dataset *dataset = instance->data;
 	freeQBSInstance(instance);
+	freeDataset(dataset);
 	return PyLong_FromLong(0);
 }
 
 
+// Set the number of native threads over which each batch of queries is split.
+static PyObject *cqbs_set_num_threads(PyObject *self, PyObject *args){
+	int n_threads;
+	if (!PyArg_ParseTuple(args, "i", &n_threads)) {
+		return NULL;
+	}
+	setNumThreads(n_threads);
+	Py_RETURN_NONE;
+}
+
+
+static PyObject *cqbs_get_num_threads(PyObject *self, PyObject *args){
+	return PyLong_FromLong((long) getNumThreads());
+}
 
 
 
@@ -447,9 +666,18 @@ static PyObject *cqbs_free(PyObject *self, PyObject *args){
 
 static PyMethodDef QBSMethods[] = {
     {"create_qbs",  cqbs_new_instance, METH_VARARGS, "Create a new QBS instance."},
+    {"create_qbs_from_buffer",  cqbs_new_instance_from_buffer, METH_VARARGS,
+        "Create a new QBS instance from a 2-dimensional int32 array."},
     {"free_qbs", cqbs_free, METH_VARARGS, "Free the QBS instance."},
     {"query_qbs", cqbs_query, METH_VARARGS, "Query the QBS instance."},
+    {"query_qbs_buffer", cqbs_query_buffer, METH_VARARGS, "Query the QBS instance with int32 arrays."},
     {"structured_query_qbs", cqbs_structured_query, METH_VARARGS, "Structured queries on a QBS instance"},
+    {"structured_query_qbs_buffer", cqbs_structured_query_buffer, METH_VARARGS,
+        "Structured queries on a QBS instance with int32 arrays."},
+    {"set_num_threads", cqbs_set_num_threads, METH_VARARGS,
+        "Set the number of threads used to answer a batch of queries."},
+    {"get_num_threads", cqbs_get_num_threads, METH_NOARGS,
+        "Number of threads used to answer a batch of queries."},
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -1,6 +1,9 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <stdint.h>
+#include <string.h>
 #include <math.h>
+#include <pthread.h>
 
 #include "qbs.h"
 
@@ -13,6 +16,16 @@
 // Macro: accessing a Dataset struct.
 #define GETDATA(dataset,row,attr) (dataset->data[row*(dataset->n_attrs)+attr])
 
+// Macro: the bitset of the records where attr == value, in a BitmapIndex.
+#define BITSET(index,attr,value) (&((index)->bitsets[(size_t) ((index)->offsets[attr] \
+  + (value) - (index)->min_value[attr]) * (index)->n_words]))
+
+// Below this number of (query, record) pairs per thread, starting a thread costs more than it saves.
+#define MIN_PAIRS_PER_THREAD 65536
+
+// Number of threads over which performQueries splits the queries (see setNumThreads).
+static int n_threads = 1;
+
 
 
 
@@ -25,6 +38,41 @@ unsigned int simple_hash(unsigned int x) {
     return x;
 }
 
+/*
+  Random number generator seeded with a given seed, whose state is local to the caller: unlike
+  srand/rand, which share a global state, noises can be drawn from several threads at once.
+  With glibc, it returns exactly the numbers that rand() returns after srand(seed), so the
+  noises are unchanged. Other C libraries use rand_r.
+*/
+typedef struct {
+#ifdef __GLIBC__
+  struct random_data data;
+  char state[128];  // The state size of srand/rand (TYPE_3 generator).
+#else
+  unsigned int state;
+#endif
+} SeededRNG;
+
+void seedRNG(SeededRNG *rng, unsigned int seed){
+#ifdef __GLIBC__
+  // The random_data struct must be zeroed before initstate_r.
+  memset(&(rng->data), 0, sizeof(rng->data));
+  initstate_r(seed, rng->state, sizeof(rng->state), &(rng->data));
+#else
+  rng->state = seed;
+#endif
+}
+
+int nextRandom(SeededRNG *rng){
+#ifdef __GLIBC__
+  int32_t r;
+  random_r(&(rng->data), &r);
+  return r;
+#else
+  return rand_r(&(rng->state));
+#endif
+}
+
 /*
   Returns noise ~ N(0,1), useful for Diffix.
   Uses the Box-Muller transform: https://en.wikipedia.org/wiki/Box%E2%80%93Muller_transform
@@ -32,9 +80,10 @@ unsigned int simple_hash(unsigned int x) {
   TODO: use http://www.math.sci.hiroshima-u.ac.jp/~m-mat/MT/emt.html ?
 */
 double normal_noise(unsigned int seed){
-  srand(seed);
-  double x = ((double)rand())/RAND_MAX;
-  double y = ((double)rand())/RAND_MAX;
+  SeededRNG rng;
+  seedRNG(&rng, seed);
+  double x = ((double)nextRandom(&rng))/RAND_MAX;
+  double y = ((double)nextRandom(&rng))/RAND_MAX;
   return sqrt(-2 * log(x)) * cos(2 * M_PI * y);;
 }
 
@@ -49,11 +98,12 @@ double normal_noise(unsigned int seed){
   Source: https://stackoverflow.com/questions/5008804/generating-random-integer-from-a-range
 */
 int uniform_noise(int scale, unsigned int seed){
-  srand(seed);
+  SeededRNG rng;
+  seedRNG(&rng, seed);
   int low = -scale, high = scale;
   unsigned int r;
   do {
-    r = rand();
+    r = nextRandom(&rng);
   } while (r < ((unsigned int)(RAND_MAX) + 1) % (high + 1 - low));
 return r % (high + 1 - low) + low;
 }
@@ -65,8 +115,9 @@ return r % (high + 1 - low) + low;
   https://en.wikipedia.org/wiki/Laplace_distribution
 */
 double laplace_noise(unsigned int seed){
-  srand(seed);
-  double U = (((double)rand())/RAND_MAX) - 0.5;  // ~ U[-0.5,0.5]
+  SeededRNG rng;
+  seedRNG(&rng, seed);
+  double U = (((double)nextRandom(&rng))/RAND_MAX) - 0.5;  // ~ U[-0.5,0.5]
   if (U >= 0){
     // sign(U) = +1, abs(U) = U
     return - log(1 - 2 * U);
@@ -77,6 +128,20 @@ double laplace_noise(unsigned int seed){
 }
 
 
+/*
+  Set the number of threads over which performQueries splits the queries (at least 1).
+  The noise is still added on the calling thread, in the order of the queries, so the
+  answers do not depend on the number of threads.
+*/
+void setNumThreads(int n){
+  n_threads = (n < 1) ? 1 : n;
+}
+
+int getNumThreads(void){
+  return n_threads;
+}
+
+
 /*
   Create (allocate memory) for a Dataset.
 */
@@ -85,6 +150,7 @@ Dataset* makeDataset(int n_attrs, int n_data){
   res->n_data = n_data;
   res->n_attrs = n_attrs;
   res->data = (int*) malloc(sizeof(int)*n_attrs*n_data);
+  res->index = NULL;
   return res;
 }
 
@@ -105,10 +171,70 @@ void setDataset(Dataset *d, int *data){
   Free the memory for a Diffix instance.
 */
 void freeDataset(Dataset *d){
+  if(d->index){
+    free(d->index->min_value);
+    free(d->index->n_values);
+    free(d->index->offsets);
+    free(d->index->bitsets);
+    free(d->index);
+  }
   free(d->data);
   free(d);
 }
 
+/*
+  Build a bitmap index over a dataset: for each attribute with at most max_values possible
+   values (between its smallest and largest value), one bitset per value, whose bit i is set
+   if record i has this value. Queries on indexed attributes are then answered with word-wise
+   AND/OR over bitsets instead of scanning the records. The index is freed with the dataset.
+  This should be called after the data is set (the index is not updated if the data changes).
+*/
+void buildBitmapIndex(Dataset *d, int max_values){
+  int n_attrs = d->n_attrs, n_data = d->n_data;
+  BitmapIndex *index = (BitmapIndex*) malloc(sizeof(BitmapIndex));
+  index->n_words = (n_data + 63) / 64;
+  index->min_value = (int*) malloc(sizeof(int)*n_attrs);
+  index->n_values = (int*) malloc(sizeof(int)*n_attrs);
+  index->offsets = (int*) malloc(sizeof(int)*n_attrs);
+  // Find the domain of each attribute, and decide which attributes to index.
+  int n_bitsets = 0;
+  for(int attr=0; attr<n_attrs; attr++){
+    int min = GETDATA(d, 0, attr), max = min;
+    for(int rec=1; rec<n_data; rec++){
+      int value = GETDATA(d, rec, attr);
+      if(value < min){ min = value; }
+      if(value > max){ max = value; }
+    }
+    long long n_values = (long long) max - min + 1;
+    index->min_value[attr] = min;
+    index->offsets[attr] = n_bitsets;
+    if(n_values <= max_values){
+      index->n_values[attr] = (int) n_values;
+      n_bitsets += (int) n_values;
+    } else {
+      index->n_values[attr] = 0;
+    }
+  }
+  if(n_bitsets == 0){
+    // No attribute can be indexed: queries scan the records.
+    free(index->min_value);
+    free(index->n_values);
+    free(index->offsets);
+    free(index);
+    return;
+  }
+  // Set the bit of each record in the bitset of its value, for each indexed attribute.
+  index->bitsets = (uint64_t*) calloc((size_t) n_bitsets * index->n_words, sizeof(uint64_t));
+  for(int rec=0; rec<n_data; rec++){
+    for(int attr=0; attr<n_attrs; attr++){
+      if(index->n_values[attr]){
+        BITSET(index, attr, GETDATA(d, rec, attr))[rec / 64] |= ((uint64_t) 1) << (rec % 64);
+      }
+    }
+  }
+  d->index = index;
+}
+
 
 // Internal: create (allocate memory) a QBS instance.
 QBSInstance *makeQBSInstance(Dataset *d, QBS_TYPE type, void* instance){
@@ -243,25 +369,177 @@ unsigned int static_seed(DiffixInstance* diffix, int attribute, int value, int c
 
 
 /*
-  Perform queries on a QBS instance.
+  Whether a record's value qbs_data satisfies the condition (qbs_data OPERATOR(condition) condition_value),
+   with the operators of performQueries. Unknown conditions are always satisfied.
+*/
+static inline int conditionHolds(int condition, int qbs_data, int condition_value){
+  switch(condition){
+    case 0:  // No condition on the attribute.
+      return TRUE;
+    case 1:  // Equality condition.
+      return (qbs_data == condition_value);
+    case 2:  // Greater than.
+      return (qbs_data > condition_value);
+    case 3:  // Greater than or equal.
+      return (qbs_data >= condition_value);
+    case -1:  // Different from.
+      return (qbs_data != condition_value);
+    case -2:  // Smaller than.
+      return (qbs_data < condition_value);
+    case -3:  // Smaller than or equal.
+      return (qbs_data <= condition_value);
+  }
+  return TRUE;
+}
 
-  The queries are given as a pair of arrays (values, flags) of size n_queries * d->n_attrs,
-   with values[i*n_attrs:(i+1)*n_attrs[ corresponding to the fields of one query, in order
-   and conditions[idem[ with values -1 (=/=), 0 (no condition) or +1 (==).
+/*
+  Restrict a set of records (a bitset) to those satisfying the condition on an indexed attribute:
+   with the bitset of value for == and != (AND and AND NOT), and with the OR of the bitsets of the
+   values in the range for the order conditions. range is a scratch bitset.
+*/
+void restrictWithIndex(BitmapIndex *index, int attr, int condition, int value,
+  uint64_t *matches, uint64_t *range){
+  int n_words = index->n_words;
+  long long min = index->min_value[attr], max = min + index->n_values[attr] - 1;
+  long long low, high;  // The values satisfying the condition are [low, high].
+  switch(condition){
+    case 1:
+      low = value; high = value;
+      break;
+    case -1:
+      // Remove the records with this value (if any).
+      if((value >= min) && (value <= max)){
+        uint64_t *bitset = BITSET(index, attr, value);
+        for(int w=0; w<n_words; w++){ matches[w] &= ~bitset[w]; }
+      }
+      return;
+    case 2:
+      low = (long long) value + 1; high = max;
+      break;
+    case 3:
+      low = value; high = max;
+      break;
+    case -2:
+      low = min; high = (long long) value - 1;
+      break;
+    case -3:
+      low = min; high = value;
+      break;
+    default:  // No condition on the attribute.
+      return;
+  }
+  if(low < min){ low = min; }
+  if(high > max){ high = max; }
+  if(low > high){
+    // No record satisfies the condition.
+    memset(matches, 0, sizeof(uint64_t)*n_words);
+  } else if((low == min) && (high == max)){
+    // All the records satisfy the condition.
+    return;
+  } else if(low == high){
+    uint64_t *bitset = BITSET(index, attr, low);
+    for(int w=0; w<n_words; w++){ matches[w] &= bitset[w]; }
+  } else {
+    memcpy(range, BITSET(index, attr, low), sizeof(uint64_t)*n_words);
+    for(long long v=low+1; v<=high; v++){
+      uint64_t *bitset = BITSET(index, attr, v);
+      for(int w=0; w<n_words; w++){ range[w] |= bitset[w]; }
+    }
+    for(int w=0; w<n_words; w++){ matches[w] &= range[w]; }
+  }
+}
 
-  For instance, for a dataset with attributes (A1, A2, A3), the query (A1=42 and A3!=7)
-   is encoded as values=[42, x, 7] and conditions=[1,0,-1].
+/*
+  A range of queries [start, end[ whose matching records are counted by one thread: for each
+   query q, the size of its user set is stored in sizes[q] and the hash of the user set in hashes[q]
+   (the hashes are only needed by some QBSes: with a bitmap index, they are computed only if with_hashes).
+*/
+typedef struct {
+  Dataset *data;
+  int start, end;
+  int *values, *conditions;
+  unsigned int *sizes, *hashes;
+  int with_hashes;
+} CountingJob;
 
-  The results are stored in the output array.
+/*
+  Count the records matching each query of a CountingJob, with the bitmap index of the dataset.
+  The conditions on indexed attributes are applied to the bitset of all records, then the
+   conditions on other attributes are checked on the remaining records only.
 */
-void performQueries(QBSInstance* qbs, int n_queries, int *values, int *conditions, int *output){
+void countMatchesWithIndex(CountingJob *job){
+  Dataset *data = job->data;
+  BitmapIndex *index = data->index;
+  int n_attrs = data->n_attrs, n_words = index->n_words;
+  uint64_t *matches = (uint64_t*) malloc(sizeof(uint64_t)*n_words);
+  uint64_t *range = (uint64_t*) malloc(sizeof(uint64_t)*n_words);
+  int *unindexed = (int*) malloc(sizeof(int)*n_attrs);  // Attributes with conditions not in the index.
+  // The bits of the last word past the last record are never set.
+  uint64_t last_word = (data->n_data % 64) ? ((((uint64_t) 1) << (data->n_data % 64)) - 1) : ~((uint64_t) 0);
+  for(int q=job->start; q<job->end; q++){
+    int *q_values = &(job->values[q*n_attrs]);
+    int *q_conditions = &(job->conditions[q*n_attrs]);
+    // Start from all the records, and apply the conditions on indexed attributes.
+    memset(matches, 0xff, sizeof(uint64_t)*n_words);
+    matches[n_words-1] = last_word;
+    int n_unindexed = 0;
+    for(int attr=0; attr<n_attrs; attr++){
+      if(q_conditions[attr] == 0){
+        continue;
+      }
+      if(index->n_values[attr]){
+        restrictWithIndex(index, attr, q_conditions[attr], q_values[attr], matches, range);
+      } else {
+        unindexed[n_unindexed++] = attr;
+      }
+    }
+    // Then, check the other conditions on the remaining records, and compute the user set.
+    unsigned int user_set_size = 0;
+    unsigned int user_set_hash = 0;
+    for(int w=0; w<n_words; w++){
+      uint64_t word = matches[w];
+      if(n_unindexed || job->with_hashes){
+        for(uint64_t bits = word; bits; bits &= bits - 1){
+          int bit = __builtin_ctzll(bits);
+          int rec = w*64 + bit;
+          for(int k=0; k<n_unindexed; k++){
+            int attr = unindexed[k];
+            if(!conditionHolds(q_conditions[attr], GETDATA(data, rec, attr), q_values[attr])){
+              word &= ~(((uint64_t) 1) << bit);
+              break;
+            }
+          }
+          if(job->with_hashes && (word & (((uint64_t) 1) << bit))){
+            user_set_hash = user_set_hash ^ simple_hash(rec + 1);
+          }
+        }
+      }
+      user_set_size += __builtin_popcountll(word);
+    }
+    job->sizes[q] = user_set_size;
+    job->hashes[q] = user_set_hash;
+  }
+  free(matches);
+  free(range);
+  free(unindexed);
+}
+
+/*
+  Count the records matching each query of a CountingJob (thread entry point).
+  This only reads the data and the queries, so several jobs can run at once.
+*/
+void *countMatches(void *arg){
+  CountingJob *job = (CountingJob*) arg;
+  if(job->data->index){
+    countMatchesWithIndex(job);
+    return NULL;
+  }
   int *q_values, *q_conditions;  // Variables to represent the current query.
-  Dataset *data = qbs->data;
+  Dataset *data = job->data;
   int n_attrs = data->n_attrs;
-  // Process each query in order.
-  for(int q=0; q<n_queries; q++){
-    q_values = &(values[q*n_attrs]);
-    q_conditions = &(conditions[q*n_attrs]);
+  for(int q=job->start; q<job->end; q++){
+    q_values = &(job->values[q*n_attrs]);
+    q_conditions = &(job->conditions[q*n_attrs]);
     // First, perform a (clean) query on this dataset.
     unsigned int user_set_size = 0;
     unsigned int user_set_hash = 0;
@@ -273,32 +551,8 @@ void performQueries(QBSInstance* qbs, int n_queries, int *values, int *condition
       // part of the query set for this query.
       unsigned int matched = TRUE;
       for(int attr=0; (attr<n_attrs) && matched; attr++){
-        // Check if this attribute matches: its condition in +-1, and the values don't match.
-        int condition_value = q_values[attr],
-            qbs_data = GETDATA(data, rec, attr);
-        switch(q_conditions[attr]){
-          case 0:  // No condition on the attribute.
-            matched = TRUE;
-            break;
-          case 1:  // Equality condition.
-            matched = (qbs_data == condition_value);
-            break;
-          case 2:  // Greater than.
-            matched = (qbs_data > condition_value);
-            break;
-          case 3:  // Greater than or equal.
-            matched = (qbs_data >= condition_value);
-            break;
-          case -1:  // Different from.
-            matched = (qbs_data != condition_value);
-            break;
-          case -2:  // Smaller than.
-            matched = (qbs_data < condition_value);
-            break;
-          case -3:  // Smaller than or equal.
-            matched = (qbs_data <= condition_value);
-            break;
-        }
+        // Check if this attribute matches the condition on it.
+        matched = conditionHolds(q_conditions[attr], GETDATA(data, rec, attr), q_values[attr]);
       }
       // If the record matches, add it to the user set.
       if(matched){
@@ -307,6 +561,82 @@ void performQueries(QBSInstance* qbs, int n_queries, int *values, int *condition
         user_set_hash = user_set_hash ^ simple_hash(rec + 1);
       }
     }
+    job->sizes[q] = user_set_size;
+    job->hashes[q] = user_set_hash;
+  }
+  return NULL;
+}
+
+/*
+  Count the records matching each query, splitting the queries in contiguous ranges over
+   (at most) n_threads threads. The calling thread processes the first range.
+*/
+void countAllMatches(Dataset *data, int n_queries, int *values, int *conditions,
+  unsigned int *sizes, unsigned int *hashes, int with_hashes){
+  long long n_pairs = (long long) n_queries * data->n_data;
+  int threads = n_threads;
+  if(n_pairs / MIN_PAIRS_PER_THREAD < threads){
+    threads = (int) (n_pairs / MIN_PAIRS_PER_THREAD);
+  }
+  if(threads < 1){ threads = 1; }
+  CountingJob *jobs = (CountingJob*) malloc(sizeof(CountingJob)*threads);
+  pthread_t *thread_ids = (pthread_t*) malloc(sizeof(pthread_t)*threads);
+  int *started = (int*) calloc(threads, sizeof(int));
+  for(int t=0; t<threads; t++){
+    jobs[t].data = data;
+    jobs[t].start = (int) ((long long) n_queries * t / threads);
+    jobs[t].end = (int) ((long long) n_queries * (t+1) / threads);
+    jobs[t].values = values;
+    jobs[t].conditions = conditions;
+    jobs[t].sizes = sizes;
+    jobs[t].hashes = hashes;
+    jobs[t].with_hashes = with_hashes;
+  }
+  for(int t=1; t<threads; t++){
+    started[t] = (pthread_create(&(thread_ids[t]), NULL, countMatches, &(jobs[t])) == 0);
+  }
+  // The calling thread also does its share, as well as that of the threads that failed to start.
+  countMatches(&(jobs[0]));
+  for(int t=1; t<threads; t++){
+    if(started[t]){
+      pthread_join(thread_ids[t], NULL);
+    } else {
+      countMatches(&(jobs[t]));
+    }
+  }
+  free(jobs);
+  free(thread_ids);
+  free(started);
+}
+
+/*
+  Perform queries on a QBS instance.
+
+  The queries are given as a pair of arrays (values, flags) of size n_queries * d->n_attrs,
+   with values[i*n_attrs:(i+1)*n_attrs[ corresponding to the fields of one query, in order
+   and conditions[idem[ with values -1 (=/=), 0 (no condition) or +1 (==).
+
+  For instance, for a dataset with attributes (A1, A2, A3), the query (A1=42 and A3!=7)
+   is encoded as values=[42, x, 7] and conditions=[1,0,-1].
+
+  The results are stored in the output array.
+
+  The records matching each query are counted over several threads (see setNumThreads), then the
+   noise is added in the order of the queries: the answers only depend on the QBS seed. The inputs
+   are only read, but the noise state of the QBS is updated, so a QBS instance must not be queried
+   from several threads at once (different instances can).
+*/
+void performQueries(QBSInstance* qbs, int n_queries, int *values, int *conditions, int *output){
+  // First, perform the (clean) queries on this dataset.
+  unsigned int *user_set_sizes = (unsigned int*) malloc(sizeof(unsigned int)*n_queries);
+  unsigned int *user_set_hashes = (unsigned int*) malloc(sizeof(unsigned int)*n_queries);
+  // The user set hashes are only used by TableBuilder (and Diffix).
+  countAllMatches(qbs->data, n_queries, values, conditions, user_set_sizes, user_set_hashes,
+    (qbs->type == TABLEBUILDER) || (qbs->type == DIFFIX));
+  // Process each query in order.
+  for(int q=0; q<n_queries; q++){
+    unsigned int user_set_size = user_set_sizes[q];
+    unsigned int user_set_hash = user_set_hashes[q];
     // Second, add noise, and use bucket suppression.
     double result = user_set_size;  // Real answer.
     // First, fetch the corresponding query-based system.
@@ -352,12 +682,14 @@ void performQueries(QBSInstance* qbs, int n_queries, int *values, int *condition
     } else {
       // This is highly abnormal -- abort everything.
       printf("Error: bad qbs->type.\n");
-      return;
+      break;
     }
     // Round, trim, and save the output to an array.
     output[q] = round(result);
     if(output[q] < 0){ output[q] = 0; };
   }
+  free(user_set_sizes);
+  free(user_set_hashes);
 }
 
 /*
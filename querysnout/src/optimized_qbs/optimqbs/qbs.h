@@ -1,11 +1,24 @@
 #ifndef QBS_H
 #define QBS_H 1
 
+#include <stdint.h>
+
+// Optional bitmap index over a dataset: one bitset over the records per (attribute, value).
+// Only attributes with few distinct values (in [min, max]) are indexed.
+typedef struct {
+	int n_words;  // Number of 64-bit words per bitset, ceil(n_data / 64).
+	int *min_value;  // For each attribute, its smallest value.
+	int *n_values;  // For each attribute, max - min + 1 (0 if it is not indexed).
+	int *offsets;  // For each attribute, the position of the bitset of its smallest value.
+	uint64_t *bitsets;
+} BitmapIndex;
+
 // A class that represents and stores a dataset.
 typedef struct {
 	int *data;
 	int n_attrs;
 	int n_data;
+	BitmapIndex *index;  // NULL if the dataset is not indexed.
 } Dataset;
 
 // Query-based systems are represented by a flag.
@@ -67,6 +80,8 @@ void setDataset(Dataset *d, int *data);
 
 void freeDataset(Dataset* d);
 
+void buildBitmapIndex(Dataset *d, int max_values);
+
 
 // Creator instances: simple QBS and Diffix.
 
@@ -81,6 +96,13 @@ QBSInstance* makeDPLaplace(Dataset *d, double epsilon, unsigned int seed);
 void freeQBSInstance(QBSInstance* d);
 
 
+// Number of threads used to answer queries (queries are split over threads).
+
+void setNumThreads(int n);
+
+int getNumThreads(void);
+
+
 // Perform queries on a QBS instance.
 
 void performQueries(QBSInstance* diffix, int n_queries, int *values, int *conditions, int *output);
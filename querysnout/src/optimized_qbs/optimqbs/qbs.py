@@ -2,6 +2,23 @@
 
 # The C module to wrap.
 import cqbs
+import numpy as np
+
+
+def set_num_threads(num_threads):
+    """Set the number of native threads over which each batch of queries is
+    split (1 by default). The answers do not depend on it.
+
+    The GIL is released while queries run, so Python threads can also query
+    *different* QBS instances at the same time. A single instance must not be
+    queried from several threads at once, and arrays passed to a query must
+    not be modified while it runs."""
+    cqbs.set_num_threads(int(num_threads))
+
+
+def get_num_threads():
+    """Number of native threads over which each batch of queries is split."""
+    return cqbs.get_num_threads()
 
 
 class QBS_TYPE:
@@ -27,11 +44,26 @@ class QueryBasedSystem:
         what you are doing (use QBS-specific classes instead).
 
         INPUTS:
-         - `dataset`, a list of tuples of integers of equal size.
+         - `dataset`, a list of tuples of integers of equal size, or a 2D
+             array of integers (e.g., NumPy array or DataFrame), which is
+             copied in one block instead of element by element. A float
+             array must hold integral values (ValueError otherwise).
          - `qbs_parameters`, a dictionary mapping parameter:value to describe
              the query-based system (see qbsmodule.c for specifics).
+
+        For all QBS types, `qbs_parameters` may contain "bitmap_index": k to
+        index the attributes with at most k distinct values, as one bitset
+        over the records per (attribute, value). Conditions on these
+        attributes are then evaluated with bitwise operations instead of
+        scanning the records. The answers are the same, with or without the
+        index (0, the default, builds no index).
         """
-        self.instance = cqbs.create_qbs(list(dataset), qbs_parameters)
+        if _is_array(dataset):
+            self.instance = cqbs.create_qbs_from_buffer(
+                _as_int_array(dataset), qbs_parameters
+            )
+        else:
+            self.instance = cqbs.create_qbs(list(dataset), qbs_parameters)
 
     def query(self, values, conditions, budget_fractions=None):
         """Perform one or more queries with arbitrary values on this QBS.
@@ -54,13 +86,26 @@ class QueryBasedSystem:
          - budget_fractions, a list of floats of length (idem).
 
          It must be that len(values) == len(conditions) [== len(budget_fractions)].
+         values and conditions can also be 2D integer arrays (num_queries x
+         num_attributes), which are passed to the QBS without conversion.
 
         OUTPUT:
-         - The answer to each query, as an integer, in a list of length num_queries.
+         - The answer to each query, as an integer, in a list of length num_queries,
+           or in a NumPy array if values or conditions is an array.
         """
         assert len(values) == len(
             conditions
         ), "Inputs values and conditions should have the same length."
+        if _is_array(values) or _is_array(conditions):
+            answers = np.empty(len(values), dtype=np.intc)
+            cqbs.query_qbs_buffer(
+                self.instance,
+                _as_int_array(values),
+                _as_int_array(conditions),
+                answers,
+                *_budget_array(budget_fractions),
+            )
+            return answers
         if budget_fractions:
             assert len(values) == len(
                 budget_fractions
@@ -86,11 +131,28 @@ class QueryBasedSystem:
                 - conditions, a list of tuples, each of integers and of
                   length num_attributes.
         - budget_fractions, a list of floats of same length as conditions.
+        users and conditions can also be integer arrays (1D and 2D), which
+        are passed to the QBS without conversion.
 
                OUTPUT:
                 - The answer to each query, as an integer, in a list of
-                  length len(users).
+                  length len(users), or in a NumPy array if users or
+                  conditions is an array.
         """
+        if _is_array(users) or _is_array(conditions):
+            if budget_fractions is not None:
+                assert len(conditions) == len(
+                    budget_fractions
+                ), "len(conditions) must be equal to len(budget_fractions)."
+            answers = np.empty(len(users) * len(conditions), dtype=np.intc)
+            cqbs.structured_query_qbs_buffer(
+                self.instance,
+                _as_int_array(users),
+                _as_int_array(conditions),
+                answers,
+                *_budget_array(budget_fractions),
+            )
+            return answers
         if budget_fractions is not None:
             assert len(conditions) == len(
                 budget_fractions
@@ -109,15 +171,52 @@ class QueryBasedSystem:
         Do *not* call free_qbs on this instance manually -- this will cause
         issues when this object is __del__'d. If you wish to release memory,
         instead use the del operator on the QBS instance."""
-        cqbs.free_qbs(self.instance)
+        # no instance if __init__ failed, e.g. on a dataset of non-integers
+        if hasattr(self, "instance"):
+            cqbs.free_qbs(self.instance)
+
+
+def _is_array(obj):
+    """Whether obj should be passed to cqbs as a buffer (NumPy array, DataFrame...)."""
+    return hasattr(obj, "__array__")
+
+
+def _as_int_array(obj):
+    """C-contiguous array of C ints, as expected by the *_buffer methods of cqbs
+    (no copy if obj already is one).
+
+    Raises ValueError if obj holds values that are not integers or do not fit
+    in a C int, instead of truncating them: a float column of normalized
+    values would otherwise silently become 0/1."""
+    array = np.asarray(obj)
+    if array.dtype == np.intc:
+        return np.ascontiguousarray(array)
+    if array.dtype.kind != "b" and array.size:
+        if array.dtype.kind not in "iu":
+            array = array.astype(np.float64)
+            if not np.isfinite(array).all() or (array != np.trunc(array)).any():
+                raise ValueError("QBS data, values and conditions must be integers")
+        info = np.iinfo(np.intc)
+        if array.min() < info.min or array.max() > info.max:
+            raise ValueError("QBS data, values and conditions must fit in a C int")
+    return np.ascontiguousarray(array, dtype=np.intc)
+
+
+def _budget_array(budget_fractions):
+    """Optional budget fractions argument of the *_buffer methods of cqbs."""
+    if budget_fractions is None:
+        return ()
+    return (np.ascontiguousarray(budget_fractions, dtype=np.float64),)
 
 
 class Diffix(QueryBasedSystem):
     """Implementation of a simple version of the Diffix Aspen QBS."""
 
-    def __init__(self, dataset, seed=0):
+    def __init__(self, dataset, seed=0, bitmap_index=0):
         QueryBasedSystem.__init__(
-            self, dataset, {"type": QBS_TYPE.DIFFIX, "seed": seed}
+            self,
+            dataset,
+            {"type": QBS_TYPE.DIFFIX, "seed": seed, "bitmap_index": bitmap_index},
         )
 
 
@@ -126,7 +225,9 @@ class SimpleQBS(QueryBasedSystem):
     - Bucket suppression on the exact answer, if(x<=t) -> 0.
     - Random noise addition if not bucket suppressed, + N(0, scale^2)."""
 
-    def __init__(self, dataset, bucket_threshold=0, noise_scale=0, seed=0):
+    def __init__(
+        self, dataset, bucket_threshold=0, noise_scale=0, seed=0, bitmap_index=0
+    ):
         QueryBasedSystem.__init__(
             self,
             dataset,
@@ -135,6 +236,7 @@ class SimpleQBS(QueryBasedSystem):
                 "bucket_threshold": int(bucket_threshold),
                 "noise_scale": float(noise_scale),
                 "seed": seed,
+                "bitmap_index": int(bitmap_index),
             },
         )
 
@@ -142,7 +244,7 @@ class SimpleQBS(QueryBasedSystem):
 class TableBuilder(QueryBasedSystem):
     """Implementation of TableBuilder with threshold and uniform noise."""
 
-    def __init__(self, dataset, threshold=4, noise_scale=2, seed=0):
+    def __init__(self, dataset, threshold=4, noise_scale=2, seed=0, bitmap_index=0):
         QueryBasedSystem.__init__(
             self,
             dataset,
@@ -151,6 +253,7 @@ class TableBuilder(QueryBasedSystem):
                 "threshold": threshold,
                 "noise_scale": noise_scale,
                 "seed": seed,
+                "bitmap_index": bitmap_index,
             },
         )
 
@@ -158,11 +261,16 @@ class TableBuilder(QueryBasedSystem):
 class DPLaplace(QueryBasedSystem):
     """Implementation of the Differentially Private Laplace mechanism."""
 
-    def __init__(self, dataset, epsilon, seed=0):
+    def __init__(self, dataset, epsilon, seed=0, bitmap_index=0):
         QueryBasedSystem.__init__(
             self,
             dataset,
-            {"type": QBS_TYPE.DPLAPLACE, "epsilon": epsilon, "seed": seed},
+            {
+                "type": QBS_TYPE.DPLAPLACE,
+                "epsilon": epsilon,
+                "seed": seed,
+                "bitmap_index": bitmap_index,
+            },
         )
 
     # budget_fractions *must* be provided for this QBS.
@@ -1,6 +1,11 @@
 from distutils.core import Extension, setup
 
-module = Extension("cqbs", sources=["optimqbs/qbs.c", "optimqbs/cqbsmodule.c"])
+module = Extension(
+    "cqbs",
+    sources=["optimqbs/qbs.c", "optimqbs/cqbsmodule.c"],
+    extra_compile_args=["-pthread"],
+    extra_link_args=["-pthread"],
+)
 
 setup(
     name="optimqbs",
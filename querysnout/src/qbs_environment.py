@@ -1,10 +1,11 @@
-import multiprocessing
 import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 from .helpers.utils import init_qbs
+from .optimized_qbs.qbs import set_num_threads
 
 
 class QBSEnvironment:
@@ -34,6 +35,7 @@ class QBSEnvironment:
         verbose=True,
         num_procs=1,
         qbs_seeds_to_exclude=[],
+        qbs_threads=1,
     ):
         """
         Initializes the datasets and the training/evaluation splits.
@@ -57,8 +59,13 @@ class QBSEnvironment:
             The seeds for the randomness of QBSes should be distinct from these
             values (which are used by the test QBSes).
         num_procs: int.
-            The number of processes to use when querying. Set it to 1 to query
-            the QSBes sequentially.
+            The number of threads to use when querying (the QBSes of different
+            datasets are queried at the same time, since the C QBS releases the
+            GIL). Set it to 1 to query the QSBes sequentially.
+        qbs_threads: int.
+            The number of native threads over which the C QBS splits each
+            batch of queries (see `set_num_threads`). This setting is global
+            to the process, and multiplies with num_procs.
         """
         self.dataset_sampler = dataset_sampler
         self.num_datasets = num_datasets
@@ -69,6 +76,8 @@ class QBSEnvironment:
         self.qbs_epsilon = qbs_epsilon
         self.verbose = verbose
         self.num_procs = num_procs
+        self.qbs_threads = qbs_threads
+        set_num_threads(qbs_threads)
         # Set of qbs seeds to exclude. This way, we ensure that the shadow
         # QBSes are initialized with different seeds than the test QBSes.
         self.qbs_seeds_to_exclude = set(qbs_seeds_to_exclude)
@@ -214,7 +223,7 @@ class QBSEnvironment:
         )
 
     def _query_runner(args):
-        """Performs a query on an individual process."""
+        """Performs the queries on an individual QBS (in a thread)."""
         qbs, indices, queries, budgets, di = args
         # print(qbs, indices, queries, budgets, di)
         if budgets is not None:
@@ -249,6 +258,9 @@ class QBSEnvironment:
             new_queries_clean, budgets = [q[0] for q in new_queries], None
         else:
             new_queries_clean, budgets = new_queries, None
+        # As an int array, passed to the C QBS without conversion (shared by
+        # all the threads, which only read it).
+        new_queries_clean = np.array(new_queries_clean, dtype=np.intc)
         for i, di in enumerate(self.train_didxs):
             queries_to_process.append(
                 (self.qbs[di], self.train_idxs[i], new_queries_clean, budgets, di)
@@ -259,9 +271,12 @@ class QBSEnvironment:
             )
 
         if self.num_procs > 1:
-            # Run these queries in multi-processing.
-            with multiprocessing.Pool(self.num_procs) as pool:
-                all_answers = pool.map(QBSEnvironment._query_runner, queries_to_process)
+            # Run these queries in threads: each thread queries a different
+            # QBS, and the QBSes are not pickled to worker processes.
+            with ThreadPoolExecutor(self.num_procs) as pool:
+                all_answers = list(
+                    pool.map(QBSEnvironment._query_runner, queries_to_process)
+                )
         else:
             all_answers = [
                 QBSEnvironment._query_runner(queries_to_process[i])
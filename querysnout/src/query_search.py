@@ -1,4 +1,3 @@
-import multiprocessing
 import time
 import warnings
 from collections import namedtuple
@@ -10,7 +9,7 @@ from sklearn.neural_network import MLPClassifier
 from sklearn.preprocessing import StandardScaler
 
 from .helpers.nice import display_solution
-from .helpers.utils import add_occurrences_to_list, list_to_pdf
+from .helpers.utils import add_occurrences_to_list, list_to_pdf, worker_pool
 
 
 class QuerySearch:
@@ -46,6 +45,7 @@ class QuerySearch:
         frac_elitism,
         model_type="logreg",
         num_procs=4,
+        resources=None,
     ):
         """
         Initializes the algorithm parameters and the population.
@@ -66,6 +66,8 @@ class QuerySearch:
         num_procs: int.
             Number of processes used to parallelize the fitness evaluation.
             Set it to 1 to compute the fitness sequentially.
+        resources: ResourcePolicy, optional.
+            Thread caps and CPU pinning of these processes (see `worker_pool`).
         """
         # The qbs environment (to be queried in a black-box fashion).
         self.qbs_environment = qbs_environment
@@ -81,6 +83,7 @@ class QuerySearch:
         # Type of the machine learning model (fitness).
         self.model_type = model_type
         self.num_procs = num_procs
+        self.resources = resources
 
         # Population of solutions.
         self.population = []
@@ -165,7 +168,7 @@ class QuerySearch:
             )
 
         if self.num_procs > 1:
-            with multiprocessing.Pool(self.num_procs) as pool:
+            with worker_pool(self.num_procs, self.resources) as pool:
                 results = pool.map(
                     QuerySearch._compute_fitness_parallel, args_to_process
                 )
@@ -319,6 +322,7 @@ class RandomQuerySearch(QuerySearch):
         num_queries,
         model_type="logreg",
         num_procs=4,
+        resources=None,
     ):
         """Initialize the object [see QuerySearch for inherited parameters]."""
         # Manually set the frac_elitism to keep the top model (elite) each generation.
@@ -332,6 +336,7 @@ class RandomQuerySearch(QuerySearch):
             frac_elitism,
             model_type,
             num_procs,
+            resources,
         )
 
     def mutation(self, parent):
@@ -357,6 +362,7 @@ class EvolutionaryQuerySearch(QuerySearch):
         mutation_probs,
         model_type="logreg",
         num_procs=4,
+        resources=None,
     ):
         """
         Create the object [see QuerySearch for inherited parameters].
@@ -375,6 +381,7 @@ class EvolutionaryQuerySearch(QuerySearch):
             frac_elitism,
             model_type,
             num_procs,
+            resources,
         )
         # Mutation probabilties.
         self.p_copy = mutation_probs.p_copy
@@ -1,3 +1,4 @@
+from .chunked import ChunkedCSV, iter_chunks
 from .csv import load_csv
 
-__all__ = ["load_csv"]
+__all__ = ["ChunkedCSV", "iter_chunks", "load_csv"]
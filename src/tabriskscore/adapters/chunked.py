@@ -0,0 +1,82 @@
+# src/tabriskscore/adapters/chunked.py
+
+from typing import Iterator, Union
+
+import pandas as pd
+
+from tabriskscore.adapters.csv import (
+    columns_to_frame,
+    load_csv,
+    open_columns,
+    sidecar_manifest,
+    sidecar_path,
+)
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+class ChunkedCSV:
+    """
+    不加载进内存的 CSV 数据集，按固定行数分块读取。
+
+    流式模式下 data 里放的是它而不是 DataFrame；声明了 STREAMING = True 的插件
+    通过 iter_chunks() 逐块处理，峰值内存只和 chunk_size 有关，和表大小无关。
+    cache_dir 下有有效的列式缓存（见 adapters.csv.load_csv）时直接切片 memory-map 的列，
+    否则用 pd.read_csv(chunksize=...) 逐块解析。
+    对象本身只记路径，pickle 给子进程很便宜。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cache_dir: str = ".tabriskscore_cache",
+    ):
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size 必须为正整数：{chunk_size}")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.cache_dir = cache_dir
+
+    def __repr__(self) -> str:
+        return f"ChunkedCSV({self.path!r}, chunk_size={self.chunk_size})"
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        return self.iter_chunks()
+
+    @property
+    def columns(self) -> list:
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def iter_chunks(self, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+        chunk_size = chunk_size or self.chunk_size
+        sidecar = sidecar_path(self.path, self.cache_dir)
+        manifest = sidecar_manifest(self.path, sidecar)
+        if manifest is not None:
+            columns = open_columns(sidecar, manifest)
+            for start in range(0, manifest["n_rows"], chunk_size):
+                yield columns_to_frame(columns, start, start + chunk_size)
+            return
+        with pd.read_csv(self.path, chunksize=chunk_size) as reader:
+            yield from reader
+
+    def to_frame(self) -> pd.DataFrame:
+        """整表加载（会顺便写列式缓存），给不支持流式的插件用"""
+        return load_csv(self.path, cache_dir=self.cache_dir)
+
+
+def iter_chunks(
+    data: Union[pd.DataFrame, ChunkedCSV], chunk_size: int = None
+) -> Iterator[pd.DataFrame]:
+    """
+    流式插件统一用这个遍历数据：ChunkedCSV 按块读取，
+    普通 DataFrame 按 chunk_size 切片（不指定时整表作为一块）。
+    """
+    if isinstance(data, ChunkedCSV):
+        yield from data.iter_chunks(chunk_size)
+        return
+    if not chunk_size:
+        yield data
+        return
+    for start in range(0, len(data), chunk_size):
+        yield data.iloc[start : start + chunk_size]
@@ -1,5 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
 import pandas as pd
 
+# 列式缓存目录：<cache_dir>/columnar/<文件名>-<绝对路径哈希>/，不往数据目录里写东西
+SIDECAR_DIR = "columnar"
+# 2：manifest 里记下每列原来的 dtype，读回时还原
+SIDECAR_VERSION = 2
+
+
+def load_csv(
+    path: str, use_cache: bool = True, cache_dir: str = ".tabriskscore_cache"
+) -> pd.DataFrame:
+    """
+    读取 CSV。use_cache 为 True 时，第一次读取后会在 cache_dir 下写一份列式缓存：
+    数值列按原 dtype 存成 .npy，字符串列字典编码成尽量小的整数。
+    之后只要源文件大小和 mtime 没变（或内容哈希没变），就直接 memory-map 缓存，不再解析 CSV。
+    字符串列读回时还原成原来的 dtype（一般是 object），和 pd.read_csv 的结果一致，
+    可以照常赋新值、和其他表的列比较。
+    缓存写不进去（如只读目录）时退回普通的 pd.read_csv。
+    """
+    if not use_cache:
+        return pd.read_csv(path)
+
+    sidecar = sidecar_path(path, cache_dir)
+    df = read_sidecar(path, sidecar)
+    if df is not None:
+        return df
+
+    df = pd.read_csv(path)
+    try:
+        write_sidecar(df, path, sidecar)
+    except (OSError, TypeError, ValueError):
+        return df
+    # 第一次也从缓存读回，保证每次拿到的 dtype 一致
+    cached = read_sidecar(path, sidecar)
+    return cached if cached is not None else df
+
+
+def sidecar_path(path: str, cache_dir: str = ".tabriskscore_cache") -> str:
+    path = os.path.abspath(path)
+    digest = hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, SIDECAR_DIR, f"{os.path.basename(path)}-{digest}")
+
+
+def _file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _smallest_int_dtype(n_categories: int) -> np.dtype:
+    # 编码 -1 表示缺失值，所以用有符号整数
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def write_columnar(df: pd.DataFrame, directory: str, extra: dict = None) -> None:
+    """
+    把 df 按列写入 directory（每列一个 .npy + manifest.json）。
+    先写临时目录再整体替换，写到一半被打断也不会留下损坏的缓存。
+    只支持数值 / 布尔列和值为 str、int、float、bool 的字符串 / object / category 列，
+    其他类型抛 TypeError。每列原来的 dtype 记在 manifest 里，读回时还原。
+    """
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            col = df[name]
+            entry = {"name": name, "file": f"{i}.npy", "dtype": str(col.dtype)}
+            if col.dtype.kind in "iufb":
+                values = col.to_numpy()
+                entry["kind"] = "numeric"
+            elif (
+                pd.api.types.is_object_dtype(col.dtype)
+                or pd.api.types.is_string_dtype(col.dtype)
+                or isinstance(col.dtype, pd.CategoricalDtype)
+            ):
+                codes, uniques = pd.factorize(col)
+                categories = list(uniques)
+                if not all(isinstance(c, (str, int, float, bool)) for c in categories):
+                    raise TypeError(f"列 {name!r} 含有无法缓存的值类型")
+                values = codes.astype(_smallest_int_dtype(len(categories)))
+                entry["kind"] = "category"
+                entry["categories"] = categories
+            else:
+                raise TypeError(f"列 {name!r} 的类型 {col.dtype} 无法缓存")
+            np.save(os.path.join(tmp, entry["file"]), values, allow_pickle=False)
+            columns.append(entry)
+
+        manifest = {
+            "version": SIDECAR_VERSION,
+            "n_rows": len(df),
+            "columns": columns,
+            **(extra or {}),
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.rename(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def open_columns(directory: str, manifest: dict) -> dict:
+    """
+    以 memory-map 方式打开每列的 .npy，不拷贝数据。
+    返回 {列名: (数组, categories, 原 dtype)}，数值列的 categories 为 None，
+    字符串列的数组是字典编码（-1 表示缺失）。
+    """
+    return {
+        entry["name"]: (
+            np.load(os.path.join(directory, entry["file"]), mmap_mode="r"),
+            entry.get("categories") if entry["kind"] == "category" else None,
+            entry["dtype"],
+        )
+        for entry in manifest["columns"]
+    }
+
+
+def columns_to_frame(columns: dict, start: int = 0, stop: int = None) -> pd.DataFrame:
+    """把 open_columns 打开的列的 [start, stop) 行组装成 DataFrame，字符串列还原成原来的 dtype"""
+    data = {}
+    for name, (values, categories, dtype) in columns.items():
+        values = values[start:stop]
+        if categories is not None:
+            data[name] = pd.Categorical.from_codes(values, categories=categories)
+            if dtype != "category":
+                data[name] = pd.Series(data[name]).astype(dtype).array
+        else:
+            data[name] = values
+    if data:
+        n_rows = len(next(iter(data.values())))
+    else:
+        n_rows = max(0, stop - start) if stop is not None else 0
+    return pd.DataFrame(data, index=pd.RangeIndex(start, start + n_rows))
+
+
+def read_columnar(directory: str, manifest: dict = None) -> pd.DataFrame:
+    """读回 write_columnar 写的数据；.npy 以 memory-map 方式打开"""
+    if manifest is None:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    return columns_to_frame(open_columns(directory, manifest), 0, manifest["n_rows"])
+
+
+def write_sidecar(df: pd.DataFrame, path: str, sidecar: str) -> None:
+    st = os.stat(path)
+    source = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": _file_sha256(path),
+    }
+    write_columnar(df, sidecar, extra={"source": source})
+
+
+def sidecar_manifest(path: str, sidecar: str):
+    """缓存与源文件一致时返回 manifest，否则返回 None"""
+    manifest_path = os.path.join(sidecar, "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SIDECAR_VERSION:
+            return None
+        st = os.stat(path)
+        source = manifest["source"]
+        if (st.st_size, st.st_mtime_ns) != (source["size"], source["mtime_ns"]):
+            # mtime 变了但内容没变（如 touch / 重新拷贝）：更新记录后继续用缓存
+            if st.st_size != source["size"] or _file_sha256(path) != source["sha256"]:
+                return None
+            source["mtime_ns"] = st.st_mtime_ns
+            # core.cache 依赖本模块，放在这里 import 避免循环导入
+            from tabriskscore.core.cache import atomic_write
+
+            atomic_write(manifest_path, json.dumps(manifest).encode("utf-8"))
+        return manifest
+    except (OSError, ValueError, KeyError):
+        return None
+
 
-def load_csv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
+def read_sidecar(path: str, sidecar: str):
+    """缓存有效则返回 DataFrame，否则返回 None"""
+    manifest = sidecar_manifest(path, sidecar)
+    if manifest is None:
+        return None
+    try:
+        return read_columnar(sidecar, manifest)
+    except (OSError, ValueError, KeyError):
+        return None
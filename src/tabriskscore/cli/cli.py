@@ -2,23 +2,60 @@
 
 
 import os
+from typing import Annotated, Optional
 
 import typer
 import yaml
 
-from tabriskscore.orchestrator.flow import privacy_flow
-
 app = typer.Typer(help="TabRiskScore 隐私度量 CLI")
 
 
 @app.command("evaluate")
 def evaluate(
-    config_file: str = typer.Option(
-        "config.yaml", "--config", "-c", help="配置文件路径"
-    ),
-    output_file: str = typer.Option(
-        "report.html", "-o", "--output", help="报告输出路径（.html 或 .pdf）"
-    ),
+    config_file: Annotated[
+        str, typer.Option("--config", "-c", help="配置文件路径")
+    ] = "config.yaml",
+    output_file: Annotated[
+        str, typer.Option("-o", "--output", help="报告输出路径（.html 或 .pdf）")
+    ] = "report.html",
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "--jobs", "-j", min=1, help="并行运行的插件进程数（1 表示顺序执行）"
+        ),
+    ] = 1,
+    timeout: Annotated[
+        Optional[float],
+        typer.Option("--timeout", help="单个插件的最长运行时间（秒），超时即终止"),
+    ] = None,
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="不读也不写插件结果缓存，全部重新计算"),
+    ] = False,
+    refresh: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            "--refresh", help="忽略缓存、强制重算的插件（可重复指定），如 lnb_plugin"
+        ),
+    ] = None,
+    plugins: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            "--plugin",
+            "-p",
+            help="只运行指定插件（可重复指定），默认运行除 lnb_wrapper 外的全部插件",
+        ),
+    ] = None,
+    stream: Annotated[
+        bool,
+        typer.Option(
+            "--stream",
+            help="流式模式：不把 CSV 整表读进内存，支持流式的插件按块处理",
+        ),
+    ] = False,
+    chunk_size: Annotated[
+        int, typer.Option("--chunk-size", min=1, help="流式模式下每块的行数")
+    ] = 100_000,
 ):
     """
     自动读取根目录下的 data/ 文件夹里的 original.csv、synthetic.csv，
@@ -31,7 +68,26 @@ def evaluate(
         typer.secho(f"❌ data 文件夹不存在：{data_dir}", fg=typer.colors.RED)
         raise typer.Exit(1)
 
-    privacy_flow(data_dir, output_file)
+    # 延迟 import：--help 等不需要加载 pandas / 插件
+    from tabriskscore.orchestrator.flow import privacy_flow
+
+    config = {}
+    if os.path.isfile(config_file):
+        with open(config_file, encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+    privacy_flow(
+        data_dir,
+        output_file,
+        jobs=jobs,
+        timeout=timeout,
+        config=config,
+        use_cache=not no_cache,
+        refresh=refresh or [],
+        selected=plugins or None,
+        stream=stream,
+        chunk_size=chunk_size,
+    )
     typer.secho(f"✅ 报告生成完成：{output_file}", fg=typer.colors.GREEN)
 
 
@@ -0,0 +1,15 @@
+from .artifacts import ArtifactStore, artifacts_from_config, register_artifact
+from .fingerprint import CopyCounter, RowIndex, match_rows, row_fingerprints
+from .neighbours import estimate_recall, make_index
+
+__all__ = [
+    "ArtifactStore",
+    "CopyCounter",
+    "RowIndex",
+    "artifacts_from_config",
+    "estimate_recall",
+    "make_index",
+    "match_rows",
+    "register_artifact",
+    "row_fingerprints",
+]
@@ -0,0 +1,91 @@
+# src/tabriskscore/core/artifacts.py
+
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+from tabriskscore.adapters.csv import load_csv
+
+# artifact 类型 → 构建函数 builder(store, *args)
+_BUILDERS: Dict[str, Callable[..., Any]] = {}
+
+
+def register_artifact(kind: str):
+    """
+    注册一种 artifact 的构建函数，用法：
+
+        @register_artifact("csv")
+        def _build_csv(store, path): ...
+
+    构建函数的第一个参数是 ArtifactStore 本身，可以在里面继续 get 其他 artifact。
+    """
+
+    def decorator(builder: Callable[..., Any]) -> Callable[..., Any]:
+        _BUILDERS[kind] = builder
+        return builder
+
+    return decorator
+
+
+class ArtifactStore:
+    """
+    单次评估范围内共享的预处理结果（原始表、离散化表、one-hot 编码器……）。
+
+    同一个 (kind, *args) 只会构建一次，之后所有插件拿到的都是同一个对象，
+    因此取到的结果一律视为只读，需要修改时请先 .copy()。
+    参数里的路径按字符串原样作为 key，同一个文件请用同一种写法。
+    cache_dir 是 CSV 列式缓存所在的目录（见 adapters.csv.load_csv）。
+    """
+
+    def __init__(self, cache_dir: str = ".tabriskscore_cache"):
+        self.cache_dir = cache_dir
+        self._cache: Dict[Tuple, Any] = {}
+        self._lock = threading.RLock()
+
+    def get(self, kind: str, *args) -> Any:
+        key = (kind, *args)
+        with self._lock:
+            if key not in self._cache:
+                if kind not in _BUILDERS:
+                    raise KeyError(f"未注册的 artifact 类型：{kind}")
+                self._cache[key] = _BUILDERS[kind](self, *args)
+            return self._cache[key]
+
+    def put(self, kind: str, *args, value: Any) -> None:
+        with self._lock:
+            self._cache[(kind, *args)] = value
+
+    def __contains__(self, key: Tuple) -> bool:
+        return key in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    # 进程池（spawn）需要 pickle 整个 store，锁不能跟着走
+    def __getstate__(self):
+        return {"cache_dir": self.cache_dir, "_cache": self._cache}
+
+    def __setstate__(self, state):
+        self.cache_dir = state["cache_dir"]
+        self._cache = state["_cache"]
+        self._lock = threading.RLock()
+
+
+def artifacts_from_config(config: Dict) -> ArtifactStore:
+    """
+    取出 privacy_flow 放进 config 的共享 store；
+    插件被单独调用（没有 store）时返回一个临时的新 store。
+    """
+    artifacts = config.get("artifacts")
+    return artifacts if artifacts is not None else ArtifactStore()
+
+
+@register_artifact("csv")
+def _build_csv(store: ArtifactStore, path: str):
+    return load_csv(path, cache_dir=store.cache_dir)
+
+
+@register_artifact("json")
+def _build_json(store: ArtifactStore, path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,372 @@
+# src/tabriskscore/core/cache.py
+
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from importlib import metadata
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from tabriskscore.adapters.csv import SIDECAR_VERSION, read_columnar, write_columnar
+from tabriskscore.core.fingerprint import row_fingerprints
+
+# 这些 config 项只影响运行方式，不影响插件结果，不参与缓存 key
+RUNTIME_CONFIG_KEYS = {
+    "artifacts",
+    "cache_dir",
+    "cache_max_mb",
+    "enable_plugins",
+    "n_workers",
+    "resources",
+}
+# 嵌套在某个 config 项里、同样只影响运行方式的参数
+RUNTIME_NESTED_CONFIG_KEYS = {
+    "mia_params": {
+        "checkpoint",
+        "dataset_cache",
+        "dataset_cache_mb",
+        "n_workers",
+        "resume",
+    },
+}
+# 所有插件都依赖的代码：它们变了，缓存的结果也可能变
+DEPENDENCY_MODULES = ("tabriskscore.core", "tabriskscore.adapters", "optimqbs", "cqbs")
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """流式计算文件内容的 sha256"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _module_sources(mod_name: str, whole_dir: bool = None) -> Tuple[str, list]:
+    """
+    (模块所在目录, 要哈希的文件)。whole_dir 为 True 时取目录下所有 .py，
+    否则只取模块文件本身（C 扩展就是 .so）；为 None 时包取整个目录，单个模块只取自身。
+    找不到模块时文件列表为空，不 import 模块本身。
+    """
+    try:
+        spec = importlib.util.find_spec(mod_name)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return "", []
+    mod_dir = os.path.dirname(spec.origin)
+    if whole_dir is None:
+        whole_dir = spec.submodule_search_locations is not None
+    if not whole_dir:
+        return mod_dir, [spec.origin]
+    return mod_dir, sorted(
+        os.path.join(root, f)
+        for root, _, files in os.walk(mod_dir)
+        for f in files
+        if f.endswith(".py")
+    )
+
+
+def plugin_fingerprint(mod_name: str) -> str:
+    """
+    插件代码的指纹：tabriskscore 版本 + 插件源码内容 + DEPENDENCY_MODULES 的源码
+    （core/、adapters/、optimqbs 及其 C 扩展）。
+    插件位于子包中（如 plugins/lnb/）时，整个子包的 .py 都算进去。
+    只查找模块文件，不 import 插件本身。
+    """
+    try:
+        version = metadata.version("tabriskscore")
+    except metadata.PackageNotFoundError:
+        version = "dev"
+    h = hashlib.sha256(f"{mod_name}:{version}".encode())
+
+    mod_dir, _ = _module_sources(mod_name, whole_dir=False)
+    modules = [(mod_name, os.path.basename(mod_dir) != "plugins")]
+    modules += [(dep, None) for dep in DEPENDENCY_MODULES]
+    for name, whole_dir in modules:
+        mod_dir, sources = _module_sources(name, whole_dir)
+        for src in sources:
+            h.update(f"{name}:{os.path.relpath(src, mod_dir)}".encode())
+            with open(src, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    按内容寻址的插件结果磁盘缓存。
+
+    key = (插件代码指纹, 有效 config, 每个输入文件的内容哈希)；
+    值为插件返回的 dict / list[dict]，pickle 后存成 <key>.pickle。
+    总大小超过 max_bytes 时按最近使用时间（文件 mtime）淘汰最旧的条目。
+    """
+
+    def __init__(
+        self, cache_dir: str = ".tabriskscore_cache", max_bytes: int = 1 << 30
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 输入文件的哈希按 (大小, mtime) 记忆，文件没动过就不再重新哈希
+        self._digest_index_path = os.path.join(cache_dir, "digests.json")
+        self._digest_index: Dict[str, list] = {}
+        os.makedirs(os.path.join(cache_dir, "results"), exist_ok=True)
+        try:
+            with open(self._digest_index_path, encoding="utf-8") as f:
+                self._digest_index = json.load(f)
+        except (OSError, ValueError):
+            self._digest_index = {}
+
+    def input_digest(self, path: str) -> str:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._digest_index.get(path)
+            if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                return entry[2]
+        digest = file_digest(path)
+        with self._lock:
+            self._digest_index[path] = [st.st_size, st.st_mtime_ns, digest]
+            atomic_write(
+                self._digest_index_path,
+                json.dumps(self._digest_index).encode("utf-8"),
+            )
+        return digest
+
+    def key(self, mod_name: str, config: Dict, input_files: Iterable[str]) -> str:
+        effective = {k: v for k, v in config.items() if k not in RUNTIME_CONFIG_KEYS}
+        for section, runtime_keys in RUNTIME_NESTED_CONFIG_KEYS.items():
+            if isinstance(effective.get(section), dict):
+                effective[section] = {
+                    k: v for k, v in effective[section].items() if k not in runtime_keys
+                }
+        inputs = sorted(
+            (os.path.abspath(p), self.input_digest(p))
+            for p in set(input_files)
+            if os.path.isfile(p)
+        )
+        payload = json.dumps(
+            {
+                "plugin": mod_name,
+                "code": plugin_fingerprint(mod_name),
+                "config": effective,
+                "inputs": inputs,
+            },
+            sort_keys=True,
+            default=repr,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "results", f"{key}.pickle")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None
+        # 命中即刷新 mtime，作为 LRU 的“最近使用时间”
+        os.utime(path)
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        atomic_write(self._path(key), pickle.dumps(value))
+        self._evict()
+
+    def _evict(self) -> None:
+        results_dir = os.path.join(self.cache_dir, "results")
+        entries = []
+        for name in os.listdir(results_dir):
+            # 跳过 atomic_write 还在写的 .tmp 文件
+            if not name.endswith(".pickle"):
+                continue
+            path = os.path.join(results_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+class DatasetStore:
+    """
+    按内容寻址的影子合成数据集磁盘缓存（给 LNB 的 MIA 用）。
+
+    key = (生成器名, epsilon, 种子, 元数据的哈希, 训练集逐行指纹的哈希, n_synth, 第几个样本)：
+    训练集的行内容、行顺序、列名或元数据（列类型、取值范围）有任何变化都会换 key。
+    每个数据集用 adapters.csv 的列式格式存成 shadow_datasets/<key>/（每列一个 .npy + manifest.json），
+    读回时 memory-map，字符串列按 manifest 里记的 dtype 还原成原来的类型（见 adapters.csv）。
+    总大小超过 max_bytes 时按最近使用时间（manifest.json 的 mtime）淘汰。
+    与 ResultCache 共用 cache_dir 时各用各的子目录（shadow_datasets/ 与 results/）、各自的上限，
+    淘汰只看自己子目录里的条目，互不影响。
+    对象只记路径和上限，可以直接 pickle 给进程池的 worker，各 worker 生成完立即写入。
+    """
+
+    def __init__(
+        self, cache_dir: str = ".tabriskscore_cache", max_bytes: int = 4 << 30
+    ):
+        self.root = os.path.join(cache_dir, "shadow_datasets")
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(
+        generator_name: str,
+        epsilon: float,
+        seed: int,
+        df_train: pd.DataFrame,
+        meta_data: Any,
+        n_synth: int,
+        sample: int = 0,
+        n_samples: int = 1,
+    ) -> str:
+        """meta_data 是生成器训练用的元数据；一次训练抽出 n_samples 个数据集时，sample 是其中第几个"""
+        meta_digest = hashlib.sha256(
+            json.dumps(meta_data, sort_keys=True, default=repr).encode("utf-8")
+        ).hexdigest()
+        h = hashlib.sha256(
+            json.dumps(
+                {
+                    "generator": generator_name,
+                    "epsilon": float(epsilon),
+                    "seed": int(seed),
+                    "meta_data": meta_digest,
+                    "n_synth": int(n_synth),
+                    "sample": [int(sample), int(n_samples)],
+                    "columns": [str(c) for c in df_train.columns],
+                },
+                sort_keys=True,
+            ).encode("utf-8")
+        )
+        h.update(row_fingerprints(df_train, bits=128).tobytes())
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """命中返回数据集（列以 memory-map 方式打开），未命中返回 None"""
+        path = self._path(key)
+        manifest_path = os.path.join(path, "manifest.json")
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != SIDECAR_VERSION:
+                # 旧格式的条目没有记每列的 dtype，当作未命中重新生成
+                return None
+            df = read_columnar(path, manifest)
+            os.utime(manifest_path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        """写入一个数据集；列类型无法按列式存储（或写盘失败）时不缓存，返回 False"""
+        try:
+            write_columnar(df, self._path(key))
+        except (OSError, TypeError, ValueError):
+            return False
+        self._evict()
+        return True
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            try:
+                used = os.stat(os.path.join(path, "manifest.json")).st_mtime
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+            except OSError:
+                # 其他进程正在写入或淘汰的条目
+                continue
+            entries.append((used, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+class Checkpoint:
+    """
+    长任务的断点目录：每完成一项工作就原子地写一个 <name>.pickle，
+    进程被杀、节点被抢占后重跑时可以跳过已完成的部分。
+
+    params 是决定结果的全部参数，记在 params.json 里：resume 时参数不一致直接报错，
+    不会把不同配置的中间结果混在一起；不 resume 时清空旧条目重新开始。
+    """
+
+    def __init__(self, path: str, params: Dict, resume: bool = False):
+        self.path = path
+        self._entries = os.path.join(path, "entries")
+        params_path = os.path.join(path, "params.json")
+        payload = json.dumps(params, sort_keys=True, default=repr)
+        stored = None
+        if resume:
+            try:
+                with open(params_path, encoding="utf-8") as f:
+                    stored = f.read()
+            except OSError:
+                stored = None
+            if stored is not None and stored != payload:
+                raise ValueError(
+                    f"checkpoint {path} was written with other parameters; "
+                    "remove it or run without resume"
+                )
+        if stored is None:
+            shutil.rmtree(self._entries, ignore_errors=True)
+        os.makedirs(self._entries, exist_ok=True)
+        atomic_write(params_path, payload.encode("utf-8"))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._entries, f"{name}.pickle")
+
+    def get(self, name: str) -> Tuple[bool, Any]:
+        try:
+            with open(self._path(name), "rb") as f:
+                return True, pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return False, None
+
+    def put(self, name: str, value: Any) -> None:
+        atomic_write(self._path(name), pickle.dumps(value))
+
+    def discard(self, prefix: str) -> None:
+        """删掉名字以 prefix 开头的条目，用在它们已经汇总进另一个条目之后"""
+        for name in os.listdir(self._entries):
+            if name.startswith(prefix) and name.endswith(".pickle"):
+                try:
+                    os.remove(os.path.join(self._entries, name))
+                except OSError:
+                    continue
+
+
+def atomic_write(path: str, payload: bytes) -> None:
+    """先写临时文件再 rename，进程中途被杀也不会留下半个文件"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
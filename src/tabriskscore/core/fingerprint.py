@@ -0,0 +1,171 @@
+# src/tabriskscore/core/fingerprint.py
+
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# pd.util.hash_array 要求 16 个字符的 key；128 位指纹用两个不同的 key 各算一遍
+_HASH_KEYS = ("tabriskscore-fp0", "tabriskscore-fp1")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _column_hash(col: pd.Series, hash_key: str) -> np.ndarray:
+    """
+    单列的 64 位哈希。数值（含布尔、数值型 category）统一转成 float64 再哈希，
+    这样 1、1.0、True 在不同表里类型不同也能对上，和按 tuple 比较的语义一致；
+    加 0.0 把 -0.0 归一成 0.0。字符串 / category 列按值哈希，与编码方式无关。
+    """
+    dtype = col.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        numeric = pd.api.types.is_numeric_dtype(dtype.categories.dtype)
+    else:
+        numeric = pd.api.types.is_numeric_dtype(dtype)
+    if numeric:
+        values = np.asarray(col, dtype=np.float64) + 0.0
+        return pd.util.hash_array(values, hash_key=hash_key)
+    return pd.util.hash_pandas_object(col, index=False, hash_key=hash_key).to_numpy()
+
+
+def row_fingerprints(
+    df: pd.DataFrame, columns: List[str] = None, bits: int = 128
+) -> np.ndarray:
+    """
+    逐列向量化地计算每行的指纹，不把任何单元格装箱成 Python 对象。
+    默认 bits=128 返回 (n, 2)，碰撞概率可忽略；bits=64 返回形状 (n,) 的 uint64，
+    省一半内存，但表很大时可能有碰撞且不会被发现。
+    columns 指定参与比较的列及其顺序（默认 df 的全部列）。
+    """
+    if bits not in (64, 128):
+        raise ValueError(f"bits 只能是 64 或 128：{bits}")
+    if columns is not None:
+        df = df[columns]
+    keys = _HASH_KEYS[: bits // 64]
+    out = np.empty((len(df), len(keys)), dtype=np.uint64)
+    for j, key in enumerate(keys):
+        h = np.full(len(df), j + 1, dtype=np.uint64)
+        for name in df.columns:
+            h *= _MIX
+            h ^= _column_hash(df[name], key)
+        out[:, j] = h
+    return out[:, 0] if bits == 64 else out
+
+
+def _as_2d(fingerprints: np.ndarray) -> np.ndarray:
+    fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+    return fingerprints.reshape(len(fingerprints), -1)
+
+
+class RowIndex:
+    """
+    参考表（如 Xtrain）的指纹索引：排好序的不重复指纹 + 每个指纹出现的次数。
+    查询时用 searchsorted 二分定位，整批向量化完成。
+    """
+
+    def __init__(self, fingerprints: np.ndarray):
+        fps = _as_2d(fingerprints)
+        n = len(fps)
+        if fps.shape[1] == 1:
+            order = np.argsort(fps[:, 0], kind="stable")
+        else:
+            order = np.lexsort(fps.T[::-1])
+        ordered = fps[order]
+        new = np.ones(n, dtype=bool)
+        new[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+        group = np.cumsum(new) - 1
+        self.keys = ordered[new]
+        self.counts = np.bincount(group, minlength=len(self.keys))
+        # 参考表每一行对应的 key 编号
+        self.row_key = np.empty(n, dtype=np.intp)
+        self.row_key[order] = group
+
+    @classmethod
+    def from_frames(
+        cls, frames: Iterable[pd.DataFrame], columns: List[str] = None, bits: int = 128
+    ) -> "RowIndex":
+        """逐块构建（流式模式），内存只需每行 bits/8 字节"""
+        parts = [row_fingerprints(df, columns, bits) for df in frames]
+        if not parts:
+            return cls(np.empty((0, bits // 64), dtype=np.uint64))
+        return cls(np.concatenate(parts))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def locate(self, fingerprints: np.ndarray) -> np.ndarray:
+        """返回每个查询指纹对应的 key 编号，不存在的为 -1"""
+        q = _as_2d(fingerprints)
+        ids = np.full(len(q), -1, dtype=np.intp)
+        if not len(self.keys) or not len(q):
+            return ids
+        primary = self.keys[:, 0]
+        left = np.searchsorted(primary, q[:, 0], side="left")
+        right = np.searchsorted(primary, q[:, 0], side="right")
+        single = np.flatnonzero(right - left == 1)
+        ok = (self.keys[left[single]] == q[single]).all(axis=1)
+        ids[single[ok]] = left[single[ok]]
+        # 只有 128 位指纹的前 64 位碰撞时才会走到这里，逐个比对
+        for i in np.flatnonzero(right - left > 1):
+            for j in range(left[i], right[i]):
+                if (self.keys[j] == q[i]).all():
+                    ids[i] = j
+                    break
+        return ids
+
+
+class CopyCounter:
+    """
+    把查询表（如 Xsyn）逐块和一个 RowIndex 比对，累计：
+    - n_query / n_copied：查询行总数、与参考表某行完全相同的查询行数
+    - copies：参考表每个不重复行被复制了多少次
+    """
+
+    def __init__(self, index: RowIndex):
+        self.index = index
+        self.copies = np.zeros(len(index), dtype=np.int64)
+        self.n_query = 0
+        self.n_copied = 0
+
+    def update(self, fingerprints: np.ndarray) -> np.ndarray:
+        """比对一批查询指纹，返回这一批每行是否命中"""
+        ids = self.index.locate(fingerprints)
+        hit = ids >= 0
+        self.copies += np.bincount(ids[hit], minlength=len(self.index))
+        self.n_query += len(ids)
+        self.n_copied += int(hit.sum())
+        return hit
+
+    @property
+    def common(self) -> int:
+        """两边都出现过的不重复行数（即两个行集合交集的大小）"""
+        return int(np.count_nonzero(self.copies))
+
+    @property
+    def reference_copies(self) -> np.ndarray:
+        """参考表每一行（按原顺序）在查询表里出现的次数"""
+        return self.copies[self.index.row_key]
+
+    @property
+    def copy_rate(self) -> float:
+        return self.n_copied / self.n_query if self.n_query else 0.0
+
+
+def match_rows(
+    query: pd.DataFrame,
+    reference: pd.DataFrame,
+    columns: List[str] = None,
+    bits: int = 128,
+) -> dict:
+    """
+    整表一次比对的便捷接口。columns 默认取 reference 的列，query 按列名对齐。
+    返回 common（不重复的共同行数）、query_matched（每个查询行是否命中）、
+    reference_copies（每个参考行被复制的次数）。
+    """
+    columns = list(reference.columns) if columns is None else columns
+    counter = CopyCounter(RowIndex(row_fingerprints(reference, columns, bits)))
+    matched = counter.update(row_fingerprints(query, columns, bits))
+    return {
+        "common": counter.common,
+        "query_matched": matched,
+        "reference_copies": counter.reference_copies,
+    }
@@ -0,0 +1,172 @@
+# src/tabriskscore/core/neighbours.py
+
+from typing import Dict, Tuple, Type
+
+import numpy as np
+
+# 可选的近邻搜索后端：
+#   exact —— 分块矩阵乘精确搜索
+#   tree  —— sklearn 的 BallTree / KDTree，精确，低维时更快
+#   lsh   —— 随机超平面 LSH，只在同桶候选里精排，近似但可扩展到很大的表
+# 距离一律是欧氏距离；查询统一返回 (距离, 下标)，按距离从小到大排列。
+
+
+class NeighbourIndex:
+    """近邻索引的基类：用参考点集 data（n × d）构建，query 返回每个查询点的 k 个最近邻"""
+
+    def __init__(self, data: np.ndarray):
+        self.data = np.asarray(data, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def query(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+
+def _k_smallest(d2: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每行取 k 个最小的平方距离，返回排好序的 (欧氏距离, 列下标)"""
+    idx = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(d2, idx, axis=1)
+    order = np.argsort(vals, axis=1, kind="stable")
+    idx = np.take_along_axis(idx, order, axis=1)
+    vals = np.take_along_axis(vals, order, axis=1)
+    return np.sqrt(np.maximum(vals, 0.0)), idx
+
+
+class ExactIndex(NeighbourIndex):
+    """精确搜索：|q-x|² = |q|² + |x|² - 2 q·x，按查询分块做矩阵乘，内存受 block_size 约束"""
+
+    def __init__(self, data: np.ndarray, block_size: int = None):
+        super().__init__(data)
+        self._sq_norms = np.einsum("ij,ij->i", self.data, self.data)
+        self.block_size = block_size or max(
+            1, (64 << 20) // (8 * max(len(self.data), 1))
+        )
+
+    def query(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float64)
+        k = min(k, len(self.data))
+        dists = np.empty((len(queries), k), dtype=np.float64)
+        ids = np.empty((len(queries), k), dtype=np.intp)
+        for start in range(0, len(queries), self.block_size):
+            q = queries[start : start + self.block_size]
+            d2 = np.einsum("ij,ij->i", q, q)[:, None] + self._sq_norms[None, :]
+            d2 -= 2.0 * (q @ self.data.T)
+            stop = start + len(q)
+            dists[start:stop], ids[start:stop] = _k_smallest(d2, k)
+        return dists, ids
+
+
+class TreeIndex(NeighbourIndex):
+    """sklearn 的树索引（algorithm 可选 ball_tree / kd_tree / auto），结果精确"""
+
+    def __init__(self, data: np.ndarray, algorithm: str = "ball_tree", leaf_size=40):
+        from sklearn.neighbors import NearestNeighbors
+
+        super().__init__(data)
+        self._nn = NearestNeighbors(algorithm=algorithm, leaf_size=leaf_size)
+        self._nn.fit(self.data)
+
+    def query(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(k, len(self.data))
+        return self._nn.kneighbors(np.asarray(queries, dtype=np.float64), k)
+
+
+class LSHIndex(NeighbourIndex):
+    """
+    随机超平面（SimHash）LSH：n_tables 张哈希表，每张用 n_bits 个过数据均值的
+    随机超平面把点编码成整数桶号。查询时取各表同桶点的并集作为候选，
+    再对候选算精确距离取前 k；候选不足 k 个时退回对全表精确搜索。
+    n_bits 越大桶越小越快、召回越低；n_tables 越多召回越高。
+    """
+
+    def __init__(
+        self, data: np.ndarray, n_tables: int = 8, n_bits: int = 12, seed: int = 0
+    ):
+        super().__init__(data)
+        rng = np.random.default_rng(seed)
+        self._center = self.data.mean(axis=0) if len(self.data) else 0.0
+        self._planes = rng.standard_normal((n_tables, self.data.shape[1], n_bits))
+        self._weights = np.left_shift(1, np.arange(n_bits, dtype=np.int64))
+        self._order = []
+        self._codes = []
+        for t in range(n_tables):
+            codes = self._hash(self.data, t)
+            order = np.argsort(codes, kind="stable")
+            self._order.append(order)
+            self._codes.append(codes[order])
+
+    def _hash(self, points: np.ndarray, table: int) -> np.ndarray:
+        bits = (points - self._center) @ self._planes[table] > 0
+        return bits @ self._weights
+
+    def query(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float64)
+        k = min(k, len(self.data))
+        bounds = []
+        for t, codes in enumerate(self._codes):
+            q_codes = self._hash(queries, t)
+            bounds.append(
+                (
+                    np.searchsorted(codes, q_codes, side="left"),
+                    np.searchsorted(codes, q_codes, side="right"),
+                )
+            )
+        dists = np.empty((len(queries), k), dtype=np.float64)
+        ids = np.empty((len(queries), k), dtype=np.intp)
+        for i, q in enumerate(queries):
+            candidates = np.unique(
+                np.concatenate(
+                    [
+                        order[left[i] : right[i]]
+                        for order, (left, right) in zip(self._order, bounds)
+                    ]
+                )
+            )
+            if len(candidates) < k:
+                candidates = np.arange(len(self.data))
+            diff = self.data[candidates] - q
+            d2 = np.einsum("ij,ij->i", diff, diff)[None, :]
+            dists[i], local = _k_smallest(d2, k)
+            ids[i] = candidates[local[0]]
+        return dists, ids
+
+
+BACKENDS: Dict[str, Type[NeighbourIndex]] = {
+    "exact": ExactIndex,
+    "tree": TreeIndex,
+    "lsh": LSHIndex,
+}
+
+
+def make_index(backend: str, data: np.ndarray, **params) -> NeighbourIndex:
+    """按名字构建近邻索引，params 原样传给对应后端"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的近邻后端：{backend}，可选：{sorted(BACKENDS)}")
+    return BACKENDS[backend](data, **params)
+
+
+def estimate_recall(
+    index: NeighbourIndex,
+    queries: np.ndarray,
+    k: int,
+    n_samples: int = 200,
+    seed: int = 0,
+) -> float:
+    """
+    抽 n_samples 个查询点，和精确搜索比较，估计 index 的 k 近邻召回率。
+    数据里有大量等距点（离散列很常见），按下标比较会低估召回，
+    所以近似结果中距离不超过精确第 k 近距离的邻居都算命中。
+    """
+    queries = np.asarray(queries, dtype=np.float64)
+    if not len(queries) or not len(index):
+        return 1.0
+    rng = np.random.default_rng(seed)
+    sample = queries[
+        rng.choice(len(queries), size=min(n_samples, len(queries)), replace=False)
+    ]
+    exact_dists, _ = ExactIndex(index.data).query(sample, k)
+    approx_dists, _ = index.query(sample, k)
+    kth = exact_dists[:, -1:] + 1e-9
+    return float(np.mean(approx_dists <= kth))
@@ -0,0 +1,112 @@
+# src/tabriskscore/core/resources.py
+
+import multiprocessing
+import os
+import sys
+from typing import Any, Callable, Dict, Optional
+
+# 这些环境变量决定 OpenMP / BLAS / torch 在 worker 里各开几个线程；
+# 只对 worker 里之后才加载的库生效，已加载的库由 threadpoolctl 负责
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# worker 进程里的状态：threadpoolctl 的限制对象要一直持有，否则限制会被撤销
+_WORKER: Dict[str, Any] = {}
+
+
+def available_cpus() -> int:
+    """当前进程允许使用的 CPU 数（考虑 taskset / cgroup 的绑核），拿不到时退回 os.cpu_count()"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+class ResourcePolicy:
+    """
+    进程池的资源策略：开几个 worker、每个 worker 里 BLAS / OpenMP / torch / C QBS 最多开几个线程、是否绑核。
+
+    每个 worker 里的数值库默认都会按“整机核数”开线程，N 个 worker 就是 N × 核数个线程，
+    在多核机器上严重超订。这里统一在 worker 的 initializer 里把线程数压到 threads_per_worker，
+    并且 worker 数默认取 可用核数 // threads_per_worker。
+
+    对象本身可以 pickle，pool_kwargs() 给出的 initializer 先应用策略，再调用各进程池自己的 initializer，
+    ProcessPoolExecutor 和 multiprocessing.Pool 都能用。
+    """
+
+    def __init__(self, threads_per_worker: int = 1, pin_cpus: bool = False):
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        self.pin_cpus = bool(pin_cpus)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "ResourcePolicy":
+        """从 config.yaml 的 resources 段构造，缺省项用默认值"""
+        config = config or {}
+        return cls(
+            threads_per_worker=config.get("threads_per_worker", 1),
+            pin_cpus=config.get("pin_cpus", False),
+        )
+
+    def n_workers(self, requested: Optional[int] = None, n_tasks: int = None) -> int:
+        """
+        requested 为 None 时按可用核数和每个 worker 的线程数自动决定；
+        给了 n_tasks 时不超过任务数
+        """
+        n = requested or max(1, available_cpus() // self.threads_per_worker)
+        if n_tasks is not None:
+            n = min(n, n_tasks)
+        return max(1, n)
+
+    def pool_kwargs(self, initializer: Callable = None, initargs: tuple = ()) -> Dict:
+        """进程池的 initializer / initargs 参数，绑核时额外带一个共享计数器给 worker 分配核"""
+        slots = multiprocessing.Value("i", 0) if self.pin_cpus else None
+        return {
+            "initializer": _init_worker,
+            "initargs": (self, slots, initializer, initargs),
+        }
+
+    def apply(self, slot: int = None) -> None:
+        """在 worker 进程里应用策略；slot 是该 worker 的序号，绑核时用来挑核"""
+        threads = str(self.threads_per_worker)
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = threads
+        try:
+            from threadpoolctl import threadpool_limits
+
+            _WORKER["thread_limits"] = threadpool_limits(self.threads_per_worker)
+        except ImportError:
+            pass
+        # torch 不归 threadpoolctl 管；没加载时靠 OMP_NUM_THREADS，加载了就直接设
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(self.threads_per_worker)
+        # C QBS（optimqbs 的 cqbs）每批查询拆给几个原生线程，同样只能设已加载的
+        cqbs = sys.modules.get("cqbs")
+        if cqbs is not None:
+            cqbs.set_num_threads(self.threads_per_worker)
+        if slot is not None and hasattr(os, "sched_setaffinity"):
+            cpus = sorted(os.sched_getaffinity(0))
+            first = slot * self.threads_per_worker
+            os.sched_setaffinity(
+                0,
+                {cpus[(first + i) % len(cpus)] for i in range(self.threads_per_worker)},
+            )
+
+
+def _init_worker(
+    policy: ResourcePolicy, slots, initializer: Callable, initargs: tuple
+) -> None:
+    slot = None
+    if slots is not None:
+        with slots.get_lock():
+            slot = slots.value
+            slots.value += 1
+    policy.apply(slot)
+    if initializer is not None:
+        initializer(*initargs)
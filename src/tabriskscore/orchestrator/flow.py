@@ -1,72 +1,391 @@
 # src/tabriskscore/orchestrator/flow.py
 
 import importlib
+import logging
+import multiprocessing
 import os
-import pkgutil
-import sys
-import types
+import pickle
+import signal
+import time
+from collections.abc import Mapping
+from importlib import metadata
+from multiprocessing.connection import wait as wait_connections
 
 import typer
 
-from tabriskscore.adapters.csv import load_csv
+from tabriskscore.adapters.chunked import DEFAULT_CHUNK_SIZE, ChunkedCSV
+from tabriskscore.core.artifacts import ArtifactStore, artifacts_from_config
+from tabriskscore.core.cache import ResultCache
 from tabriskscore.reports.render import render_html
 
+# 插件代码可能抛出任何异常：这些地方只能整体捕获，但要把 traceback 记下来，不能只留一句 str(e)
+logger = logging.getLogger(__name__)
 
-def discover_plugins():
+
+def discover_plugins(
+    selected: list[str] = None, enabled: list[str] = ()
+) -> dict[str, str]:
     """
-    自动发现并 import 所有 plugins 目录下除了 hooks.py 以外的模块
+    只读插件元数据，不 import 插件模块：
+    内置清单 tabriskscore.plugins.BUILTIN_PLUGINS + 已安装包在 "tabriskscore"
+    entry point 组里声明的插件（同名时以 entry point 为准）。
+
+    返回 {插件名: 模块路径}；selected 非空时只保留其中列出的插件
+    （插件名或模块路径均可）。selected 为空时不包括 OPT_IN_PLUGINS（如 lnb_wrapper），
+    除非它们列在 enabled 里。
     """
-    import tabriskscore.plugins as plug_pkg
+    from tabriskscore.plugins import BUILTIN_PLUGINS, OPT_IN_PLUGINS
 
-    for finder, name, _ in pkgutil.iter_modules(plug_pkg.__path__):
-        if name == "hooks":
-            continue
-        importlib.import_module(f"tabriskscore.plugins.{name}")
+    plugins = dict(BUILTIN_PLUGINS)
+    eps = metadata.entry_points()
+    if hasattr(eps, "select"):
+        group = eps.select(group="tabriskscore")
+    else:  # Python 3.9
+        group = eps.get("tabriskscore", [])
+    for ep in sorted(group, key=lambda ep: ep.name):
+        plugins[ep.name] = ep.value.partition(":")[0].strip()
+
+    if selected:
+        wanted = set(selected)
+        unknown = wanted - set(plugins) - set(plugins.values())
+        if unknown:
+            typer.secho(
+                f"⚠️ 未知插件：{sorted(unknown)}，可选：{sorted(plugins)}",
+                fg=typer.colors.YELLOW,
+            )
+        plugins = {
+            name: mod_name
+            for name, mod_name in plugins.items()
+            if name in wanted or mod_name in wanted
+        }
+    else:
+        enabled = set(enabled or ())
+        plugins = {
+            name: mod_name
+            for name, mod_name in plugins.items()
+            if name not in OPT_IN_PLUGINS or name in enabled or mod_name in enabled
+        }
+    return plugins
 
 
-def run_all(data_dict: dict[str, any], config: dict = None) -> list[dict]:
+class _FullFrames(Mapping):
+    """
+    流式模式下给不支持流式的插件看的 data：ChunkedCSV 在第一次被访问时
+    才整表加载（经 ArtifactStore，同一进程内只加载一次），
+    根本不读 data 的插件（如 sdmetrics 系列）不会触发加载。
     """
-    遍历已加载的插件模块，调用它们的 evaluate_privacy，
+
+    def __init__(self, data_dict: dict[str, any], config: dict):
+        self._data = data_dict
+        self._artifacts = artifacts_from_config(config)
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if isinstance(value, ChunkedCSV):
+            return self._artifacts.get("csv", value.path)
+        return value
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _call_plugin(mod_name: str, data_dict: dict[str, any], config: dict):
+    mod = importlib.import_module(mod_name)
+    # 插件声明 STREAMING = True 才直接拿到 ChunkedCSV，否则退回整表
+    if not getattr(mod, "STREAMING", False) and any(
+        isinstance(v, ChunkedCSV) for v in data_dict.values()
+    ):
+        data_dict = _FullFrames(data_dict, config)
+    return mod.evaluate_privacy(data_dict, config)
+
+
+def _plugin_worker(conn, mod_name: str, data_dict: dict[str, any], config: dict):
+    """
+    子进程入口：执行单个插件，把 ("ok", 结果) 或 ("error", 信息) 发回主进程
+    """
+    # 自成一个进程组，超时时可以连同插件自己开的子进程（如 MIA 的进程池）一起结束
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    try:
+        conn.send(("ok", _call_plugin(mod_name, data_dict, config)))
+    except Exception as e:
+        logger.exception("插件 %s 执行失败", mod_name)
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+
+def _terminate(proc) -> None:
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        proc.terminate()
+    proc.join(5)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+
+
+def _run_scheduled(
+    mod_names: list[str],
+    data_dict: dict[str, any],
+    config: dict,
+    jobs: int,
+    timeout: float = None,
+) -> dict[str, tuple]:
+    """
+    每个插件在独立子进程中运行，最多同时运行 jobs 个；
+    超过 timeout 秒（从该插件启动时算起）仍未结束的插件会被强制结束。
+    返回 {模块名: (状态, 结果或错误信息)}，状态为 "ok" / "error" / "timeout"。
+    """
+    ctx = multiprocessing.get_context()
+    pending = list(mod_names)
+    running: dict = {}  # 读端 → (模块名, 进程, 截止时间)
+    outcomes: dict[str, tuple] = {}
+
+    try:
+        while pending or running:
+            while pending and len(running) < jobs:
+                mod_name = pending.pop(0)
+                reader, writer = ctx.Pipe(duplex=False)
+                proc = ctx.Process(
+                    target=_plugin_worker,
+                    args=(writer, mod_name, data_dict, config),
+                    name=f"plugin:{mod_name}",
+                )
+                proc.start()
+                writer.close()
+                deadline = time.monotonic() + timeout if timeout else None
+                running[reader] = (mod_name, proc, deadline)
+
+            deadlines = [d for _, _, d in running.values() if d is not None]
+            wait_for = (
+                max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            )
+            # 先收结果再 join，避免大结果塞满管道导致子进程无法退出
+            for reader in wait_connections(list(running), timeout=wait_for):
+                mod_name, proc, _ = running.pop(reader)
+                try:
+                    outcomes[mod_name] = reader.recv()
+                except EOFError:
+                    proc.join()
+                    outcomes[mod_name] = (
+                        "error",
+                        f"子进程异常退出（exitcode={proc.exitcode}）",
+                    )
+                reader.close()
+                proc.join()
+
+            now = time.monotonic()
+            for reader, (mod_name, proc, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    _terminate(proc)
+                    reader.close()
+                    del running[reader]
+                    outcomes[mod_name] = ("timeout", timeout)
+    finally:
+        for reader, (_, proc, _) in running.items():
+            _terminate(proc)
+            reader.close()
+
+    return outcomes
+
+
+def _prefetch_artifacts(mod_names: list[str], config: dict) -> None:
+    """
+    并行模式下，先在主进程里构建各插件声明的 artifact（required_artifacts），
+    子进程 fork 出来后直接共享，不用各自再读一遍、编码一遍。
+    """
+    artifacts = config.get("artifacts")
+    if artifacts is None:
+        return
+    for mod_name in mod_names:
+        try:
+            required = getattr(
+                importlib.import_module(mod_name), "required_artifacts", None
+            )
+            if required is None:
+                continue
+            for kind, *args in required(config):
+                artifacts.get(kind, *args)
+        except Exception as e:
+            # 预取失败不影响插件本身，交给插件运行时再报错
+            logger.exception("插件 %s 预处理数据失败", mod_name)
+            typer.secho(
+                f"⚠️ 插件 {mod_name} 预处理数据失败：{e}", fg=typer.colors.YELLOW
+            )
+
+
+def _plugin_aliases(name: str, mod_name: str) -> set[str]:
+    """
+    --refresh 可接受的插件名：插件名、模块路径、去掉 tabriskscore.plugins. 前缀的
+    全名或最后一段，例如 "lnb_wrapper" / "lnb.lnb_plugin" / "lnb_plugin"
+    """
+    short = mod_name.replace("tabriskscore.plugins.", "", 1)
+    return {name, mod_name, short, short.rsplit(".", 1)[-1]}
+
+
+def _plugin_input_files(mod_name: str, config: dict) -> list[str]:
+    """插件通过 required_artifacts 声明读取的文件，也作为缓存 key 的输入"""
+    required = getattr(importlib.import_module(mod_name), "required_artifacts", None)
+    if required is None:
+        return []
+    return [
+        arg
+        for _, *args in required(config)
+        for arg in args
+        if isinstance(arg, str) and os.path.isfile(arg)
+    ]
+
+
+def _carries_error(res) -> bool:
+    """插件自己捕获了异常、返回的是错误标记（details 里有 "error"）时为 True，这种结果不缓存"""
+    items = res if isinstance(res, list) else [res]
+    return any(
+        isinstance(item, dict)
+        and isinstance(item.get("details"), dict)
+        and "error" in item["details"]
+        for item in items
+    )
+
+
+def run_all(
+    data_dict: dict[str, any],
+    config: dict = None,
+    jobs: int = 1,
+    timeout: float = None,
+    cache: ResultCache = None,
+    input_files: list[str] = (),
+    refresh: list[str] = (),
+    plugins: dict[str, str] = None,
+) -> list[dict]:
+    """
+    依次（或并行）import 并调用 plugins（{插件名: 模块路径}，默认 discover_plugins()）
+    中各插件的 evaluate_privacy，
     支持插件返回单个 dict 或者 list[dict]，统一扁平化到一个列表。
+
+    jobs > 1 或设置了 timeout 时，插件在进程池中并行执行，每个插件有独立的超时；
+    无论是否并行，结果都按插件顺序拼接，顺序保持稳定。
+
+    传入 cache 时，(插件代码, 有效 config, input_files 及插件自身输入文件的内容)
+    都没变的插件直接返回缓存结果；refresh 中列出的插件忽略缓存、重新计算。
+    失败、超时或带错误标记的结果不写入缓存，下次运行会重新计算。
     """
     config = config or {}
     results: list[dict] = []
+    if plugins is None:
+        plugins = discover_plugins()
+    mod_names = list(dict.fromkeys(plugins.values()))
+    names = {mod_name: name for name, mod_name in plugins.items()}
+
+    outcomes: dict[str, tuple] = {}
+    cache_keys: dict[str, str] = {}
+    if cache is not None:
+        refresh = set(refresh)
+        for mod_name in mod_names:
+            try:
+                cache_keys[mod_name] = cache.key(
+                    mod_name,
+                    config,
+                    list(input_files) + _plugin_input_files(mod_name, config),
+                )
+            except Exception as e:
+                logger.exception("插件 %s 无法计算缓存 key", mod_name)
+                typer.secho(
+                    f"⚠️ 插件 {mod_name} 无法计算缓存 key：{e}", fg=typer.colors.YELLOW
+                )
+                continue
+            if _plugin_aliases(names[mod_name], mod_name) & refresh:
+                continue
+            hit, value = cache.get(cache_keys[mod_name])
+            if hit:
+                outcomes[mod_name] = ("ok", value)
+                typer.secho(f"ℹ️ 插件 {mod_name} 命中缓存", fg=typer.colors.BLUE)
+    to_run = [m for m in mod_names if m not in outcomes]
 
-    for mod in list(sys.modules.values()):
-        if (
-            isinstance(mod, types.ModuleType)
-            and mod.__name__.startswith("tabriskscore.plugins.")
-            and mod.__name__ != "tabriskscore.plugins.hooks"
-            and hasattr(mod, "evaluate_privacy")
-        ):
+    if jobs > 1 or timeout:
+        _prefetch_artifacts(to_run, config)
+        outcomes.update(
+            _run_scheduled(to_run, data_dict, config, max(jobs, 1), timeout)
+        )
+    else:
+        for mod_name in to_run:
             try:
                 # 这里是关键！！
-                res = mod.evaluate_privacy(data_dict, config)
-                if isinstance(res, list):
-                    results.extend(res)
-                elif isinstance(res, dict):
-                    results.append(res)
-                else:
-                    typer.secho(
-                        f"⚠️ 插件 {mod.__name__} 返回类型不支持: {type(res)}，已跳过",
-                        fg=typer.colors.YELLOW,
-                    )
+                outcomes[mod_name] = ("ok", _call_plugin(mod_name, data_dict, config))
             except Exception as e:
+                logger.exception("插件 %s 执行失败", mod_name)
+                outcomes[mod_name] = ("error", str(e))
+
+    for mod_name in to_run:
+        status, res = outcomes[mod_name]
+        if status == "ok" and mod_name in cache_keys and not _carries_error(res):
+            try:
+                cache.put(cache_keys[mod_name], res)
+            except (pickle.PicklingError, AttributeError, TypeError, OSError) as e:
+                # 结果里有无法 pickle 的对象，或缓存目录写不进去
                 typer.secho(
-                    f"⚠️ 插件 {mod.__name__} 执行失败：{e}", fg=typer.colors.YELLOW
+                    f"⚠️ 插件 {mod_name} 的结果无法写入缓存：{e}",
+                    fg=typer.colors.YELLOW,
                 )
+
+    for mod_name in mod_names:
+        status, res = outcomes[mod_name]
+        if status == "timeout":
+            typer.secho(
+                f"⚠️ 插件 {mod_name} 超时（>{res} 秒），已终止", fg=typer.colors.YELLOW
+            )
+        elif status == "error":
+            typer.secho(f"⚠️ 插件 {mod_name} 执行失败：{res}", fg=typer.colors.YELLOW)
+        elif isinstance(res, list):
+            results.extend(res)
+        elif isinstance(res, dict):
+            results.append(res)
+        else:
+            typer.secho(
+                f"⚠️ 插件 {mod_name} 返回类型不支持: {type(res)}，已跳过",
+                fg=typer.colors.YELLOW,
+            )
     return results
 
 
-def privacy_flow(data_dir: str, output_path: str):
+def privacy_flow(
+    data_dir: str,
+    output_path: str,
+    jobs: int = 1,
+    timeout: float = None,
+    config: dict = None,
+    use_cache: bool = True,
+    refresh: list[str] = (),
+    selected: list[str] = None,
+    stream: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
     """
     1) 扫描 data_dir 下所有 .csv
     2) 加载成 pandas.DataFrame 存入 data_dict
-    3) 发现并调用所有插件
+       （stream 为 True 时不加载，存入按 chunk_size 行分块读取的 ChunkedCSV）
+    3) 发现并调用所有插件（jobs > 1 时并行，timeout 为单个插件的超时秒数）
     4) 一律渲染 HTML 报告
+
+    同一次运行里的预处理结果放在 ArtifactStore 中，经 config["artifacts"] 传给插件共享。
+    use_cache 为 True 时，插件结果缓存在 config["cache_dir"]（默认 .tabriskscore_cache），
+    总大小上限为 config["cache_max_mb"] MB（默认 1024）；refresh 指定强制重算的插件。
+    selected 非空时只运行其中列出的插件，其余插件的模块完全不会被 import；
+    selected 为空时运行除 OPT_IN_PLUGINS 以外的全部插件，外加 config["enable_plugins"] 里列出的。
     """
-    # 1) 加载 CSV
+    config = dict(config or {})
+    cache_dir = config.get("cache_dir", ".tabriskscore_cache")
+    # 1) 加载 CSV（列式缓存也放在 cache_dir 下）
+    artifacts = ArtifactStore(cache_dir)
     data_dict: dict[str, any] = {}
+    input_files: list[str] = []
     if not os.path.isdir(data_dir):
         typer.secho(f"❌ data 目录不存在：{data_dir}", fg=typer.colors.RED)
         raise typer.Exit(1)
@@ -76,25 +395,51 @@ def privacy_flow(data_dir: str, output_path: str):
             continue
         key = os.path.splitext(fname)[0]
         path = os.path.join(data_dir, fname)
+        if stream:
+            data_dict[key] = ChunkedCSV(path, chunk_size, cache_dir=cache_dir)
+            input_files.append(path)
+            typer.secho(
+                f"ℹ️ 流式读取 {fname} → key='{key}'，每块 {chunk_size} 行",
+                fg=typer.colors.BLUE,
+            )
+            continue
         try:
-            data_dict[key] = load_csv(path)
+            data_dict[key] = artifacts.get("csv", path)
+            input_files.append(path)
             typer.secho(
                 f"ℹ️ 读取文件 {fname} → key='{key}'，{data_dict[key].shape[0]} 行",
                 fg=typer.colors.BLUE,
             )
-        except Exception as e:
+        except (OSError, ValueError) as e:
+            # 文件读不了，或不是合法的 CSV（pandas 的解析错误都是 ValueError）
             typer.secho(f"❌ 读取 {fname} 失败：{e}", fg=typer.colors.RED)
 
     if not data_dict:
         typer.secho("❌ data 目录下没有可用的 CSV 文件，退出。", fg=typer.colors.RED)
         raise typer.Exit(1)
 
-    # 2) 发现 & 加载插件
-    discover_plugins()
+    # 2) 发现插件（只读元数据，运行时才 import）
+    plugins = discover_plugins(selected, config.get("enable_plugins"))
 
     # 3) 执行所有度量
     # 这里的data_dict 是个字典，里面有3个key, 分别为文件名Xtrain，Xsyn，Xcontrol
-    metrics = run_all(data_dict)
+    config["artifacts"] = artifacts
+    cache = None
+    if use_cache:
+        cache = ResultCache(
+            cache_dir,
+            max_bytes=int(config.get("cache_max_mb", 1024)) << 20,
+        )
+    metrics = run_all(
+        data_dict,
+        config,
+        jobs=jobs,
+        timeout=timeout,
+        cache=cache,
+        input_files=input_files,
+        refresh=refresh,
+        plugins=plugins,
+    )
 
     # 4) 渲染 HTML
     if not output_path.lower().endswith(".html"):
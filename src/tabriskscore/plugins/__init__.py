@@ -1,21 +1,36 @@
-# 可以不暴露任何，全靠 pluggy 自动发现；
-# 也可以将 hooks 和示例插件导进来，便于手动引用：
-from .example import evaluate_privacy as example_evaluate
-from .hooks import evaluate_privacy
-from .row_count import evaluate_privacy as row_count_metric
-# from .lnb.lnb_plugin import evaluate_privacy as lnb_evaluate
-from .sdmetrics.dcr_baseline import evaluate_privacy as dcr_baseline_metric
-# from .sdmetrics.dcr_overfitting import evaluate_privacy as dcr_overfitting_metric
-# from .sdmetrics.categorical_cap import evaluate_privacy as categorical_capmetric
-from .sdmetrics.disclosure_estimate import \
-    evaluate_privacy as disclosure_estimate
-from .sdmetrics.disclosure_protection import \
-    evaluate_privacy as disclosure_protection_metric
-from .similar_check import evaluate_privacy as similar_check_metric
+# 插件清单：名字 → 模块路径，与 pyproject.toml 中
+# [tool.poetry.plugins."tabriskscore"] 的 entry points 保持一致。
+# 发现插件时只读这份清单（和已安装的 entry points），不 import 任何插件模块，
+# 插件真正被选中运行时才 import，避免启动时就拉起 torch / sdmetrics 等重依赖。
+import importlib
 
-# __all__ = ["evaluate_privacy",
-#            "example_evaluate",
-#            "row_count_metric",
-#            "similar_check_metric",
-#            # "lnb_evaluate"
-#            ]
+BUILTIN_PLUGINS = {
+    "example": "tabriskscore.plugins.example",
+    "row_count": "tabriskscore.plugins.row_count",
+    "similar_check": "tabriskscore.plugins.similar_check",
+    "lnb_wrapper": "tabriskscore.plugins.lnb.lnb_plugin",
+    "dcr_baseline": "tabriskscore.plugins.sdmetrics.dcr_baseline",
+    "disclosure_estimate": "tabriskscore.plugins.sdmetrics.disclosure_estimate",
+    "disclosure_protection": "tabriskscore.plugins.sdmetrics.disclosure_protection",
+}
+
+# 默认不运行的插件：LNB 的 MIA 要跑几个小时，还会拉起 torch / reprosyn，
+# 只有用 --plugin 点名或在 config 的 enable_plugins 里列出时才运行
+OPT_IN_PLUGINS = {"lnb_wrapper"}
+
+# 兼容以前从这里直接引用的名字，访问时才 import 对应模块
+_LAZY_EXPORTS = {
+    "evaluate_privacy": "tabriskscore.plugins.hooks",
+    "example_evaluate": "tabriskscore.plugins.example",
+    "row_count_metric": "tabriskscore.plugins.row_count",
+    "similar_check_metric": "tabriskscore.plugins.similar_check",
+    "dcr_baseline_metric": "tabriskscore.plugins.sdmetrics.dcr_baseline",
+    "disclosure_estimate": "tabriskscore.plugins.sdmetrics.disclosure_estimate",
+    "disclosure_protection_metric": "tabriskscore.plugins.sdmetrics.disclosure_protection",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        return importlib.import_module(_LAZY_EXPORTS[name]).evaluate_privacy
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,7 @@
 ### add classifiers
+import numpy as np
 import pandas as pd
+from scipy.stats import rankdata
 from sklearn.base import ClassifierMixin
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression, LogisticRegressionCV
@@ -302,3 +304,52 @@ def fit_validate_classifiers(
         all_results.append(results)
 
     return trained_models, all_results
+
+
+def bootstrap_auc_ci(
+    y_true,
+    scores,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    min_per_class: int = 1,
+) -> tuple:
+    """Percentile bootstrap confidence interval of the AUC. All resamples are scored at once, the AUC of each being
+    computed from the ranks of the scores (Mann-Whitney U statistic, ties counted as one half).
+
+    :param y_true: Binary labels.
+    :type y_true: array-like
+    :param scores: Scores of the positive class.
+    :type scores: array-like
+    :param n_bootstrap: Number of bootstrap resamples, defaults to 1000
+    :type n_bootstrap: int, optional
+    :param confidence: Confidence level of the interval, defaults to 0.95
+    :type confidence: float, optional
+    :param seed: Random seed of the resampling, defaults to 0
+    :type seed: int, optional
+    :param min_per_class: Number of samples of each class below which the interval is not estimated, defaults to 1
+    :type min_per_class: int, optional
+    :return: Lower and upper bounds of the interval; (0.0, 1.0) if a class has fewer than `min_per_class` samples
+        or no resample contains both classes. The interval has zero width when every resample gets the same AUC
+        (e.g. constant or perfectly separating scores), which says nothing about its precision.
+    :rtype: tuple
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(y_true)
+    if min(y_true.sum(), n - y_true.sum()) < max(min_per_class, 1):
+        return 0.0, 1.0
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, size=(n_bootstrap, n))
+    y = y_true[idx]
+    n_pos = y.sum(axis=1)
+    n_neg = n - n_pos
+    valid = (n_pos > 0) & (n_neg > 0)
+    if not valid.any():
+        return 0.0, 1.0
+    y, n_pos, n_neg = y[valid], n_pos[valid], n_neg[valid]
+    ranks = rankdata(scores[idx[valid]], axis=1)
+    aucs = ((ranks * y).sum(axis=1) - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(aucs, [alpha, 1 - alpha])
+    return float(low), float(high)
@@ -4,6 +4,8 @@ import pickle
 import numpy as np
 import pandas as pd
 
+from tabriskscore.core.artifacts import ArtifactStore, register_artifact
+
 
 def read_metadata(metadata_path: str) -> tuple:
     """
@@ -40,7 +42,23 @@ def read_data(
     :return: dataframe containing loaded data
     :rtype: pd.DataFrame
     """
-    df = pd.read_csv(data_path)
+    return cast_columns(pd.read_csv(data_path), categorical_cols, continuous_cols)
+
+
+def cast_columns(
+    df: pd.DataFrame, categorical_cols: list, continuous_cols: list
+) -> pd.DataFrame:
+    """Drop the id column and cast categorical columns to str, continuous columns to float.
+
+    :param df: raw dataframe, may be modified in place
+    :type df: pd.DataFrame
+    :param categorical_cols: names of categorical columns
+    :type categorical_cols: list
+    :param continuous_cols: names of continuous columns
+    :type continuous_cols: list
+    :return: dataframe with cast columns
+    :rtype: pd.DataFrame
+    """
     if "Person ID" in df.columns:
         df = df.drop("Person ID", axis=1)
 
@@ -148,16 +166,30 @@ def get_target_record(df: pd.DataFrame, index: int) -> pd.DataFrame:
     return df.loc[index:index]
 
 
-def load_data(path_to_data: str, path_to_metadata: str, cols_to_select: list = ["all"]):
-    meta_data_og, categorical_cols, continuous_cols = read_metadata(path_to_metadata)
-    df = read_data(path_to_data, categorical_cols, continuous_cols)
-    # print(df)
-    df = discretize_dataset(df, categorical_cols)
-    df = normalize_cont_cols(df, meta_data_og, df_aux=df)
-    df, categorical_cols, continuous_cols, meta_data = select_columns(
-        df, categorical_cols, continuous_cols, cols_to_select, meta_data_og
+def load_data(
+    path_to_data: str,
+    path_to_metadata: str,
+    cols_to_select: list = ["all"],
+    artifacts: ArtifactStore = None,
+):
+    """Read, discretize and normalize a dataset.
+
+    :param path_to_data: path to data
+    :type path_to_data: str
+    :param path_to_metadata: path to metadata
+    :type path_to_metadata: str
+    :param cols_to_select: columns to keep, defaults to ["all"]
+    :type cols_to_select: list, optional
+    :param artifacts: run-scoped store; results are shared with every other caller of the same store, defaults to a fresh store
+    :type artifacts: ArtifactStore, optional
+    :return: dataframe, categorical column names, continuous column names, metadata
+    :rtype: tuple
+    """
+    if artifacts is None:
+        artifacts = ArtifactStore()
+    return artifacts.get(
+        "lnb_data", path_to_data, path_to_metadata, tuple(cols_to_select)
     )
-    return df, categorical_cols, continuous_cols, meta_data
 
 
 def split_data(df: pd.DataFrame, path_to_ids: str):
@@ -170,3 +202,52 @@ def split_data(df: pd.DataFrame, path_to_ids: str):
     df_target = df.loc[ids[0]]
 
     return df_aux, df_eval, df_target
+
+
+######### Shared artifacts (see tabriskscore.core.artifacts) #########
+
+
+@register_artifact("lnb_metadata")
+def _build_metadata(store: ArtifactStore, path_to_metadata: str) -> tuple:
+    meta_data = store.get("json", path_to_metadata)
+    categorical_cols = [col["name"] for col in meta_data if col["type"] == "finite"]
+    continous_cols = [
+        col["name"] for col in meta_data if col["type"] in ("Integer", "Float")
+    ]
+    return meta_data, categorical_cols, continous_cols
+
+
+@register_artifact("lnb_discretized")
+def _build_discretized(
+    store: ArtifactStore, path_to_data: str, path_to_metadata: str
+) -> pd.DataFrame:
+    _, categorical_cols, continuous_cols = store.get("lnb_metadata", path_to_metadata)
+    df = cast_columns(
+        store.get("csv", path_to_data).copy(), categorical_cols, continuous_cols
+    )
+    return discretize_dataset(df, categorical_cols)
+
+
+@register_artifact("lnb_data")
+def _build_data(
+    store: ArtifactStore,
+    path_to_data: str,
+    path_to_metadata: str,
+    cols_to_select: tuple = ("all",),
+) -> tuple:
+    meta_data_og, categorical_cols, continuous_cols = store.get(
+        "lnb_metadata", path_to_metadata
+    )
+    df = store.get("lnb_discretized", path_to_data, path_to_metadata).copy()
+    df = normalize_cont_cols(df, meta_data_og, df_aux=df)
+    return select_columns(
+        df, categorical_cols, continuous_cols, list(cols_to_select), meta_data_og
+    )
+
+
+@register_artifact("lnb_split")
+def _build_split(
+    store: ArtifactStore, path_to_data: str, path_to_metadata: str, path_to_ids: str
+) -> tuple:
+    df = load_data(path_to_data, path_to_metadata, artifacts=store)[0]
+    return split_data(df, path_to_ids)
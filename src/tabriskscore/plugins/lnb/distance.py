@@ -1,124 +1,71 @@
-import asyncio
+import multiprocessing
+import os
+import tempfile
 
 import numpy as np
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
 from tqdm import tqdm
 
+from tabriskscore.core.neighbours import estimate_recall, make_index
+from tabriskscore.core.resources import ResourcePolicy
+
 from .feature_extractors import apply_ohe, fit_ohe
 
 
-def top_n_vulnerable_records(distances: dict, n: int) -> list:
+def _scores_by_record(distances, index=None) -> pd.Series:
+    if isinstance(distances, dict):
+        return pd.Series(distances, dtype=float)
+    return pd.Series(np.asarray(distances, dtype=float), index=index)
+
+
+def top_n_vulnerable_records(distances, n: int, index=None) -> list:
     """Return the ids of the top n vulnerable records
 
-    :param distances: dictionary where key is record id and value is the corresponding record's risk score (in this case the mean distance to it's 5 closest neighbors)
-    :type distances: dict
+    :param distances: Achilles scores, either as returned by compute_achilles (array aligned with the target dataset) or a dictionary where key is record id and value is the corresponding record's risk score (in this case the mean distance to it's 5 closest neighbors)
+    :type distances: np.ndarray | dict
     :param n: number of most vulnerable records to find
     :type n: int
+    :param index: record ids matching the rows of distances when it is an array (e.g. df_target.index), defaults to positions
+    :type index: pd.Index, optional
     :return: list of n most vulnerable record's ids
     :rtype: list
     """
-    top_n = {
-        k: v
-        for k, v in sorted(distances.items(), key=lambda item: item[1], reverse=True)[
-            0:n
-        ]
-    }
-    return list(top_n.keys())
+    scores = _scores_by_record(distances, index)
+    # stable sort on the negated scores keeps ties in record order
+    order = np.argsort(-scores.to_numpy(), kind="stable")[:n]
+    return list(scores.index[order])
 
 
-def top_n_vulnerable_dists(distances: dict, n: int) -> list:
+def top_n_vulnerable_dists(distances, n: int) -> list:
     """Return the risk scores of the top n vulnerable records
 
-    :param distances: dictionary where key is record id and value is the corresponding record's risk score (in this case the mean distance to it's 5 closest neighbors)
-    :type distances: dict
+    :param distances: Achilles scores, as an array or a dictionary where key is record id and value is the corresponding record's risk score (in this case the mean distance to it's 5 closest neighbors)
+    :type distances: np.ndarray | dict
     :param n: number of most vulnerable records to find
     :type n: int
     :return: list of n most vulnerable record's risk scores
     :rtype: list
     """
-    top_n = {
-        k: v
-        for k, v in sorted(distances.items(), key=lambda item: item[1], reverse=True)[
-            0:n
-        ]
-    }
-    return list(top_n.values())
+    scores = _scores_by_record(distances).to_numpy()
+    return list(scores[np.argsort(-scores, kind="stable")[:n]])
 
 
-async def compute_achilles_one_record(
-    df: pd.DataFrame,
-    record_id: int,
-    ohe_cat_indices: list,
-    n_cat_cols: int,
-    cont_indices: list,
-    n_cont_cols: int,
-    all_distances: dict,
-    n_to_save: int,
-):
-    """Async function to compute achilles score (mean distance to n_to_save closest neighbors) for a single record.
-
-    :param df: dataframe containing dataset based on which to compute Achilles score
-    :type df: pd.DataFrame
-    :param record_id: id of record to compute Achilles score for
-    :type record_id: int
-    :param ohe_cat_indices: indices of one-hot encoded columns
-    :type ohe_cat_indices: list
-    :param n_cat_cols: number of categorical columns
-    :type n_cat_cols: int
-    :param cont_indices: indices of continuous columns
-    :type cont_indices: list
-    :param n_cont_cols: number of continuous columns
-    :type n_cont_cols: int
-    :param all_distances: dictionary where key is record id and value is Achilles score
-    :type all_distances: dict
-    :param n_to_save: number of nearest neighbors to consider when computing Achilles score
-    :type n_to_save: int
-    :return: None
-    :rtype: None
-    """
-    record = df.loc[record_id].values
-    values = df.values
-
-    # calculate distance for categorical features
-    cat_dist = (
-        1
-        - cosine_similarity(
-            record[ohe_cat_indices].reshape(1, -1), values[:, ohe_cat_indices]
-        ).flatten()
-    )
-    cat_dist = [n_cat_cols / (n_cat_cols + n_cont_cols) * k for k in cat_dist]
-
-    # if there are only categorical columns, we can return this
-    if n_cont_cols == 0:
-        return cat_dist
-
-    # calculate distance for continuous features
-    cont_dist = (
-        1
-        - cosine_similarity(
-            record[cont_indices].reshape(1, -1), values[:, cont_indices]
-        ).flatten()
-    )
-    cont_dist = [n_cont_cols / (n_cat_cols + n_cont_cols) * k for k in cont_dist]
-
-    # finally, return the weighted average, weighted by number of respective cols
-    mean_dist = np.mean(
-        np.sort([cat_dist[i] + cont_dist[i] for i in range(len(cont_dist))])[:n_to_save]
-    )
-    all_distances[record_id] = mean_dist
-    # print(all_distances[record_id])
-    return None
+def _normalize_rows(values: np.ndarray) -> np.ndarray:
+    """L2-normalize rows; all-zero rows stay zero, i.e. similarity 0 to every record (as in sklearn's cosine_similarity)."""
+    values = np.asarray(values, dtype=np.float64)
+    norms = np.linalg.norm(values, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return values / norms
 
 
-async def compute_achilles_parallel(
+def prepare_achilles_inputs(
     df: pd.DataFrame,
     categorical_cols: list,
     continuous_cols: list,
     meta_data: list,
-    n_to_save: int,
-):
-    """Async function to compute Achilles scores for each record in dataset concurrently.
+) -> tuple:
+    """One-hot encode the dataset and pre-normalize the categorical and continuous blocks.
 
     :param df: dataset based on which to compute Achilles scores
     :type df: pd.DataFrame
@@ -128,48 +75,60 @@ async def compute_achilles_parallel(
     :type continuous_cols: list
     :param meta_data: metadata
     :type meta_data: list
-    :param n_to_save: number of nearest neighbors to consider when computing Achilles score
-    :type n_to_save: int
-    :return: dictionary where key is record id and value is Achilles score
-    :rtype: dict
+    :return: row-normalized categorical block, row-normalized continuous block, categorical weight, continuous weight
+    :rtype: tuple
     """
     ohe, ohe_column_names = fit_ohe(df, categorical_cols, meta_data)
     df_ohe = apply_ohe(
         df.copy(), ohe, categorical_cols, ohe_column_names, continuous_cols
     )
-
-    all_columns = list(df_ohe.columns)
-    ohe_cat_indices = [all_columns.index(col) for col in ohe_column_names]
-    cont_indices = [all_columns.index(col) for col in continuous_cols]
     n_cat_cols = len(categorical_cols)
     n_cont_cols = len(continuous_cols)
+    cat = _normalize_rows(df_ohe[ohe_column_names].to_numpy())
+    cont = _normalize_rows(df_ohe[continuous_cols].to_numpy())
+    w_cat = n_cat_cols / (n_cat_cols + n_cont_cols)
+    w_cont = n_cont_cols / (n_cat_cols + n_cont_cols)
+    return cat, cont, w_cat, w_cont
+
+
+def achilles_block(
+    cat: np.ndarray,
+    cont: np.ndarray,
+    w_cat: float,
+    w_cont: float,
+    n_to_save: int,
+    start: int,
+    stop: int,
+) -> np.ndarray:
+    """Achilles scores of rows [start, stop) against every row of the pre-normalized inputs.
+
+    :param cat: row-normalized one-hot categorical block
+    :type cat: np.ndarray
+    :param cont: row-normalized continuous block
+    :type cont: np.ndarray
+    :param w_cat: weight of the categorical distance
+    :type w_cat: float
+    :param w_cont: weight of the continuous distance
+    :type w_cont: float
+    :param n_to_save: number of nearest neighbors to consider when computing Achilles score
+    :type n_to_save: int
+    :param start: first row of the block
+    :type start: int
+    :param stop: end of the block (exclusive)
+    :type stop: int
+    :return: Achilles score of each row in the block
+    :rtype: np.ndarray
+    """
+    dist = w_cat * (1.0 - cat[start:stop] @ cat.T)
+    if cont.shape[1]:
+        dist += w_cont * (1.0 - cont[start:stop] @ cont.T)
+    k = min(n_to_save, dist.shape[1])
+    return np.partition(dist, k - 1, axis=1)[:, :k].mean(axis=1)
 
-    all_distances = dict()
-    n_to_save = n_to_save
-
-    tasks = list()
-
-    print("creating tasks")
-    for i, r in tqdm(enumerate(df.index)):
-        tasks.append(
-            asyncio.create_task(
-                compute_achilles_one_record(
-                    df_ohe,
-                    r,
-                    ohe_cat_indices,
-                    n_cat_cols,
-                    cont_indices,
-                    n_cont_cols,
-                    all_distances,
-                    n_to_save,
-                )
-            )
-        )
 
-    print("computing achilles")
-    for i in tqdm(range(len(df))):
-        await tasks[i]
-    return all_distances
+def achilles_block_size(n_records: int, max_block_bytes: int = 64 << 20) -> int:
+    """Number of query rows per block so that one block of float64 distances stays under max_block_bytes."""
+    return max(1, min(n_records, max_block_bytes // (8 * max(n_records, 1))))
 
 
 def compute_achilles(
@@ -178,8 +137,15 @@ def compute_achilles(
     continuous_cols: list,
     meta_data: list,
     n_to_save: int,
-):
-    """Function to compute Achilles scores for each record in dataset concurrently.
+    block_size: int = None,
+    n_workers: int = 1,
+    backend: str = "exact",
+    backend_params: dict = None,
+    resources: ResourcePolicy = None,
+) -> np.ndarray:
+    """Compute Achilles scores (mean distance to the n_to_save closest records) for each record in dataset.
+
+    With the default "exact" backend, distances are computed block by block as matrix products of the pre-normalized categorical and continuous blocks, so memory stays bounded by block_size x len(df) (per worker). Other backends of tabriskscore.core.neighbours ("tree", "lsh") search neighbours in an embedding of the records, and the scores are then computed exactly on the neighbours found (see estimate_achilles_recall for their quality).
 
     :param df: dataset based on which to compute Achilles scores
     :type df: pd.DataFrame
@@ -191,16 +157,247 @@ def compute_achilles(
     :type meta_data: list
     :param n_to_save: number of nearest neighbors to consider when computing Achilles score
     :type n_to_save: int
-    :return: dictionary where key is record id and value is Achilles score
-    :rtype: dict
+    :param block_size: number of records per block, defaults to a block of about 64 MB of distances
+    :type block_size: int, optional
+    :param n_workers: number of worker processes sharing the query rows, None for all available cores (divided by the threads per worker of resources), defaults to 1
+    :type n_workers: int, optional
+    :param backend: neighbour search backend, one of "exact", "tree", "lsh", defaults to "exact"
+    :type backend: str, optional
+    :param backend_params: keyword arguments of the backend (e.g. n_tables, n_bits for "lsh"), defaults to None
+    :type backend_params: dict, optional
+    :param resources: thread cap and CPU pinning of the worker processes, defaults to one BLAS thread per worker
+    :type resources: ResourcePolicy, optional
+    :return: Achilles score of each record, in the order of df.index
+    :rtype: np.ndarray
     """
-    return asyncio.run(
-        compute_achilles_parallel(
-            df, categorical_cols, continuous_cols, meta_data, n_to_save
+    cat, cont, w_cat, w_cont = prepare_achilles_inputs(
+        df, categorical_cols, continuous_cols, meta_data
+    )
+    if backend == "exact":
+        return achilles_scores(
+            cat, cont, w_cat, w_cont, n_to_save, block_size, n_workers, resources
         )
+    embedding = achilles_embedding(cat, cont, w_cat, w_cont)
+    index = make_index(backend, embedding, **(backend_params or {}))
+    _, ids = index.query(embedding, n_to_save)
+    return achilles_from_neighbours(cat, cont, w_cat, w_cont, ids)
+
+
+def achilles_embedding(
+    cat: np.ndarray, cont: np.ndarray, w_cat: float, w_cont: float
+) -> np.ndarray:
+    """Embed the pre-normalized records so that half the squared Euclidean distance equals the weighted cosine distance used by the Achilles score.
+
+    For unit rows, |a - b|^2 = 2 (1 - a.b), hence the blocks are scaled by sqrt(w / 2). The identity does not hold for all-zero rows, which is why approximate backends only use the embedding to find neighbours.
+
+    :param cat: row-normalized one-hot categorical block
+    :type cat: np.ndarray
+    :param cont: row-normalized continuous block
+    :type cont: np.ndarray
+    :param w_cat: weight of the categorical distance
+    :type w_cat: float
+    :param w_cont: weight of the continuous distance
+    :type w_cont: float
+    :return: embedded records
+    :rtype: np.ndarray
+    """
+    return np.hstack([np.sqrt(w_cat / 2) * cat, np.sqrt(w_cont / 2) * cont])
+
+
+def achilles_from_neighbours(
+    cat: np.ndarray, cont: np.ndarray, w_cat: float, w_cont: float, ids: np.ndarray
+) -> np.ndarray:
+    """Achilles score of each row given the ids of its (approximate) nearest neighbours, with exact distances.
+
+    :param cat: row-normalized one-hot categorical block
+    :type cat: np.ndarray
+    :param cont: row-normalized continuous block
+    :type cont: np.ndarray
+    :param w_cat: weight of the categorical distance
+    :type w_cat: float
+    :param w_cont: weight of the continuous distance
+    :type w_cont: float
+    :param ids: row i holds the ids of the neighbours of record i
+    :type ids: np.ndarray
+    :return: Achilles score of each row
+    :rtype: np.ndarray
+    """
+    dist = w_cat * (1.0 - np.einsum("ij,ikj->ik", cat, cat[ids]))
+    if cont.shape[1]:
+        dist += w_cont * (1.0 - np.einsum("ij,ikj->ik", cont, cont[ids]))
+    return dist.mean(axis=1)
+
+
+def estimate_achilles_recall(
+    df: pd.DataFrame,
+    categorical_cols: list,
+    continuous_cols: list,
+    meta_data: list,
+    n_to_save: int,
+    backend: str,
+    backend_params: dict = None,
+    n_samples: int = 200,
+    seed: int = 0,
+) -> float:
+    """Estimate the recall of a neighbour search backend against the exact search, on a sample of records.
+
+    :param df: dataset based on which to compute Achilles scores
+    :type df: pd.DataFrame
+    :param categorical_cols: names of categorical columns
+    :type categorical_cols: list
+    :param continuous_cols: names of continuous columns
+    :type continuous_cols: list
+    :param meta_data: metadata
+    :type meta_data: list
+    :param n_to_save: number of nearest neighbors to consider when computing Achilles score
+    :type n_to_save: int
+    :param backend: neighbour search backend, one of "exact", "tree", "lsh"
+    :type backend: str
+    :param backend_params: keyword arguments of the backend, defaults to None
+    :type backend_params: dict, optional
+    :param n_samples: number of records to check, defaults to 200
+    :type n_samples: int, optional
+    :param seed: seed of the sample, defaults to 0
+    :type seed: int, optional
+    :return: fraction of the true n_to_save nearest neighbours found by the backend
+    :rtype: float
+    """
+    embedding = achilles_embedding(
+        *prepare_achilles_inputs(df, categorical_cols, continuous_cols, meta_data)
+    )
+    index = make_index(backend, embedding, **(backend_params or {}))
+    return estimate_recall(index, embedding, n_to_save, n_samples, seed)
+
+
+def achilles_scores(
+    cat: np.ndarray,
+    cont: np.ndarray,
+    w_cat: float,
+    w_cont: float,
+    n_to_save: int,
+    block_size: int = None,
+    n_workers: int = 1,
+    resources: ResourcePolicy = None,
+) -> np.ndarray:
+    """Achilles scores of every row of the pre-normalized inputs (see prepare_achilles_inputs).
+
+    With n_workers > 1 the query rows are split into shards handled by a process pool. The normalized matrices are written once to memory-mapped files that every worker maps read-only, instead of being pickled to each worker, and each worker writes the scores of its shard straight into its slice of a shared memory-mapped output file.
+
+    :param cat: row-normalized one-hot categorical block
+    :type cat: np.ndarray
+    :param cont: row-normalized continuous block
+    :type cont: np.ndarray
+    :param w_cat: weight of the categorical distance
+    :type w_cat: float
+    :param w_cont: weight of the continuous distance
+    :type w_cont: float
+    :param n_to_save: number of nearest neighbors to consider when computing Achilles score
+    :type n_to_save: int
+    :param block_size: number of records per block, defaults to a block of about 64 MB of distances
+    :type block_size: int, optional
+    :param n_workers: number of worker processes, None for all available cores (divided by the threads per worker of resources), defaults to 1
+    :type n_workers: int, optional
+    :param resources: thread cap and CPU pinning of the worker processes, defaults to one BLAS thread per worker
+    :type resources: ResourcePolicy, optional
+    :return: Achilles score of each row
+    :rtype: np.ndarray
+    """
+    n = len(cat)
+    if resources is None:
+        resources = ResourcePolicy()
+    n_workers = resources.n_workers(n_workers, n_tasks=n)
+    if not block_size:
+        # keep every worker busy: at least a few blocks per worker
+        block_size = min(achilles_block_size(n), -(-n // (4 * n_workers)))
+    scores = np.empty(n, dtype=np.float64)
+    if n_workers == 1:
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            scores[start:stop] = achilles_block(
+                cat, cont, w_cat, w_cont, n_to_save, start, stop
+            )
+        return scores
+
+    # about four shards per worker so that a slow shard does not hold up the pool
+    n_blocks = -(-n // block_size)
+    shard_size = block_size * max(1, n_blocks // (4 * n_workers))
+    shards = [(start, min(start + shard_size, n)) for start in range(0, n, shard_size)]
+    with tempfile.TemporaryDirectory(prefix="achilles-") as tmp:
+        cat_path = os.path.join(tmp, "cat.npy")
+        cont_path = os.path.join(tmp, "cont.npy")
+        scores_path = os.path.join(tmp, "scores.npy")
+        np.save(cat_path, cat)
+        np.save(cont_path, cont)
+        # shared output: the shards are disjoint, so the workers write without locking
+        np.lib.format.open_memmap(
+            scores_path, mode="w+", dtype=np.float64, shape=(n,)
+        ).flush()
+        with multiprocessing.get_context().Pool(
+            n_workers,
+            **resources.pool_kwargs(
+                _init_achilles_worker,
+                (
+                    cat_path,
+                    cont_path,
+                    scores_path,
+                    w_cat,
+                    w_cont,
+                    n_to_save,
+                    block_size,
+                ),
+            ),
+        ) as pool:
+            # only wait for the shards: the scores are already in the output file
+            for _ in pool.imap_unordered(_achilles_shard, shards):
+                pass
+        scores[:] = np.load(scores_path, mmap_mode="r")
+    return scores
+
+
+# per-worker state set up by _init_achilles_worker
+_WORKER = {}
+
+
+def _init_achilles_worker(
+    cat_path: str,
+    cont_path: str,
+    scores_path: str,
+    w_cat: float,
+    w_cont: float,
+    n_to_save: int,
+    block_size: int,
+) -> None:
+    # the BLAS threads of the worker are capped by the resource policy of the pool
+    _WORKER.update(
+        cat=np.load(cat_path, mmap_mode="r"),
+        cont=np.load(cont_path, mmap_mode="r"),
+        scores=np.load(scores_path, mmap_mode="r+"),
+        w_cat=w_cat,
+        w_cont=w_cont,
+        n_to_save=n_to_save,
+        block_size=block_size,
     )
 
 
+def _achilles_shard(bounds: tuple) -> None:
+    """Score the rows [start, stop) and write them into the shared output file"""
+    start, stop = bounds
+    block_size = _WORKER["block_size"]
+    out = _WORKER["scores"]
+    for begin in range(start, stop, block_size):
+        end = min(begin + block_size, stop)
+        out[begin:end] = achilles_block(
+            _WORKER["cat"],
+            _WORKER["cont"],
+            _WORKER["w_cat"],
+            _WORKER["w_cont"],
+            _WORKER["n_to_save"],
+            begin,
+            end,
+        )
+    out.flush()
+
+
 def compute_achilles_seq(
     df: pd.DataFrame,
     categorical_cols: list,
@@ -4,16 +4,25 @@ sys.path.append("../")
 
 ### add feature extractors
 import concurrent.futures
+import functools
 import itertools
 import multiprocessing as mp
-from copy import deepcopy
+from random import Random
 
 import numpy as np
 import pandas as pd
 from optimqbs import qbs
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import OneHotEncoder
 
+from tabriskscore.core.artifacts import ArtifactStore, register_artifact
+from tabriskscore.core.resources import ResourcePolicy, available_cpus
+
+# columns of the synthetic datasets with at most this many distinct values are bitmap-indexed in the C QBS
+QBS_BITMAP_INDEX_VALUES = 64
+# the C QBS only holds integers: continuous columns (normalized to [0, 1] on the auxiliary data) are
+# rounded to multiples of 1 / QBS_CONTINUOUS_SCALE, which keeps the order the query conditions compare
+QBS_CONTINUOUS_SCALE = 1 << 16
+
 ######### Concurrent functions #########
 
 
@@ -28,93 +37,214 @@ def apply_feature_extractor_to_datasets(
     ohe_columns: list,
     ohe_column_names: list,
     continuous_cols: list,
-    feature_extractors: list,
-    do_ohe: list,
+    n_workers: int = None,
+    executor: concurrent.futures.Executor = None,
 ):
     """
     Apply feature extraction to both training and evaluation datasets.
     （文档字符串保持原样，略）
-    """
-
-    queries_list_train = [None] * len(feature_extractors)
-    queries_list_eval = [None] * len(feature_extractors)
-
-    synth_datasets_train = [d[0] for d in datasets_train]
-    membership_labels_train = [d[1] for d in datasets_train]
 
-    synth_datasets_eval = [d[0] for d in datasets_eval]
-    membership_labels_eval = [d[1] for d in datasets_eval]
-
-    # ——构造查询（保持原实现）——————————
-    QUERY_FEATURE_EXTRACTORS = [
-        (
-            "query",
-            range(1, synth_datasets_train[0].shape[1] + 1),
-            1e6,
-            {"categorical": (1,), "continuous": (3,)},
+    The features are those of the query-based extractor of the MIA (see `query_feature_setup`). The datasets are
+    processed by a pool of `n_workers` processes (see `feature_pool`), or by `executor` if given, which can then be
+    reused across target records and whose number of workers `n_workers` should be; with n_workers=1 and no
+    executor they are processed in this process.
+    The result is the same, in the same order, whatever the number of workers.
+    """
+    if len(datasets_train) != len(datasets_eval):
+        raise ValueError(
+            f"{len(datasets_train)} training datasets but {len(datasets_eval)} evaluation datasets"
         )
+    datasets_and_labels = [
+        (dataset, label, train)
+        for pair in zip(datasets_train, datasets_eval)
+        for (dataset, label, *_), train in zip(pair, (True, False))
     ]
-    feature_extractors, do_ohe = get_feature_extractors(QUERY_FEATURE_EXTRACTORS)
-
-    queries_list_train, query_extractor_train = create_queries(
-        queries_list=queries_list_train,
-        feature_extractors=feature_extractors,
-        dataset=synth_datasets_train[0],
-        ohe_columns=ohe_columns,
-        continuous_cols=continuous_cols,
-    )
-    queries_list_eval, query_extractor_eval = create_queries(
-        queries_list=queries_list_eval,
-        feature_extractors=feature_extractors,
-        dataset=synth_datasets_eval[0],
-        ohe_columns=ohe_columns,
-        continuous_cols=continuous_cols,
-    )
-
-    # ——改成顺序循环——————————
-    features_and_labels = []
-    for i in range(len(datasets_train)):
-        # 训练集
-        features_and_labels.append(
-            apply_feature_extractor_one_dataset_parallel(
-                dataset=synth_datasets_train[i],
+    if executor is None and n_workers == 1:
+        features_and_labels = [
+            extract_dataset_features(
+                dataset=dataset,
                 target_record=target_record,
+                membership_label=label,
+                train=train,
                 ohe=ohe,
                 ohe_columns=ohe_columns,
                 ohe_column_names=ohe_column_names,
                 continuous_cols=continuous_cols,
-                feature_extractors=feature_extractors,
-                do_ohe=do_ohe,
-                queries_list=queries_list_train,
-                query_extractor=query_extractor_train,
-                train=True,
-                membership_label=membership_labels_train[i],
-                i=i,
             )
-        )
-        # 评估集
-        features_and_labels.append(
-            apply_feature_extractor_one_dataset_parallel(
-                dataset=synth_datasets_eval[i],
-                target_record=target_record,
-                ohe=ohe,
-                ohe_columns=ohe_columns,
-                ohe_column_names=ohe_column_names,
-                continuous_cols=continuous_cols,
-                feature_extractors=feature_extractors,
-                do_ohe=do_ohe,
-                queries_list=queries_list_eval,
-                query_extractor=query_extractor_eval,
-                train=False,
-                membership_label=membership_labels_eval[i],
-                i=i,
+            for dataset, label, train in datasets_and_labels
+        ]
+    elif executor is None:
+        n_workers = ResourcePolicy().n_workers(n_workers)
+        with feature_pool(
+            ohe, ohe_columns, ohe_column_names, continuous_cols, n_workers
+        ) as pool:
+            features_and_labels = extract_features_parallel(
+                pool, datasets_and_labels, target_record, n_workers
             )
+    else:
+        features_and_labels = extract_features_parallel(
+            executor, datasets_and_labels, target_record, n_workers
         )
 
     print("apply_feature_extractor_to_datasets finished")
     return features_and_labels
 
 
+# worker state of feature_pool: the encoding settings shared by all tasks
+_WORKER = {}
+
+
+def init_feature_worker(
+    ohe: OneHotEncoder,
+    ohe_columns: list,
+    ohe_column_names: list,
+    continuous_cols: list,
+):
+    """
+    Pool initializer: keep the encoding settings in the worker process, so that the tasks only carry a dataset and
+    a target record.
+    """
+    _WORKER.update(
+        ohe=ohe,
+        ohe_columns=ohe_columns,
+        ohe_column_names=ohe_column_names,
+        continuous_cols=continuous_cols,
+    )
+
+
+def feature_pool(
+    ohe: OneHotEncoder,
+    ohe_columns: list,
+    ohe_column_names: list,
+    continuous_cols: list,
+    n_workers: int = None,
+    resources: ResourcePolicy = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Create a persistent process pool extracting the MIA features of synthetic datasets, see
+    `extract_features_parallel`. The pool does not depend on the target record and can serve many of them.
+
+    :param n_workers: Number of worker processes. Defaults to the number of available CPUs divided by the number of
+        threads per worker of the policy.
+    :type n_workers: int
+    :param resources: Resource policy of the workers. Defaults to one thread per worker, without pinning.
+    :type resources: ResourcePolicy, optional
+
+    The other parameters are the same as for `extract_dataset_features`.
+
+    :returns: The process pool, to be used as a context manager.
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    if resources is None:
+        resources = ResourcePolicy()
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=resources.n_workers(n_workers),
+        **resources.pool_kwargs(
+            init_feature_worker, (ohe, ohe_columns, ohe_column_names, continuous_cols)
+        ),
+    )
+
+
+def extract_features_parallel(
+    executor: concurrent.futures.Executor,
+    datasets_and_labels: list,
+    target_record: pd.DataFrame,
+    n_workers: int = None,
+    chunksize: int = None,
+) -> list:
+    """
+    Extract the MIA features of many synthetic datasets on a `feature_pool`.
+
+    :param executor: Pool the datasets are processed by, see `feature_pool`.
+    :type executor: concurrent.futures.ProcessPoolExecutor
+    :param datasets_and_labels: (synthetic dataset, membership label, train flag) for every dataset, in any order.
+    :type datasets_and_labels: list
+    :param target_record: The target record.
+    :type target_record: pd.DataFrame
+    :param n_workers: Number of workers of `executor`, only used to size the chunks. Defaults to the number of
+        available CPUs.
+    :type n_workers: int, optional
+    :param chunksize: Number of datasets sent to a worker at once. Defaults to about four chunks per worker.
+    :type chunksize: int, optional
+
+    :returns: (single-row feature DataFrame, membership label, train flag) for every dataset, in the order of
+        `datasets_and_labels` whatever the order the workers finish in.
+    :rtype: list
+    """
+    if chunksize is None:
+        n_workers = n_workers or available_cpus()
+        chunksize = max(1, len(datasets_and_labels) // (4 * n_workers))
+    return list(
+        executor.map(
+            _extract_worker_features,
+            [d[0] for d in datasets_and_labels],
+            itertools.repeat(target_record),
+            [d[1] for d in datasets_and_labels],
+            [d[2] for d in datasets_and_labels],
+            chunksize=chunksize,
+        )
+    )
+
+
+def _extract_worker_features(dataset, target_record, membership_label, train):
+    return extract_dataset_features(
+        dataset, target_record, membership_label, train, **_WORKER
+    )
+
+
+def extract_dataset_features(
+    dataset: pd.DataFrame,
+    target_record: pd.DataFrame,
+    membership_label: bool,
+    train: bool,
+    ohe: OneHotEncoder,
+    ohe_columns: list,
+    ohe_column_names: list,
+    continuous_cols: list,
+) -> tuple:
+    """
+    Extract the query-based MIA features of one synthetic dataset for one target record.
+
+    :param dataset: The synthetic dataset.
+    :type dataset: pd.DataFrame
+    :param target_record: The target record.
+    :type target_record: pd.DataFrame
+    :param membership_label: Whether the target record was in the training set of the generator.
+    :type membership_label: bool
+    :param train: Whether the dataset is used to train (True) or evaluate (False) the meta-classifier.
+    :type train: bool
+    :param ohe: One-hot encoder fitted on the auxiliary data.
+    :type ohe: OneHotEncoder
+    :param ohe_columns: A list of column names representing categorical features.
+    :type ohe_columns: list
+    :param ohe_column_names: The names of the columns of the one-hot encoding result.
+    :type ohe_column_names: list
+    :param continuous_cols: A list of column names representing continuous features.
+    :type continuous_cols: list
+
+    :returns: (single-row feature DataFrame, membership label, train flag).
+    :rtype: tuple
+    """
+    feature_extractors, do_ohe, queries_list, query_extractor = query_feature_setup(
+        tuple(dataset.columns), tuple(ohe_columns), tuple(continuous_cols)
+    )
+    return apply_feature_extractor_one_dataset_parallel(
+        dataset=dataset,
+        target_record=target_record,
+        ohe=ohe,
+        ohe_columns=ohe_columns,
+        ohe_column_names=ohe_column_names,
+        continuous_cols=continuous_cols,
+        feature_extractors=feature_extractors,
+        do_ohe=do_ohe,
+        queries_list=queries_list,
+        query_extractor=query_extractor,
+        train=train,
+        membership_label=membership_label,
+        i=None,
+    )
+
+
 # -------------------------------
 # ❷ 内层：apply_feature_extractor_one_dataset_parallel
 # -------------------------------
@@ -176,6 +306,98 @@ def apply_feature_extractor_one_dataset_parallel(
     return X, membership_label, train
 
 
+@functools.lru_cache(maxsize=8)
+def query_feature_setup(columns: tuple, ohe_columns: tuple, continuous_cols: tuple):
+    """
+    Build the query-based feature extractor used by the MIA, and its queries, for datasets with the given columns.
+    The queries only depend on the columns, so the result is cached: a pool worker builds them once and reuses
+    them for every dataset it processes.
+
+    :param columns: Columns of the synthetic datasets, in order.
+    :type columns: tuple
+    :param ohe_columns: Categorical columns.
+    :type ohe_columns: tuple
+    :param continuous_cols: Continuous columns.
+    :type continuous_cols: tuple
+
+    :returns: A tuple containing the feature extractors, the do_ohe flags, the queries of each feature extractor
+        and the query extractor.
+    :rtype: tuple
+    """
+    QUERY_FEATURE_EXTRACTORS = [
+        (
+            "query",
+            range(1, len(columns) + 1),
+            1e6,
+            {"categorical": (1,), "continuous": (3,)},
+        )
+    ]
+    feature_extractors, do_ohe = get_feature_extractors(QUERY_FEATURE_EXTRACTORS)
+    queries_list, query_extractor = create_queries(
+        queries_list=[None] * len(feature_extractors),
+        feature_extractors=feature_extractors,
+        dataset=pd.DataFrame(columns=list(columns)),
+        ohe_columns=list(ohe_columns),
+        continuous_cols=list(continuous_cols),
+    )
+    # as int arrays, passed to the C QBS as they are; read-only since the cached queries are shared
+    for idx, queries in enumerate(queries_list):
+        queries_list[idx] = np.asarray(queries, dtype=np.intc)
+        queries_list[idx].flags.writeable = False
+    return feature_extractors, do_ohe, queries_list, query_extractor
+
+
+def extract_target_features(
+    dataset: pd.DataFrame,
+    target_records: pd.DataFrame,
+    ohe: OneHotEncoder,
+    ohe_columns: list,
+    ohe_column_names: list,
+    continuous_cols: list,
+) -> list:
+    """
+    Extract the MIA features of one synthetic dataset for each target record, i.e. each row of `target_records`.
+    Meant to run in the worker that generated the dataset, so that only the features leave the worker.
+
+    :param dataset: The synthetic dataset.
+    :type dataset: pd.DataFrame
+    :param target_records: The target records, one per row.
+    :type target_records: pd.DataFrame
+    :param ohe: One-hot encoder fitted on the auxiliary data.
+    :type ohe: OneHotEncoder
+    :param ohe_columns: A list of column names representing categorical features.
+    :type ohe_columns: list
+    :param ohe_column_names: The names of the columns of the one-hot encoding result.
+    :type ohe_column_names: list
+    :param continuous_cols: A list of column names representing continuous features.
+    :type continuous_cols: list
+
+    :returns: One single-row feature DataFrame per target record, in the order of `target_records`.
+    :rtype: list
+    """
+    feature_extractors, do_ohe, queries_list, query_extractor = query_feature_setup(
+        tuple(dataset.columns), tuple(ohe_columns), tuple(continuous_cols)
+    )
+    return [
+        apply_feature_extractor_one_dataset_parallel(
+            dataset=dataset,
+            target_record=target_records.iloc[[j]],
+            ohe=ohe,
+            ohe_columns=ohe_columns,
+            ohe_column_names=ohe_column_names,
+            continuous_cols=continuous_cols,
+            feature_extractors=feature_extractors,
+            do_ohe=do_ohe,
+            queries_list=queries_list,
+            query_extractor=query_extractor,
+            train=None,
+            membership_label=None,
+            i=j,
+        )[0]
+        for j in range(len(target_records))
+    ]
+
+
 def extract_one_feature(
     feature_extractor,
     queries,
@@ -221,11 +443,11 @@ def extract_one_feature(
     :rtype: tuple
     """
     if isinstance(feature_extractor, tuple):
-        dataset_int = dataset.copy()
-        dataset_int[ohe_columns] = dataset[ohe_columns].astype(int)
-        target_record_int = target_record.copy()
-        target_record_int[ohe_columns] = target_record_int[ohe_columns].astype(int)
-        features, col_names = query_extractor(dataset_int, target_record_int, queries)
+        features, col_names = query_extractor(
+            qbs_int_columns(dataset, ohe_columns, continuous_cols),
+            qbs_int_columns(target_record, ohe_columns, continuous_cols),
+            queries,
+        )
     elif do_ohe:
         features, col_names = feature_extractor(
             data_ohe,
@@ -248,6 +470,31 @@ def extract_one_feature(
 ######### Utility functions and feature extractors #########
 
 
+def qbs_int_columns(
+    df: pd.DataFrame, ohe_columns: list, continuous_cols: list
+) -> pd.DataFrame:
+    """Integer copy of a dataset for the C QBS: the categorical columns are cast to int and the continuous ones are
+    rounded to multiples of 1 / QBS_CONTINUOUS_SCALE and scaled to integers (casting them to int would truncate the
+    normalized values to 0 or 1).
+
+    :param df: Dataset or target record.
+    :type df: pd.DataFrame
+    :param ohe_columns: A list of column names representing categorical features.
+    :type ohe_columns: list
+    :param continuous_cols: A list of column names representing continuous features.
+    :type continuous_cols: list
+    :return: The dataset with integer columns.
+    :rtype: pd.DataFrame
+    """
+    df_int = df.copy()
+    df_int[ohe_columns] = df[ohe_columns].astype(int)
+    if len(continuous_cols):
+        df_int[continuous_cols] = np.rint(
+            df[continuous_cols].to_numpy(dtype=np.float64) * QBS_CONTINUOUS_SCALE
+        ).astype(np.int64)
+    return df_int
+
+
 def fit_ohe(df: pd.DataFrame, categorical_cols: list, metadata: dict) -> tuple:
     # first extract all categories from the metadata
     meta_data_columns = [col["name"] for col in metadata]
@@ -267,6 +514,18 @@ def fit_ohe(df: pd.DataFrame, categorical_cols: list, metadata: dict) -> tuple:
     return ohe, ohe_column_names
 
 
+@register_artifact("lnb_ohe")
+def _build_ohe(
+    store: ArtifactStore, path_to_data: str, path_to_metadata: str, path_to_ids: str
+) -> tuple:
+    """One-hot encoder fitted on the auxiliary split, shared by every target record."""
+    _, categorical_cols, _, meta_data = store.get(
+        "lnb_data", path_to_data, path_to_metadata, ("all",)
+    )
+    df_aux = store.get("lnb_split", path_to_data, path_to_metadata, path_to_ids)[0]
+    return fit_ohe(df_aux, categorical_cols, meta_data)
+
+
 def apply_ohe(
     df: pd.DataFrame,
     ohe: OneHotEncoder,
@@ -419,45 +678,114 @@ def get_queries(
     :type random_state: int, optional
     :return: extracted features and names
     :rtype: list
+
+    The query space is not materialised: when it holds more than `number` queries, `number` distinct positions are
+    drawn uniformly at random and the corresponding queries are computed directly from them (see `_unrank_queries`),
+    so memory only depends on `number`. Otherwise all the queries are returned, in enumeration order.
     """
 
-    all_combinations = []
+    options = [
+        cat_condition_options if c in categorical_indices else cont_condition_options
+        for c in range(num_cols)
+    ]
+    orders = list(orders)
+    suffix = _count_queries_by_suffix([len(o) for o in options])
+    counts = [suffix[0][m] if 0 < m <= num_cols else 0 for m in orders]
+
+    total = sum(counts)
+    if number >= total:
+        return list(_enumerate_queries(orders, options))
+    if total < 2**63:
+        rng = np.random.default_rng(random_state)
+        ranks = rng.choice(total, replace=False, size=(int(number),))
+    else:
+        # beyond int64, draw the positions one by one as Python ints
+        sampler = Random(random_state)
+        ranks = {}
+        while len(ranks) < number:
+            ranks[sampler.randrange(total)] = None
+        ranks = np.array(list(ranks), dtype=object)
+    return _unrank_queries(ranks, orders, counts, options, suffix)
 
+
+def _count_queries_by_suffix(n_options: list) -> list:
+    """
+    suffix[s][r]: number of queries with conditions on exactly r of the columns s, s + 1, ..., i.e. the elementary
+    symmetric polynomial of degree r of their numbers of condition options. Computed with Python ints, exactly.
+    """
+    num_cols = len(n_options)
+    suffix = [[0] * (num_cols + 2) for _ in range(num_cols + 1)]
+    suffix[num_cols][0] = 1
+    for s in range(num_cols - 1, -1, -1):
+        suffix[s][0] = 1
+        for r in range(1, num_cols - s + 1):
+            suffix[s][r] = suffix[s + 1][r] + n_options[s] * suffix[s + 1][r - 1]
+    return suffix
+
+
+def _enumerate_queries(orders: list, options: list):
+    """
+    All the queries of the given orders, in the order of the original enumeration: by order, then by combination of
+    columns (lexicographically), then by condition options with the option of the first column varying fastest.
+    """
+    num_cols = len(options)
     for order in orders:
-        all_indices = list(itertools.combinations(range(num_cols), order))
-        for indices in all_indices:
-            indices_combinations = []
-            for i, index in enumerate(indices):
-                if index in categorical_indices:
-                    index_options = cat_condition_options
-                else:
-                    index_options = cont_condition_options
-                if i == 0:
-                    for index_option in index_options:
-                        base_tup = np.array([0] * num_cols)
-                        base_tup[index] = index_option
-                        indices_combinations.append(base_tup)
-                else:
-                    for j, index_option in enumerate(index_options):
-                        if j == 0:
-                            for base_tup in indices_combinations:
-                                base_tup[index] = index_option
-                        else:
-                            indices_combinations_c = deepcopy(indices_combinations)
-                            for base_tup in indices_combinations_c:
-                                base_tup[index] = index_option
-                            indices_combinations += indices_combinations_c
-            for combo in indices_combinations:
-                all_combinations.append(tuple(combo))
-
-    if number < len(all_combinations):
-        np.random.seed(random_state)
-        indices = np.random.choice(len(all_combinations), replace=False, size=(number,))
-        queries = [all_combinations[idx] for idx in indices]
-    else:
-        queries = all_combinations
+        for columns in itertools.combinations(range(num_cols), order):
+            reversed_options = [options[c] for c in reversed(columns)]
+            for conditions in itertools.product(*reversed_options):
+                query = [0] * num_cols
+                for c, cond in zip(reversed(columns), conditions):
+                    query[c] = int(cond)
+                yield tuple(query)
+
+
+def _unrank_queries(
+    ranks: np.ndarray, orders: list, counts: list, options: list, suffix: list
+) -> list:
+    """
+    The queries at the given positions of the enumeration of `_enumerate_queries`, computed directly from the
+    positions without enumerating the others (vectorized over the positions, one order at a time).
 
-    return queries
+    Within an order, the queries whose next condition is on column c form a block of
+    len(options[c]) * suffix[c + 1][remaining - 1] consecutive positions; inside it, the option of c is the position
+    modulo len(options[c]) and the quotient is the position among the queries on the remaining columns.
+    """
+    num_cols = len(options)
+    # exact Python ints (object arrays) when the positions do not fit in int64
+    dtype = np.int64 if sum(counts) < 2**63 else object
+    n_options = np.array([len(o) for o in options], dtype=dtype)
+    option_table = np.zeros((num_cols, max(len(o) for o in options)), dtype=np.int64)
+    for c, opts in enumerate(options):
+        option_table[c, : len(opts)] = opts
+    suffix = np.array(suffix, dtype=dtype)
+
+    queries = np.zeros((len(ranks), num_cols), dtype=np.int64)
+    offset = 0
+    for order, count in zip(orders, counts):
+        selected = np.flatnonzero((ranks >= offset) & (ranks < offset + count))
+        rank = ranks[selected] - offset
+        offset += count
+        col = np.zeros(len(rank), dtype=np.int64)
+        rows = queries[selected]
+        if not len(rank):
+            continue
+        for remaining in range(order, 0, -1):
+            # skip the columns whose whole block lies before the position
+            while True:
+                block = n_options[col] * suffix[col + 1, remaining - 1]
+                skip = rank >= block
+                if not skip.any():
+                    break
+                rank = rank - np.where(skip, block, 0)
+                col = col + skip
+            k = n_options[col]
+            rows[np.arange(len(rank)), col] = option_table[
+                col, (rank % k).astype(np.int64)
+            ]
+            rank = rank // k
+            col = col + 1
+        queries[selected] = rows
+    return [tuple(query) for query in queries.tolist()]
 
 
 def feature_extractor_queries_CQBS(
@@ -469,26 +797,30 @@ def feature_extractor_queries_CQBS(
     :type synthetic_df: pd.DataFrame
     :param target_record: target record
     :type target_record: pd.DataFrame
-    :param queries: queries
-    :type queries: list
-    :return: extracted features and names
+    :param queries: queries, one row of conditions per query (list of tuples or integer array)
+    :type queries: list or np.ndarray
+    :return: extracted features (the answer to each query) and names
     :rtype: tuple
     """
     # set up qbs of synthetic dataframe and define target values
-    # qbs_data = qbs.SimpleQBS(synthetic_df.itertuples(index=False, name=None))
-
+    # the records are handed over to the QBS as one int array, instead of a list of tuples;
+    # columns with few distinct values are indexed with bitsets (same answers, faster queries)
+    queries = np.asarray(queries, dtype=np.intc)
     try:
-        qbs_data = qbs.SimpleQBS(synthetic_df.itertuples(index=False, name=None))
+        qbs_data = qbs.SimpleQBS(
+            synthetic_df.to_numpy(), bitmap_index=QBS_BITMAP_INDEX_VALUES
+        )
     except Exception:
         import sys
         import traceback
 
         traceback.print_exc()
         sys.exit(1)
-    target_values = [tuple(target_record.values[0])]
+    # not cast here: qbs rejects non-integer values instead of truncating them (see qbs_int_columns)
+    target_values = np.repeat(target_record.to_numpy()[:1], len(queries), axis=0)
 
     # get features by batch-quering using the queries and qbs
-    features = qbs_data.query(target_values * len(queries), queries)
+    features = qbs_data.query(target_values, queries)
 
     # get feature names
     og_data_columns = synthetic_df.columns
@@ -500,12 +832,83 @@ def feature_extractor_queries_CQBS(
                 if cond != 0
             ]
         )
-        for conditions in queries
+        for conditions in queries.tolist()
     ]
 
     return features, col_names
 
 
+def cosine_similarities(synthetic: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Cosine similarity between every synthetic record and the target record, as a single matrix-vector product
+
+    Records with a zero norm have a similarity of 0, as with sklearn's cosine_similarity.
+
+    :param synthetic: synthetic records, of shape (n_records, n_features), or a stack of synthetic datasets of the same size, of shape (n_datasets, n_records, n_features)
+    :type synthetic: np.ndarray
+    :param target: target record, of shape (n_features,)
+    :type target: np.ndarray
+    :return: similarities, of shape (n_records,) or (n_datasets, n_records)
+    :rtype: np.ndarray
+    """
+    synthetic = np.asarray(synthetic, dtype=np.float64)
+    target = np.asarray(target, dtype=np.float64).reshape(-1)
+    norms = np.linalg.norm(synthetic, axis=-1) * np.linalg.norm(target)
+    return np.divide(
+        synthetic @ target, norms, out=np.zeros(norms.shape), where=norms > 0
+    )
+
+
+def top_x_indices(similarities: np.ndarray, top_X: int) -> np.ndarray:
+    """Positions of the top_X largest similarities along the last axis, most similar first
+
+    Only the top_X selected by argpartition are sorted, instead of all the records.
+
+    :param similarities: similarities, of shape (n_records,) or (n_datasets, n_records)
+    :type similarities: np.ndarray
+    :param top_X: number of positions to select, capped to n_records
+    :type top_X: int
+    :return: positions, of shape (top_X,) or (n_datasets, top_X)
+    :rtype: np.ndarray
+    """
+    top_X = min(top_X, similarities.shape[-1])
+    top = np.argpartition(-similarities, top_X - 1, axis=-1)[..., :top_X]
+    order = np.argsort(-np.take_along_axis(similarities, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+
+def topX_features_stack(
+    synthetic: np.ndarray, target: np.ndarray, top_X: int = 50
+) -> np.ndarray:
+    """Batched feature_extractor_topX_full: the top X records most similar to the target record in each of a stack of synthetic datasets
+
+    :param synthetic: stack of one-hot encoded synthetic datasets, of shape (n_datasets, n_records, n_features)
+    :type synthetic: np.ndarray
+    :param target: one-hot encoded target record, of shape (n_features,)
+    :type target: np.ndarray
+    :param top_X: number of most similar records to consider, defaults to 50
+    :type top_X: int, optional
+    :return: features of each dataset, the top X records concatenated, of shape (n_datasets, top_X * n_features)
+    :rtype: np.ndarray
+    """
+    synthetic = np.asarray(synthetic)
+    idx = top_x_indices(cosine_similarities(synthetic, target), top_X)
+    top = np.take_along_axis(synthetic, idx[..., None], axis=1)
+    return top.reshape(len(synthetic), -1)
+
+
+def distance_features_stack(synthetic: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Batched feature_extractor_distances: similarities to the target record of all the records of each of a stack of synthetic datasets, in decreasing order
+
+    :param synthetic: stack of one-hot encoded synthetic datasets, of shape (n_datasets, n_records, n_features)
+    :type synthetic: np.ndarray
+    :param target: one-hot encoded target record, of shape (n_features,)
+    :type target: np.ndarray
+    :return: features of each dataset, of shape (n_datasets, n_records)
+    :rtype: np.ndarray
+    """
+    return np.sort(cosine_similarities(synthetic, target), axis=-1)[..., ::-1]
+
+
 def feature_extractor_topX_full(
     synthetic_df: pd.DataFrame, target_record_ohe: pd.DataFrame, top_X: int = 50
 ):
@@ -520,23 +923,16 @@ def feature_extractor_topX_full(
     :return: extracted features and names
     :rtype: tuple
     """
-    all_cos_sim = np.array(
-        [
-            cosine_similarity(
-                synthetic_df.iloc[i].values.reshape(1, -1),
-                target_record_ohe.values.reshape(1, -1),
-            )[0][0]
-            for i in range(len(synthetic_df))
-        ]
+    all_cos_sim = cosine_similarities(
+        synthetic_df.to_numpy(dtype=np.float64),
+        target_record_ohe.to_numpy(dtype=np.float64),
     )
-    ordered_idx = np.argsort(all_cos_sim)[::-1]
-
-    top_x_data = synthetic_df.iloc[ordered_idx[:top_X]]
+    top_x_data = synthetic_df.iloc[top_x_indices(all_cos_sim, top_X)]
 
     features = list(top_x_data.values.flatten())
     col_names = []
 
-    for i in range(top_X):
+    for i in range(len(top_x_data)):
         col_names += [k + "_top_X=" + str(i) for k in top_x_data.columns]
 
     return features, col_names
@@ -554,14 +950,9 @@ def feature_extractor_distances(
     :return: extracted features and names
     :rtype: tuple
     """
-    all_cos_sim = np.array(
-        [
-            cosine_similarity(
-                synthetic_df.iloc[i].values.reshape(1, -1),
-                target_record_ohe.values.reshape(1, -1),
-            )[0][0]
-            for i in range(len(synthetic_df))
-        ]
+    all_cos_sim = cosine_similarities(
+        synthetic_df.to_numpy(dtype=np.float64),
+        target_record_ohe.to_numpy(dtype=np.float64),
     )
     ordered_vals = np.sort(all_cos_sim)[::-1]
 
@@ -648,15 +1039,11 @@ def apply_feature_extractor_sequential(
                         cat_condition_options=conditions["categorical"],
                         cont_condition_options=conditions["continuous"],
                     )
-                # for C QBS we need int for categorical
-                dataset_int = dataset.copy()
-                dataset_int[ohe_columns] = dataset[ohe_columns].astype(int)
-                target_record_int = target_record.copy()
-                target_record_int[ohe_columns] = target_record_int[ohe_columns].astype(
-                    int
-                )
+                # for C QBS we need int for categorical and continuous columns
                 features, col_names = query_extractor(
-                    dataset_int, target_record_int, queries
+                    qbs_int_columns(dataset, ohe_columns, continuous_cols),
+                    qbs_int_columns(target_record, ohe_columns, continuous_cols),
+                    queries,
                 )
             elif do_ohe[i]:
                 features, col_names = feature_extractor(
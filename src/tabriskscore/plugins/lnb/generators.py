@@ -9,9 +9,43 @@ from reprosyn.methods import (CTGAN, DS_BAYNET, DS_INDHIST, DS_PRIVBAYES,
 class Generator(ABC):
     """Base class for generators"""
 
+    # True if a single fit can produce any number of records, all drawn independently from the fitted model
+    samples_many = False
+
     def __init__(self):
         self.trained = False
 
+    def fit_sample(self, dataset, metadata, size, seed, n_samples=1):
+        """Fit the generator once and draw `n_samples` synthetic datasets of `size` records from it.
+
+        reprosyn only exposes a combined fit-and-generate step, so generators with `samples_many` generate
+        `size * n_samples` records in one run and split them. The others are fitted once per dataset,
+        with seeds `seed`, `seed + 1`, ...
+
+        :param dataset: training data
+        :type dataset: pandas.DataFrame
+        :param metadata: metadata of the training data
+        :type metadata: list
+        :param size: number of records in each synthetic dataset
+        :type size: int
+        :param seed: random seed of the fit
+        :type seed: int
+        :param n_samples: number of synthetic datasets, defaults to 1
+        :type n_samples: int, optional
+        :return: the synthetic datasets
+        :rtype: list
+        """
+        if n_samples == 1 or not self.samples_many:
+            return [
+                self.fit_generate(dataset, metadata, size, seed + i)
+                for i in range(n_samples)
+            ]
+        output = self.fit_generate(dataset, metadata, size * n_samples, seed)
+        return [
+            output.iloc[i * size : (i + 1) * size].reset_index(drop=True)
+            for i in range(n_samples)
+        ]
+
     @property
     def label(self):
         return "Unnamed Generator"
@@ -37,6 +71,8 @@ class identity(Generator):
 class baynet(Generator):
     """This generator is based on BAYNET."""
 
+    samples_many = True
+
     def __init__(self):
         super().__init__()
 
@@ -53,6 +89,8 @@ class baynet(Generator):
 class privbayes(Generator):
     """This generator is based on privbayes."""
 
+    samples_many = True
+
     def __init__(self, epsilon: float):
         self.epsilon = epsilon
         super().__init__()
@@ -76,6 +114,8 @@ class privbayes(Generator):
 class ctgan(Generator):
     """This generator is based on CTGAN."""
 
+    samples_many = True
+
     def __init__(self):
         super().__init__()
 
@@ -109,6 +149,8 @@ class synthpop(Generator):
 class indhist(Generator):
     """This generator is based on INDHIST."""
 
+    samples_many = True
+
     def __init__(self):
         super().__init__()
 
@@ -4,25 +4,42 @@ import os
 import time
 from typing import Any, Dict, List
 
-import nest_asyncio
 import typer
 
-from .data_prep import load_data, split_data
-from .distance import compute_achilles, top_n_vulnerable_records
+from tabriskscore.core.artifacts import artifacts_from_config
+from tabriskscore.core.resources import ResourcePolicy
+
+from .data_prep import load_data
+from .distance import (
+    compute_achilles,
+    estimate_achilles_recall,
+    top_n_vulnerable_records,
+)
 from .mia import mia
 
 # 假设下面这些函数都在同一个目录下（lnb/），并且你已经把 LNB 里对应的源码拷贝过来了：
 #   - load_data(path_to_csv, path_to_metadata) -> (DataFrame, categorical_cols, continuous_cols, meta_data)
 #   - split_data(df, path_to_indices_pickle) -> (df_aux, df_eval, df_target)
-#   - compute_achilles(df_target, categorical_cols, continuous_cols, meta_data, k) -> all_dists
-#   - top_n_vulnerable_records(all_dists, n) -> List（排好序的最脆弱记录索引）
+#   - compute_achilles(df_target, categorical_cols, continuous_cols, meta_data, k) -> all_dists（与 df_target 行对齐的数组）
+#   - top_n_vulnerable_records(all_dists, n, index) -> List（排好序的最脆弱记录索引）
 #   - mia(path_to_data, path_to_metadata, path_to_data_split, target_records, generator_name, n_original, n_synth, n_datasets, epsilon, output_path)
 #
 # 具体的实现文件可能放在 compute.py、data_prep.py、distance.py、mia.py 等，根据你的目录结构自行修改导入路径。
 
 
-# 由于 LNB 某些内部可能用了 asyncio，需要先 apply
-nest_asyncio.apply()
+def _adult_paths(config: Dict) -> tuple:
+    adult_dir = config.get("adult_dir", "data/adult")
+    return (
+        os.path.join(adult_dir, "Adult_dataset.csv"),
+        os.path.join(adult_dir, "Adult_metadata_discretized.json"),
+        os.path.join(adult_dir, "1000_indices.pickle"),
+    )
+
+
+def required_artifacts(config: Dict) -> List[tuple]:
+    """并行模式下由主进程预先构建：拆分后的数据与 one-hot 编码器"""
+    paths = _adult_paths(config)
+    return [("lnb_split", *paths), ("lnb_ohe", *paths)]
 
 
 def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]:
@@ -45,17 +62,17 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
     返回：
         List[Dict[str, Any]]：每个 dict 包含 {"name": str, "value": 任意, "details": dict}
     """
-    # 如果用户在 config 中提供了自定义的 data 目录，优先用它；否则用默认
-    adult_dir = config.get("adult_dir", "data/adult")
     # LNB 参数：k（计算 Achilles 时的 KNN 半径），默认为 5
     k = config.get("k", 5)
     # MIA 参数（除了路径外的参数可以放在这里）
     mia_params = config.get("mia_params", {})
 
-    # 构造相关文件路径
-    path_to_data = os.path.join(adult_dir, "Adult_dataset.csv")
-    path_to_metadata = os.path.join(adult_dir, "Adult_metadata_discretized.json")
-    path_to_indices = os.path.join(adult_dir, "1000_indices.pickle")
+    # 构造相关文件路径：如果用户在 config 中提供了自定义的 adult_dir，优先用它；否则用默认
+    path_to_data, path_to_metadata, path_to_indices = _adult_paths(config)
+    # 与其他插件共享的预处理结果（读表、离散化、归一化只做一次）
+    artifacts = artifacts_from_config(config)
+    # 进程池的资源策略：每个 worker 的 BLAS/OpenMP/torch 线程上限与绑核，Achilles 和 MIA 的进程池共用
+    resources = ResourcePolicy.from_config(config.get("resources"))
 
     # 先检查这些文件是否存在
     missing = []
@@ -70,11 +87,13 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
 
     # ——— 步骤 1：读取并拆分数据 ———
     try:
-        df, categorical_cols, continuous_cols, meta_data = load_data(
-            path_to_data, path_to_metadata
+        _, categorical_cols, continuous_cols, meta_data = load_data(
+            path_to_data, path_to_metadata, artifacts=artifacts
+        )
+        # lnb_split 会根据 pickle 中存好的 1000 条索引，把 df 划分成三个部分
+        _, _, df_target = artifacts.get(
+            "lnb_split", path_to_data, path_to_metadata, path_to_indices
         )
-        # split_data 会根据 pickle 中存好的 1000 条索引，把 df 划分成三个部分
-        df_aux, df_eval, df_target = split_data(df, path_to_indices)
     except Exception as e:
         typer.secho(
             f"❌ LNB 插件在 load_data / split_data 环节出错：{e}", fg=typer.colors.RED
@@ -90,12 +109,38 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
     # ——— 步骤 2：计算 Achilles scores ———
     try:
         t0 = time.time()
-        # compute_achilles 返回一个距离矩阵或字典，表示每个 target-record 到 training set 的 K 最近距离
+        # compute_achilles 返回与 df_target 行对齐的数组：每条记录到其 K 个最近记录的平均距离
+        # n_workers：Achilles 计算的并行进程数（默认 1，设为 null 则用满所有核）
+        # neighbours：近邻搜索后端，如 {"backend": "lsh", "n_tables": 8, "n_bits": 12}，
+        #   默认 exact；非 exact 时抽 recall_samples 条记录估计相对精确搜索的召回率
+        neighbour_params = dict(config.get("neighbours") or {})
+        backend = neighbour_params.pop("backend", "exact")
+        recall_samples = neighbour_params.pop("recall_samples", 200)
         all_dists = compute_achilles(
-            df_target, categorical_cols, continuous_cols, meta_data, k
+            df_target,
+            categorical_cols,
+            continuous_cols,
+            meta_data,
+            k,
+            n_workers=config.get("n_workers", 1),
+            backend=backend,
+            backend_params=neighbour_params,
+            resources=resources,
         )
         t1 = time.time()
         achilles_time = t1 - t0
+        recall = None
+        if backend != "exact":
+            recall = estimate_achilles_recall(
+                df_target,
+                categorical_cols,
+                continuous_cols,
+                meta_data,
+                k,
+                backend,
+                neighbour_params,
+                n_samples=recall_samples,
+            )
     except Exception as e:
         typer.secho(
             f"❌ LNB 插件在 compute_achilles 环节出错：{e}", fg=typer.colors.RED
@@ -111,7 +156,9 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
     # 选出前 top_n 脆弱记录，默认 top_n=100
     top_n = config.get("top_n", 100)
     try:
-        top_n_records = top_n_vulnerable_records(all_dists, top_n)
+        top_n_records = top_n_vulnerable_records(
+            all_dists, top_n, index=df_target.index
+        )
         num_vulnerable = len(top_n_records)
     except Exception as e:
         typer.secho(
@@ -121,7 +168,11 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
 
     # 把 Achilles 用时和脆弱记录数量加入 metrics
     metrics.append(
-        {"name": "achilles_time", "value": achilles_time, "details": {"k": k}}
+        {
+            "name": "achilles_time",
+            "value": achilles_time,
+            "details": {"k": k, "backend": backend, "recall": recall},
+        }
     )
     metrics.append(
         {
@@ -144,6 +195,25 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
             n_datasets=mia_params.get("n_datasets", 10),
             epsilon=mia_params.get("epsilon", 0.0),
             output_path=mia_params.get("output_path", "./output/files/"),
+            artifacts=artifacts,
+            n_workers=mia_params.get("n_workers"),
+            n_original=mia_params.get("n_original", 1000),
+            # pooled：所有目标记录共用一批影子生成器，生成器训练次数不再随目标数增长
+            pooled=mia_params.get("pooled", False),
+            # dataset_cache：影子合成数据集的磁盘缓存目录，只改了攻击特征 / 元分类器时不必重新训练生成器
+            dataset_cache=mia_params.get("dataset_cache"),
+            dataset_cache_mb=mia_params.get("dataset_cache_mb", 4096),
+            # samples_per_fit：每个影子生成器训练一次抽出的数据集个数
+            samples_per_fit=mia_params.get("samples_per_fit", 1),
+            # batch_size：按批生成影子数据集，AUC 置信区间宽度小于 auc_tolerance 即提前停止
+            batch_size=mia_params.get("batch_size"),
+            auc_tolerance=mia_params.get("auc_tolerance", 0.05),
+            # min_datasets：至少用这么多影子数据集后才检查是否可以提前停止，默认两批
+            min_datasets=mia_params.get("min_datasets"),
+            # checkpoint / resume：逐个写入已完成的目标记录与影子数据集特征，重跑时跳过已完成的部分
+            checkpoint=mia_params.get("checkpoint", False),
+            resume=mia_params.get("resume", False),
+            resources=resources,
         )
 
         t3 = time.time()
@@ -162,6 +232,8 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> List[Dict[str, Any]]
                 "n_synth": mia_params.get("n_synth", 1000),
                 "n_datasets": mia_params.get("n_datasets", 10),
                 "epsilon": mia_params.get("epsilon", 0.0),
+                "pooled": mia_params.get("pooled", False),
+                "samples_per_fit": mia_params.get("samples_per_fit", 1),
                 "mia_time": mia_time,
             },
         }
@@ -1,3 +1,5 @@
+import concurrent.futures
+import functools
 import os
 import pickle
 
@@ -5,13 +7,34 @@ import pandas as pd
 from sklearn.metrics import accuracy_score, roc_auc_score
 from tqdm import tqdm
 
-from .classifiers import drop_zero_cols, fit_classifiers, scale_features
-from .data_prep import load_data, split_data
-from .feature_extractors import (apply_feature_extractor_to_datasets, fit_ohe,
-                                 get_feature_extractors)
-from .shadow_data import generate_datasets
+from tabriskscore.core.artifacts import ArtifactStore
+from tabriskscore.core.cache import Checkpoint, DatasetStore, atomic_write, file_digest
+from tabriskscore.core.resources import ResourcePolicy
+
+from .classifiers import (
+    bootstrap_auc_ci,
+    drop_zero_cols,
+    fit_classifiers,
+    scale_features,
+)
+from .data_prep import load_data
+from .feature_extractors import (
+    apply_feature_extractor_to_datasets,
+    extract_target_features,
+    fit_ohe,
+)
+from .shadow_data import (
+    effective_samples_per_fit,
+    generate_datasets,
+    generate_pooled_datasets,
+    shadow_pool,
+    submit_datasets,
+)
 from .utils import ignore_depreciation
 
+# evaluation datasets of each class needed before the AUC interval is trusted for early stopping
+MIN_EVAL_PER_CLASS = 20
+
 
 def mia(
     path_to_data: str,
@@ -24,10 +47,43 @@ def mia(
     epsilon: float = 0.0,
     models: list = ["random_forest", "logistic_regression"],
     output_path: str = "./output/files/",
+    artifacts: ArtifactStore = None,
+    n_workers: int = None,
+    n_original: int = 1000,
+    pooled: bool = False,
+    dataset_cache: str = None,
+    dataset_cache_mb: int = 4096,
+    samples_per_fit: int = 1,
+    batch_size: int = None,
+    auc_tolerance: float = 0.05,
+    min_datasets: int = None,
+    checkpoint: bool = False,
+    resume: bool = False,
+    resources: ResourcePolicy = None,
 ):
     """
     Membership Inference Attack (MIA) function to evaluate data privacy risks.
 
+    All target records share one long-lived process pool: the generation tasks of every target are queued up front,
+    so the pool keeps working on the next targets while the attack of a finished target is being evaluated.
+
+    With `pooled=True`, the shadow generators are shared by all target records instead (see
+    `shadow_data.generate_pooled_datasets`): 2 * n_datasets generators are fitted in total rather than
+    2 * n_datasets per target record, and each synthetic dataset is labelled once per target record.
+
+    With a `batch_size` (per-target design only), the shadow datasets of each target record are generated in batches
+    of that many training and evaluation datasets. After each batch the meta-classifiers are retrained on all the
+    datasets so far, and the target stops as soon as the bootstrap 95% confidence interval of the AUC of every model
+    is narrower than `auc_tolerance`, or when `n_datasets` is reached. The interval is only tested once `min_datasets`
+    datasets and `MIN_EVAL_PER_CLASS` evaluation datasets of each class are used, and a zero-width interval (all the
+    resamples getting the same AUC, e.g. with perfectly separated scores) never counts as converged. The metrics of
+    each model report the number of shadow datasets actually used (`n_datasets`) and the interval (`auc_ci`).
+
+    With `checkpoint=True`, the run is checkpointed to `output_path + 'checkpoint/'`: the features of every batch of
+    shadow datasets and the results of every target record are written atomically as soon as they are available.
+    A run started with `resume=True` loads them and only does the remaining work, provided that it uses the same
+    data and parameters (a `ValueError` is raised otherwise).
+
     :param path_to_data: Path to the data file.
     :type path_to_data: str
     :param path_to_metadata: Path to the metadata file.
@@ -46,42 +102,383 @@ def mia(
     :type epsilon: float
     :param output_path: Path to store output files. Defaults to './output/files/'.
     :type output_path: str
+    :param artifacts: Run-scoped store used to share the loaded/encoded data with other plugins. Defaults to a fresh store.
+    :type artifacts: ArtifactStore
+    :param n_workers: Number of worker processes generating shadow datasets. Defaults to the number of available
+        CPUs divided by the number of threads per worker of `resources`.
+    :type n_workers: int
+    :param n_original: Size of the training set of each shadow generator.
+    :type n_original: int
+    :param pooled: Whether to use one pool of shadow datasets for all target records.
+    :type pooled: bool
+    :param dataset_cache: Directory of the on-disk shadow dataset cache (see `DatasetStore`). No caching if None.
+        Generators whose training set, metadata, seed, epsilon and size were already seen are not fitted again.
+    :type dataset_cache: str
+    :param dataset_cache_mb: Size cap of the shadow dataset cache, in MB. Least recently used datasets are evicted first.
+    :type dataset_cache_mb: int
+    :param samples_per_fit: Number of shadow datasets drawn from each fitted generator. Values above 1 cut the number
+        of fits for BAYNET, privbayes, INDHIST and CTGAN, at the cost of less diverse shadow training sets.
+    :type samples_per_fit: int
+    :param batch_size: Number of shadow datasets generated per batch for early stopping. No early stopping if None.
+    :type batch_size: int
+    :param auc_tolerance: Width of the AUC confidence interval below which a target record stops early.
+    :type auc_tolerance: float
+    :param min_datasets: Number of shadow datasets a target record uses before it may stop early. Defaults to two
+        batches.
+    :type min_datasets: int
+    :param checkpoint: Whether to checkpoint the run, starting afresh.
+    :type checkpoint: bool
+    :param resume: Whether to resume the checkpointed run in `output_path`, if any. Implies `checkpoint`.
+    :type resume: bool
+    :param resources: Thread cap and CPU pinning of the worker processes, see `shadow_data.shadow_pool`.
+    :type resources: ResourcePolicy
 
-    :returns: A dictionary containing the MIA results for each target record.
-    :rtype: dict
+    :returns: The MIA results (target record id, model metrics) for each target record, in the order of `target_records`.
+    :rtype: list
     """
 
-    df, categorical_cols, continuous_cols, meta_data = load_data(
-        path_to_data, path_to_metadata
+    if artifacts is None:
+        artifacts = ArtifactStore()
+    _, categorical_cols, continuous_cols, meta_data = load_data(
+        path_to_data, path_to_metadata, artifacts=artifacts
+    )
+    df_aux, df_eval, df_target = artifacts.get(
+        "lnb_split", path_to_data, path_to_metadata, path_to_data_split
+    )
+    ohe, ohe_column_names = artifacts.get(
+        "lnb_ohe", path_to_data, path_to_metadata, path_to_data_split
     )
-    df_aux, df_eval, df_target = split_data(df, path_to_data_split)
 
     if n_synth is None:
         n_synth = len(df_target)
+    store = None
+    if dataset_cache is not None:
+        store = DatasetStore(dataset_cache, max_bytes=int(dataset_cache_mb) << 20)
 
-    mia_results = []
-    print("mia here")
-    for tr in tqdm(target_records):
-        mia_result = train_evaluate_mia(
+    if pooled and batch_size is not None:
+        raise ValueError(
+            "batch_size (early stopping) is only supported with pooled=False"
+        )
+    run_checkpoint = None
+    if checkpoint or resume:
+        params = {
+            "inputs": [
+                file_digest(path)
+                for path in (path_to_data, path_to_metadata, path_to_data_split)
+            ],
+            "generator_name": generator_name,
+            "n_synth": n_synth,
+            "n_datasets": n_datasets,
+            "epsilon": epsilon,
+            "models": list(models),
+            "n_original": n_original,
+            "pooled": pooled,
+            "samples_per_fit": samples_per_fit,
+            "batch_size": batch_size,
+            "auc_tolerance": auc_tolerance,
+            "min_datasets": min_datasets,
+        }
+        if pooled:
+            # the pooled membership depends on all the target records; the per-target
+            # runs are independent, so their target list may change between resumes
+            params["target_records"] = [str(tr) for tr in target_records]
+        run_checkpoint = Checkpoint(
+            os.path.join(output_path, "checkpoint"), params, resume=resume
+        )
+    if pooled:
+        mia_results = _pooled_mia(
             df_aux=df_aux,
             df_target=df_target,
             meta_data=meta_data,
-            target_record_id=tr,
+            target_records=target_records,
             df_eval=df_eval,
             generator_name=generator_name,
             continuous_cols=continuous_cols,
             categorical_cols=categorical_cols,
             n_synth=n_synth,
+            n_original=n_original,
             n_datasets=n_datasets,
             epsilon=epsilon,
             models=models,
+            ohe=ohe,
+            ohe_column_names=ohe_column_names,
+            n_workers=n_workers,
+            store=store,
+            samples_per_fit=samples_per_fit,
+            checkpoint=run_checkpoint,
+            resources=resources,
+        )
+    else:
+        mia_results = _per_target_mia(
+            df_aux=df_aux,
+            df_target=df_target,
+            meta_data=meta_data,
+            target_records=target_records,
+            df_eval=df_eval,
+            generator_name=generator_name,
+            continuous_cols=continuous_cols,
+            categorical_cols=categorical_cols,
+            n_synth=n_synth,
+            n_original=n_original,
+            n_datasets=n_datasets,
+            epsilon=epsilon,
+            models=models,
+            ohe=ohe,
+            ohe_column_names=ohe_column_names,
+            n_workers=n_workers,
+            store=store,
+            samples_per_fit=samples_per_fit,
+            batch_size=batch_size,
+            auc_tolerance=auc_tolerance,
+            min_datasets=min_datasets,
+            checkpoint=run_checkpoint,
+            resources=resources,
         )
-        mia_results.append(mia_result)
 
     os.makedirs(output_path, exist_ok=True)
+    atomic_write(output_path + "mia_results.pickle", pickle.dumps(mia_results))
+    return mia_results
+
+
+def _per_target_mia(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    meta_data: list,
+    target_records: list,
+    df_eval: pd.DataFrame,
+    generator_name: str,
+    continuous_cols: list,
+    categorical_cols: list,
+    n_synth: int,
+    n_original: int,
+    n_datasets: int,
+    epsilon: float,
+    models: list,
+    ohe,
+    ohe_column_names: list,
+    n_workers: int = None,
+    store: DatasetStore = None,
+    samples_per_fit: int = 1,
+    batch_size: int = None,
+    auc_tolerance: float = 0.05,
+    min_datasets: int = None,
+    checkpoint: Checkpoint = None,
+    resources: ResourcePolicy = None,
+):
+    """
+    Run the MIA of every target record on its own shadow datasets, all generated by one long-lived process pool,
+    in batches if `batch_size` is given (see `mia`).
+    The features of each generation task and the result of each target record are written to `checkpoint`, and the
+    ones already there are used instead of being computed again. The features of a target record are removed once
+    its result is written.
+
+    :returns: The MIA results (target record id, model metrics) for each target record, in the order of `target_records`.
+    :rtype: list
+    """
+    # batches hold a whole number of (with target, without target) fit pairs, so that
+    # every batch is balanced and batching does not change the datasets themselves
+    step = 2 * effective_samples_per_fit(samples_per_fit, n_datasets)
+    early_stopping = batch_size is not None
+    batch_size = -(-min(batch_size or n_datasets, n_datasets) // step) * step
+    if min_datasets is None:
+        min_datasets = 2 * batch_size
+
+    transform = functools.partial(
+        extract_target_features,
+        ohe=ohe,
+        ohe_columns=categorical_cols,
+        ohe_column_names=ohe_column_names,
+        continuous_cols=continuous_cols,
+    )
+    results = {}
+    if checkpoint is not None:
+        for tr in target_records:
+            found, result = checkpoint.get(f"result_{tr}")
+            if found:
+                results[tr] = result
+    # per target: (batch start, task number) -> [(features, membership label, train flag)]
+    features_and_labels = {tr: {} for tr in target_records if tr not in results}
+    n_received = dict.fromkeys(features_and_labels, 0)
+    n_expected = {}
+    pending = {}
+    with (
+        shadow_pool(
+            df_aux,
+            df_target,
+            df_eval,
+            meta_data,
+            n_workers,
+            store,
+            transform,
+            resources,
+        ) as executor,
+        tqdm(total=len(target_records), initial=len(results)) as progress,
+    ):
+
+        def submit_batch(tr, start):
+            stop = min(start + batch_size, n_datasets)
+            cached = {}
+            if checkpoint is not None:
+                for k in range(2 * len(range(start, stop, step // 2))):
+                    found, features = checkpoint.get(f"features_{tr}_{start}_{k}")
+                    if found:
+                        cached[k] = features
+            futures = submit_datasets(
+                executor,
+                df_aux=df_aux,
+                df_target=df_target,
+                target_record=df_target.loc[[tr]],
+                df_eval=df_eval,
+                generator_name=generator_name,
+                n_synth=n_synth,
+                n_original=n_original,
+                n_datasets=n_datasets,
+                seeds_train=list(range(n_datasets)),
+                seeds_eval=list(range(n_datasets, 2 * n_datasets)),
+                epsilon=epsilon,
+                samples_per_fit=samples_per_fit,
+                start=start,
+                stop=stop,
+                skip=cached,
+            )
+            n_expected[tr] = 2 * stop
+            pending.update(
+                {f: (tr, start, k) for k, f in enumerate(futures) if f is not None}
+            )
+            for k, features in cached.items():
+                receive(tr, start, k, features)
+
+        def receive(tr, start, k, features):
+            features_and_labels[tr][start, k] = features
+            n_received[tr] += len(features)
+            if n_received[tr] < n_expected[tr]:
+                return
+            # submission order, so that the result does not depend on worker timing
+            target_features = features_and_labels[tr]
+            result = evaluate_features(
+                features_and_labels=[
+                    f for task in sorted(target_features) for f in target_features[task]
+                ],
+                target_record_id=tr,
+                models=models,
+                min_eval_per_class=MIN_EVAL_PER_CLASS if early_stopping else None,
+            )
+            n_used = n_expected[tr] // 2
+            converged = n_used >= min_datasets and all(
+                0 < m["auc_ci"][1] - m["auc_ci"][0] < auc_tolerance
+                for m in result[1].values()
+            )
+            if n_used < n_datasets and not converged:
+                submit_batch(tr, n_used)
+                return
+            results[tr] = result
+            if checkpoint is not None:
+                checkpoint.put(f"result_{tr}", result)
+                # the result is on disk: its features are no longer needed to resume
+                checkpoint.discard(f"features_{tr}_")
+            del features_and_labels[tr]
+            progress.update()
+
+        # queue the first batch of every target now, in target order: the pool never
+        # drains between two targets. Each worker extracts the features of the datasets
+        # it generates, so only feature vectors come back.
+        for tr in list(features_and_labels):
+            submit_batch(tr, 0)
+
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                tr, start, k = pending.pop(future)
+                features = [(f[0], label, train) for f, label, train in future.result()]
+                if checkpoint is not None:
+                    checkpoint.put(f"features_{tr}_{start}_{k}", features)
+                receive(tr, start, k, features)
+    return [results[tr] for tr in target_records]
 
-    with open(output_path + "mia_results.pickle", "wb") as f:
-        pickle.dump(mia_results, f)
+
+def _pooled_mia(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    meta_data: list,
+    target_records: list,
+    df_eval: pd.DataFrame,
+    generator_name: str,
+    continuous_cols: list,
+    categorical_cols: list,
+    n_synth: int,
+    n_original: int,
+    n_datasets: int,
+    epsilon: float,
+    models: list,
+    ohe,
+    ohe_column_names: list,
+    n_workers: int = None,
+    store: DatasetStore = None,
+    samples_per_fit: int = 1,
+    checkpoint: Checkpoint = None,
+    resources: ResourcePolicy = None,
+):
+    """
+    Run the MIA of every target record on one shared pool of shadow datasets.
+    The generation tasks and the result of each target record are written to `checkpoint`, and the ones already
+    there are used instead of being computed again.
+
+    :returns: The MIA results (target record id, model metrics) for each target record, in the order of `target_records`.
+    :rtype: list
+    """
+    print("Generating pooled shadow datasets...")
+    # the workers extract the features of every target record from each dataset they
+    # generate, and only the feature vectors come back
+    features_train, membership_train, features_eval, membership_eval = (
+        generate_pooled_datasets(
+            df_aux=df_aux,
+            df_target=df_target,
+            meta_data=meta_data,
+            target_records=target_records,
+            df_eval=df_eval,
+            generator_name=generator_name,
+            n_synth=n_synth,
+            n_original=n_original,
+            n_datasets=n_datasets,
+            epsilon=epsilon,
+            n_workers=n_workers,
+            store=store,
+            samples_per_fit=samples_per_fit,
+            transform=functools.partial(
+                extract_target_features,
+                ohe=ohe,
+                ohe_columns=categorical_cols,
+                ohe_column_names=ohe_column_names,
+                continuous_cols=continuous_cols,
+            ),
+            checkpoint=checkpoint,
+            resources=resources,
+        )
+    )
+    mia_results = []
+    for j, tr in enumerate(tqdm(target_records)):
+        if checkpoint is not None:
+            found, result = checkpoint.get(f"result_{tr}")
+            if found:
+                mia_results.append(result)
+                continue
+        features_and_labels = [
+            (features[j], bool(label), True)
+            for features, label in zip(features_train, membership_train[:, j])
+        ] + [
+            (features[j], bool(label), False)
+            for features, label in zip(features_eval, membership_eval[:, j])
+        ]
+        result = evaluate_features(
+            features_and_labels=features_and_labels,
+            target_record_id=tr,
+            models=models,
+        )
+        if checkpoint is not None:
+            checkpoint.put(f"result_{tr}", result)
+        mia_results.append(result)
     return mia_results
 
 
@@ -101,6 +498,10 @@ def train_evaluate_mia(
     epsilon: float = 0.0,
     models: list = None,
     cv: bool = False,
+    ohe=None,
+    ohe_column_names: list = None,
+    n_workers: int = None,
+    executor: concurrent.futures.Executor = None,
 ):
     """
     Train and evaluate a membership inference attack (MIA) using shadow datasets and target record.
@@ -135,6 +536,15 @@ def train_evaluate_mia(
     :type models: list, optional
     :param cv: Whether to use cross-validation during model training (default is False).
     :type cv: bool, optional
+    :param ohe: One-hot encoder already fitted on `df_aux`; fitted here if not provided.
+    :type ohe: OneHotEncoder, optional
+    :param ohe_column_names: Column names produced by `ohe`, required together with `ohe`.
+    :type ohe_column_names: list, optional
+    :param n_workers: Number of worker processes extracting the features. Defaults to the number of CPUs.
+    :type n_workers: int, optional
+    :param executor: Pool extracting the features (see `feature_extractors.feature_pool`), to be reused across
+        target records, with `n_workers` workers. A pool of `n_workers` processes is created for this call if None.
+    :type executor: concurrent.futures.Executor, optional
     :param output_path: Path to save output files (default is './output/files/').
     :type output_path: str, optional
 
@@ -144,7 +554,6 @@ def train_evaluate_mia(
     :rtype: tuple
     """
 
-    target_record = df_target.loc[[target_record_id]]
     print("Generating shadow datasets...")
     datasets_and_labels = generate_datasets(
         df_aux=df_aux,
@@ -159,24 +568,84 @@ def train_evaluate_mia(
         seeds_eval=seeds_eval,
         epsilon=epsilon,
     )
+    return evaluate_shadow_datasets(
+        datasets_and_labels=datasets_and_labels,
+        df_aux=df_aux,
+        df_target=df_target,
+        meta_data=meta_data,
+        target_record_id=target_record_id,
+        continuous_cols=continuous_cols,
+        categorical_cols=categorical_cols,
+        models=models,
+        cv=cv,
+        ohe=ohe,
+        ohe_column_names=ohe_column_names,
+        n_workers=n_workers,
+        executor=executor,
+    )
+
+
+def evaluate_shadow_datasets(
+    datasets_and_labels: list,
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    meta_data: list,
+    target_record_id: int,
+    continuous_cols: list,
+    categorical_cols: list,
+    models: list = None,
+    cv: bool = False,
+    ohe=None,
+    ohe_column_names: list = None,
+    n_workers: int = None,
+    executor: concurrent.futures.Executor = None,
+):
+    """
+    Extract features from the shadow datasets of one target record, train the meta-classifiers and evaluate them.
+
+    :param datasets_and_labels: (synthetic dataset, membership label, train flag) for every shadow dataset of the target.
+    :type datasets_and_labels: list
+    :param df_aux: Auxiliary dataset the one-hot encoding is fitted on.
+    :type df_aux: pd.DataFrame
+    :param df_target: Dataset containing the target record for MIA.
+    :type df_target: pd.DataFrame
+    :param meta_data: Metadata information used for feature extraction.
+    :type meta_data: list
+    :param target_record_id: The ID of the target record for MIA.
+    :type target_record_id: int
+    :param continuous_cols: A list of column names representing continuous features.
+    :type continuous_cols: list
+    :param categorical_cols: A list of column names representing categorical features.
+    :type categorical_cols: list
+    :param models: A list of model names to use for training the meta-classifier.
+    :type models: list, optional
+    :param cv: Whether to use cross-validation during model training (default is False).
+    :type cv: bool, optional
+    :param ohe: One-hot encoder already fitted on `df_aux`; fitted here if not provided.
+    :type ohe: OneHotEncoder, optional
+    :param ohe_column_names: Column names produced by `ohe`, required together with `ohe`.
+    :type ohe_column_names: list, optional
+    :param n_workers: Number of worker processes extracting the features (see
+        `feature_extractors.apply_feature_extractor_to_datasets`). Defaults to the number of CPUs.
+    :type n_workers: int, optional
+    :param executor: Pool extracting the features (see `feature_extractors.feature_pool`), to be reused across
+        target records, with `n_workers` workers. A pool of `n_workers` processes is created for this call if None.
+    :type executor: concurrent.futures.Executor, optional
+
+    :returns: A tuple containing:
+        - target_record_id (int): The ID of the target record used for MIA.
+        - model_metrics (dict): A dictionary containing AUC and accuracy metrics for each trained model.
+    :rtype: tuple
+    """
+    target_record = df_target.loc[[target_record_id]]
     datasets_train = [d for d in datasets_and_labels if d[2] is True]
     datasets_eval = [d for d in datasets_and_labels if d[2] is False]
 
     # fit one-hot encoding
-    ohe, ohe_column_names = fit_ohe(df_aux, categorical_cols, meta_data)
+    if ohe is None:
+        ohe, ohe_column_names = fit_ohe(df_aux, categorical_cols, meta_data)
 
     # Compute the query-based features
-    QUERY_FEATURE_EXTRACTORS = [
-        (
-            "query",
-            range(1, df_aux.shape[1] + 1),
-            1e6,
-            {"categorical": (1,), "continuous": (3,)},
-        )
-    ]
-
-    feature_extractors, do_ohe = get_feature_extractors(QUERY_FEATURE_EXTRACTORS)
-
     ignore_depreciation()
     print("Extracting training features = =")
     features_and_labels = apply_feature_extractor_to_datasets(
@@ -187,10 +656,45 @@ def train_evaluate_mia(
         ohe_columns=categorical_cols,
         ohe_column_names=ohe_column_names,
         continuous_cols=continuous_cols,
-        feature_extractors=feature_extractors,
-        do_ohe=do_ohe,
+        n_workers=n_workers,
+        executor=executor,
+    )
+    return evaluate_features(
+        features_and_labels=features_and_labels,
+        target_record_id=target_record_id,
+        models=models,
+        cv=cv,
     )
 
+
+def evaluate_features(
+    features_and_labels: list,
+    target_record_id: int,
+    models: list = None,
+    cv: bool = False,
+    min_eval_per_class: int = None,
+):
+    """
+    Train the meta-classifiers on the features of the shadow datasets of one target record and evaluate them.
+
+    :param features_and_labels: (single-row feature DataFrame, membership label, train flag) for every shadow dataset.
+    :type features_and_labels: list
+    :param target_record_id: The ID of the target record for MIA.
+    :type target_record_id: int
+    :param models: A list of model names to use for training the meta-classifier.
+    :type models: list, optional
+    :param cv: Whether to use cross-validation during model training (default is False).
+    :type cv: bool, optional
+    :param min_eval_per_class: If given, the bootstrap 95% confidence interval of the AUC is also computed, as
+        (0.0, 1.0) when a class has fewer evaluation datasets than that (see `classifiers.bootstrap_auc_ci`).
+    :type min_eval_per_class: int, optional
+
+    :returns: A tuple containing:
+        - target_record_id (int): The ID of the target record used for MIA.
+        - model_metrics (dict): A dictionary containing, for each trained model, its AUC and accuracy, the
+          number of shadow datasets it was trained on and, with `min_eval_per_class`, the AUC interval.
+    :rtype: tuple
+    """
     X_train = pd.concat([d[0] for d in features_and_labels if d[2] is True])
     y_train = pd.Series([d[1] for d in features_and_labels if d[2] is True])
 
@@ -211,5 +715,13 @@ def train_evaluate_mia(
         preds = m.predict_proba(X_eval)
         accuracy = accuracy_score(y_eval, (preds[:, 1] > 0.5) * 1)
         auc = roc_auc_score(y_eval, preds[:, 1])
-        model_metrics[models[i]] = {"auc": auc, "accuracy": accuracy}
+        model_metrics[models[i]] = {
+            "auc": auc,
+            "accuracy": accuracy,
+            "n_datasets": len(y_train),
+        }
+        if min_eval_per_class is not None:
+            model_metrics[models[i]]["auc_ci"] = bootstrap_auc_ci(
+                y_eval, preds[:, 1], min_per_class=min_eval_per_class
+            )
     return target_record_id, model_metrics
@@ -6,11 +6,11 @@ import seaborn as sns
 from .distance import top_n_vulnerable_dists
 
 
-def plot_achilles(distances: dict[int, float], n: int) -> None:
+def plot_achilles(distances, n: int) -> None:
     """Plot histogram of Achilles scores
 
-    :param distances: dictionary where key is record id, value is Achilles score
-    :type distances: dict
+    :param distances: Achilles scores as returned by compute_achilles, or a dictionary where key is record id, value is Achilles score
+    :type distances: np.ndarray | dict
     :param n: number of most vulnerable records to identify
     :type n: int
     """
@@ -20,9 +20,7 @@ def plot_achilles(distances: dict[int, float], n: int) -> None:
 
     thresh = np.min(top_n)
 
-    plot_df = pd.DataFrame(
-        {"Achilles score": distances.values()}, index=distances.keys()
-    )
+    plot_df = pd.DataFrame({"Achilles score": pd.Series(distances, dtype=float)})
 
     plot_df = plot_df.assign(
         Vulnerability=plot_df["Achilles score"].map(
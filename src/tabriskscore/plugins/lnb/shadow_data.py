@@ -1,113 +1,243 @@
 ### Add pipeline to create data for shadow modeling
 import concurrent.futures
+import functools
 import pickle as pickle
-from random import sample
+from random import Random
+from typing import Callable, Container
 
+import numpy as np
 import pandas as pd
 
+from tabriskscore.core.cache import Checkpoint, DatasetStore
+from tabriskscore.core.resources import ResourcePolicy
+
 from .generators import get_generator
 from .utils import blockPrint, enablePrint
 
-### Parallelized functions for generating shadow and evaluation synthetic datasets
+### Worker state: the reference frames are sent once to each worker of the pool, and the tasks only carry row
+### positions and seeds. A training set is described by `rows`, a tuple of three arrays of row positions in
+### `df_aux`, `df_target` and `df_eval`; the training set is the concatenation of these rows, in this order.
 
+_WORKER = {}
 
-def generate_dataset_parallel(
+
+def init_shadow_worker(
     df_aux: pd.DataFrame,
     df_target: pd.DataFrame,
+    df_eval: pd.DataFrame,
     meta_data: list,
-    target_record: pd.DataFrame,
+    store: DatasetStore = None,
+    transform: Callable = None,
+):
+    """
+    Pool initializer: keep the reference frames and the settings shared by all tasks in the worker process.
+
+    :param df_aux: Auxiliary dataset.
+    :type df_aux: pandas.DataFrame
+    :param df_target: Target dataset.
+    :type df_target: pandas.DataFrame
+    :param df_eval: Evaluation pool.
+    :type df_eval: pandas.DataFrame
+    :param meta_data: List containing metadata concerning the data, necessary for training synthetic data generators.
+    :type meta_data: list
+    :param store: Shadow dataset cache, see `fit_generate_datasets`.
+    :type store: DatasetStore, optional
+    :param transform: Function applied in the worker to each synthetic dataset, as
+        `transform(dataset, target_records=...)` with the target records of the task; its result is returned in place
+        of the dataset, which is then discarded. Typically `feature_extractors.extract_target_features`.
+    :type transform: Callable, optional
+    """
+    _WORKER.update(
+        df_aux=df_aux,
+        df_target=df_target,
+        df_eval=df_eval,
+        meta_data=meta_data,
+        store=store,
+        transform=transform,
+    )
+
+
+def shadow_pool(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
     df_eval: pd.DataFrame,
-    in_dataset: bool,
+    meta_data: list,
+    n_workers: int = None,
+    store: DatasetStore = None,
+    transform: Callable = None,
+    resources: ResourcePolicy = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Create a process pool whose workers are initialised once with the reference frames (see `init_shadow_worker`).
+    Every worker first applies the resource policy, which caps the threads of BLAS, OpenMP and torch in the worker
+    (and pins it to its own CPUs if asked to), so that the generators of the workers do not oversubscribe the cores.
+
+    :param n_workers: Number of worker processes. Defaults to the number of available CPUs divided by the number of
+        threads per worker of the policy.
+    :type n_workers: int
+    :param resources: Resource policy of the workers. Defaults to one thread per worker, without pinning.
+    :type resources: ResourcePolicy, optional
+
+    The other parameters are the same as for `init_shadow_worker`.
+
+    :returns: The process pool, to be used as a context manager.
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    if resources is None:
+        resources = ResourcePolicy()
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=resources.n_workers(n_workers),
+        **resources.pool_kwargs(
+            init_shadow_worker,
+            (df_aux, df_target, df_eval, meta_data, store, transform),
+        ),
+    )
+
+
+def training_set(rows: tuple) -> pd.DataFrame:
+    """
+    Build a training set from the frames of the worker.
+
+    :param rows: Row positions in `df_aux`, `df_target` and `df_eval`.
+    :type rows: tuple
+
+    :returns: The training set.
+    :rtype: pandas.DataFrame
+    """
+    frames = (_WORKER["df_aux"], _WORKER["df_target"], _WORKER["df_eval"])
+    parts = [frame.iloc[pos] for frame, pos in zip(frames, rows) if len(pos)]
+    return pd.concat(parts, axis=0) if len(parts) > 1 else parts[0]
+
+
+def generate_from_rows(
+    rows: tuple,
     generator_name: str,
     n_synth: int,
-    n_original: int,
-    seeds_train: list,
-    seeds_eval: list,
-    idx: int,
-    shadow_datasets: list,
-    shadow_membership_labels: list,
-    evaluation_datasets: list,
-    evaluation_membership_labels: list,
+    seed: int,
     epsilon: float,
+    n_samples: int = 1,
+    target_ids: list = None,
+) -> list:
+    """
+    Train one generator on the training set described by `rows` and draw `n_samples` synthetic datasets from it.
+    Runs in a worker of a `shadow_pool`.
+
+    :param rows: Row positions of the training set, see `training_set`.
+    :type rows: tuple
+    :param target_ids: Indices in `df_target` of the target records passed to the transform of the worker.
+    :type target_ids: list, optional
+
+    The other parameters are the same as for `fit_generate_datasets`.
+
+    :returns: The synthetic datasets, or their transforms.
+    :rtype: list
+    """
+    transform = _WORKER["transform"]
+    if transform is not None:
+        transform = functools.partial(
+            transform, target_records=_WORKER["df_target"].loc[list(target_ids)]
+        )
+    return fit_generate_datasets(
+        df_train=training_set(rows),
+        meta_data=_WORKER["meta_data"],
+        generator_name=generator_name,
+        n_synth=n_synth,
+        seed=seed,
+        epsilon=epsilon,
+        n_samples=n_samples,
+        store=_WORKER["store"],
+        transform=transform,
+    )
+
+
+### Parallelized functions for generating shadow and evaluation synthetic datasets
+
+
+def generate_dataset_parallel(
+    rows: tuple,
+    in_dataset: bool,
     train: bool,
-):
+    generator_name: str,
+    n_synth: int,
+    seed: int,
+    epsilon: float,
+    n_samples: int = 1,
+    target_ids: list = None,
+) -> list:
     """
-    This function trains one generator and generates a single dataset. The generator is trained on `df_target`,
-    either with the target record swapped out for a different record sampled from `df_eval` (in_dataset=False),
-    or on the full `df_target` containing the target record (in_dataset=True). The generated synthetic dataset and
-    its membership label are placed in the corresponding lists.
+    This function trains one generator and generates `n_samples` datasets from it (a single one by default), in a
+    worker of a `shadow_pool`. The training set is described by `rows` (see `target_training_rows`).
 
-    :param df_target: Target dataset.
-    :type df_target: pandas.DataFrame
-    :param meta_data: List containing metadata concerning the data (feature types, ranges, etc.), necessary for training synthetic data generators.
-    :type meta_data: list
-    :param target_record: DataFrame containing only the target record.
-    :type target_record: pandas.DataFrame
-    :param df_eval: Evaluation pool to draw the reference record from.
-    :type df_eval: pandas.DataFrame
+    :param rows: Row positions of the training set, see `training_set`.
+    :type rows: tuple
     :param in_dataset: If True, the target record is in the dataset used to train the synthetic data generator.
-        If False, it is replaced by a reference record randomly sampled from `df_eval`.
     :type in_dataset: bool
+    :param train: Whether the synthetic datasets are used for MIA training or evaluation.
+    :type train: bool
     :param generator_name: Name of the generator used, e.g., 'SYNTHPOP', 'BAYNET', etc. See reprosyn library for more details.
     :type generator_name: str
     :param n_synth: Size of each synthetic dataset.
     :type n_synth: int
-    :param seeds: List of seed values; length must be equal to `n_datasets`.
-    :type seeds: list
-    :param idx: Counter for number of generated synthetic datasets.
-    :type idx: int
-    :param synthetic_datasets: List containing all generated synthetic datasets. This function generates a single synthetic dataset and places it in the list, selecting the position according to `idx`.
-    :type synthetic_datasets: list
-    :param membership_labels: List containing membership labels for each synthetic dataset. If the target record is included in the training set, the membership label is 1, otherwise it is 0. Label at index `idx` in `membership_labels` corresponds to the synthetic dataset at index `idx` in `synthetic_datasets`.
-    :type membership_labels: list
+    :param seed: Seed of the generator.
+    :type seed: int
     :param epsilon: Epsilon when training with differential privacy.
     :type epsilon: float
+    :param n_samples: Number of synthetic datasets drawn from the generator.
+    :type n_samples: int
+    :param target_ids: Indices of the target records passed to the transform of the worker.
+    :type target_ids: list, optional
 
-    :return: synthetic dataset,
+    :return: for each synthetic dataset, a tuple of: synthetic dataset (or its transform),
              bool indicating whether the synthetic data generator was trained on the target record,
              bool indicating whether the synthetic dataset is used for MIA training or evaluation
-    :rtype: tuple
+    :rtype: list
     """
-    generator = get_generator(generator_name, epsilon=epsilon)
-    if train:
-        if in_dataset:
-            indices = sample(list(df_aux.index), n_original - 1)
-            df_train = pd.concat([df_aux.loc[indices], target_record], axis=0)
-        else:
-            indices = sample(list(df_aux.index), n_original)
-            df_train = df_aux.loc[indices]
+    synthetic_datasets = generate_from_rows(
+        rows=rows,
+        generator_name=generator_name,
+        n_synth=n_synth,
+        seed=seed,
+        epsilon=epsilon,
+        n_samples=n_samples,
+        target_ids=target_ids,
+    )
+    return [(d, in_dataset, train) for d in synthetic_datasets]
 
-        blockPrint()
-        synthetic_dataset = generator.fit_generate(
-            dataset=df_train,
-            metadata=meta_data,
-            size=n_synth,
-            seed=seeds_train[idx],
-        )
-        enablePrint()
-    else:
-        if in_dataset:
-            df_train = pd.concat([df_target, target_record], axis=0)
-        else:
-            reference_record = df_eval.sample(1)
-            df_train = pd.concat([df_target, reference_record], axis=0)
-        blockPrint()
-        synthetic_dataset = generator.fit_generate(
-            dataset=df_train,
-            metadata=meta_data,
-            size=n_synth,
-            seed=seeds_eval[idx],
-        )
-        enablePrint()
 
-    if train:
-        shadow_datasets[idx] = synthetic_dataset
-        shadow_membership_labels[idx] = in_dataset
-    else:
-        evaluation_datasets[idx] = synthetic_dataset
-        evaluation_membership_labels[idx] = in_dataset
+def target_training_rows(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    df_eval: pd.DataFrame,
+    target_record: pd.DataFrame,
+    in_dataset: bool,
+    train: bool,
+    n_original: int,
+    seed: int,
+) -> tuple:
+    """
+    Describe the training set of one generator of the per-target design, as row positions (see `training_set`).
+    For MIA training, the generator is trained on `n_original` records sampled from `df_aux`, one of which is replaced
+    by the target record if `in_dataset`. For evaluation, it is trained on `df_target` with either the target record
+    appended (in_dataset=True) or a reference record sampled from `df_eval` (in_dataset=False).
+    The subsets are drawn from the seed, so that a rerun rebuilds the same training sets and finds their synthetic
+    datasets in the store.
 
-    return synthetic_dataset, in_dataset, train
+    :returns: Row positions in `df_aux`, `df_target` and `df_eval`.
+    :rtype: tuple
+    """
+    none = np.empty(0, dtype=np.intp)
+    target_pos = df_target.index.get_loc(target_record.index[0])
+    if train:
+        if in_dataset:
+            aux_pos = Random(seed).sample(range(len(df_aux)), n_original - 1)
+            return np.asarray(aux_pos, dtype=np.intp), np.array([target_pos]), none
+        aux_pos = Random(seed).sample(range(len(df_aux)), n_original)
+        return np.asarray(aux_pos, dtype=np.intp), none, none
+    everything = np.arange(len(df_target))
+    if in_dataset:
+        return none, np.append(everything, target_pos), none
+    reference_record = df_eval.sample(1, random_state=seed)
+    return none, everything, df_eval.index.get_indexer(reference_record.index)
 
 
 def generate_datasets_parallel(
@@ -124,6 +254,8 @@ def generate_datasets_parallel(
     seeds_eval: list,
     epsilon: float,
     train: bool,
+    store: DatasetStore = None,
+    samples_per_fit: int = 1,
 ):
     """
     This function allows evaluation datasets to be generated concurrently. It is not meant to be called directly,
@@ -148,54 +280,135 @@ def generate_datasets_parallel(
     :type seeds: list
     :param epsilon: Epsilon when training with differential privacy.
     :type epsilon: float
+    :param store: Shadow dataset cache, see `fit_generate_datasets`.
+    :type store: DatasetStore, optional
+    :param samples_per_fit: Number of synthetic datasets drawn from each fitted generator, see `submit_datasets`.
+    :type samples_per_fit: int
 
     :returns: A tuple containing:
         - A list of all generated synthetic datasets.
         - A list of membership labels for each generated synthetic dataset.
     :rtype: tuple
     """
-    shadow_datasets = [None] * n_datasets
-    shadow_membership_labels = [None] * n_datasets
-
-    evaluation_datasets = [None] * n_datasets
-    evaluation_membership_labels = [None] * n_datasets
-
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        futures = []
-        for i in range(n_datasets * 2):
-            in_dataset = i % 2 == 0
-            train = i < n_datasets
-            if train:
-                idx = i
-            else:
-                idx = i - n_datasets
-            futures.append(
-                executor.submit(
-                    generate_dataset_parallel,
+    with shadow_pool(df_aux, df_target, df_eval, meta_data, store=store) as executor:
+        futures = submit_datasets(
+            executor,
+            df_aux=df_aux,
+            df_target=df_target,
+            target_record=target_record,
+            df_eval=df_eval,
+            generator_name=generator_name,
+            n_synth=n_synth,
+            n_original=n_original,
+            n_datasets=n_datasets,
+            seeds_train=seeds_train,
+            seeds_eval=seeds_eval,
+            epsilon=epsilon,
+            samples_per_fit=samples_per_fit,
+        )
+        datasets_and_labels = [
+            d for f in concurrent.futures.as_completed(futures) for d in f.result()
+        ]
+    return datasets_and_labels
+
+
+def effective_samples_per_fit(samples_per_fit: int, n_datasets: int) -> int:
+    """
+    Cap the number of datasets drawn per fit so that at least two generators are fitted, one for each label.
+
+    :returns: The number of datasets actually drawn from each fitted generator.
+    :rtype: int
+    """
+    return max(1, min(samples_per_fit, n_datasets // 2))
+
+
+def submit_datasets(
+    executor: concurrent.futures.Executor,
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    target_record: pd.DataFrame,
+    df_eval: pd.DataFrame,
+    generator_name: str,
+    n_synth: int,
+    n_original: int,
+    n_datasets: int,
+    seeds_train: list,
+    seeds_eval: list,
+    epsilon: float,
+    samples_per_fit: int = 1,
+    start: int = 0,
+    stop: int = None,
+    skip: Container = (),
+) -> list:
+    """
+    Submit the 2 * n_datasets generation tasks of one target record to a `shadow_pool`, without waiting for them.
+    This lets the caller keep a single long-lived pool busy across many target records (see `lnb.mia.mia`).
+    Exactly half of the synthetic data generators are trained on data including the target record.
+    With `samples_per_fit` > 1, each generator produces that many consecutive datasets, all with the same label;
+    it is capped so that there is always at least one generator with and one without the target record.
+    The tasks only carry row positions and seeds: the frames must be the ones the pool was initialised with.
+    `start` and `stop` restrict the submission to the datasets with these indices, to generate them in batches;
+    a batch gets the same datasets and labels as the full submission.
+    Tasks whose number (position in the returned list) is in `skip`, e.g. already checkpointed, are not submitted.
+
+    :param executor: Pool the tasks are submitted to, see `shadow_pool`.
+    :type executor: concurrent.futures.ProcessPoolExecutor
+    :param target_record: DataFrame containing only the target record.
+    :type target_record: pandas.DataFrame
+    :param n_datasets: Number of synthetic datasets to generate for training, and again for evaluation.
+    :type n_datasets: int
+    :param samples_per_fit: Number of synthetic datasets drawn from each fitted generator.
+    :type samples_per_fit: int
+    :param start: Index of the first dataset to generate, a multiple of the effective `samples_per_fit`.
+    :type start: int
+    :param stop: Index after the last dataset to generate. Defaults to `n_datasets`.
+    :type stop: int, optional
+    :param skip: Numbers of the tasks not to submit.
+    :type skip: Container, optional
+
+    The other parameters are the same as for `generate_datasets_parallel`.
+
+    :returns: One future per task, None for the skipped tasks, each resolving to a list of (synthetic dataset or its
+        transform, membership label, train flag).
+    :rtype: list
+    """
+    samples_per_fit = effective_samples_per_fit(samples_per_fit, n_datasets)
+    stop = n_datasets if stop is None else min(stop, n_datasets)
+    tasks = [
+        (train, idx, (idx // samples_per_fit) % 2 == 0)
+        for train in (True, False)
+        for idx in range(start, stop, samples_per_fit)
+    ]
+    futures = []
+    for k, (train, idx, in_dataset) in enumerate(tasks):
+        if k in skip:
+            futures.append(None)
+            continue
+        seed = seeds_train[idx] if train else seeds_eval[idx]
+        futures.append(
+            executor.submit(
+                generate_dataset_parallel,
+                rows=target_training_rows(
                     df_aux=df_aux,
                     df_target=df_target,
-                    meta_data=meta_data,
-                    target_record=target_record,
                     df_eval=df_eval,
+                    target_record=target_record,
                     in_dataset=in_dataset,
-                    generator_name=generator_name,
-                    n_synth=n_synth,
-                    n_original=n_original,
-                    seeds_train=seeds_train,
-                    seeds_eval=seeds_eval,
-                    idx=idx,
-                    shadow_datasets=shadow_datasets,
-                    shadow_membership_labels=shadow_membership_labels,
-                    evaluation_datasets=evaluation_datasets,
-                    evaluation_membership_labels=evaluation_membership_labels,
-                    epsilon=epsilon,
                     train=train,
-                )
+                    n_original=n_original,
+                    seed=seed,
+                ),
+                in_dataset=in_dataset,
+                train=train,
+                generator_name=generator_name,
+                n_synth=n_synth,
+                seed=seed,
+                epsilon=epsilon,
+                n_samples=min(samples_per_fit, stop - idx),
+                target_ids=list(target_record.index),
             )
-        datasets_and_labels = [
-            f.result() for f in concurrent.futures.as_completed(futures)
-        ]
-    return datasets_and_labels
+        )
+    return futures
 
 
 def generate_datasets(
@@ -211,6 +424,8 @@ def generate_datasets(
     seeds_train: list = None,
     seeds_eval: list = None,
     epsilon: float = 0.0,
+    store: DatasetStore = None,
+    samples_per_fit: int = 1,
 ):
     """
     Launch the pipeline to generate evaluation synthetic datasets.
@@ -233,6 +448,10 @@ def generate_datasets(
     :type seeds: list
     :param epsilon: Epsilon when training with differential privacy.
     :type epsilon: float
+    :param store: Shadow dataset cache, see `fit_generate_datasets`.
+    :type store: DatasetStore, optional
+    :param samples_per_fit: Number of synthetic datasets drawn from each fitted generator, see `submit_datasets`.
+    :type samples_per_fit: int
 
     :returns: A list containing tuples of (synthetic dataset, membership label)
     :rtype: list
@@ -258,4 +477,262 @@ def generate_datasets(
         seeds_eval=seeds_eval,
         epsilon=epsilon,
         train=False,
+        store=store,
+        samples_per_fit=samples_per_fit,
+    )
+
+
+### Pooled shadow design: one set of generators shared by all target records
+
+
+def pooled_membership(n_datasets: int, n_targets: int, seed: int = 0):
+    """
+    Draw the membership matrix of a pooled shadow design. Every target record is included in exactly half of the
+    datasets (rounded up), independently of the other targets, so each target gets a balanced set of labels.
+
+    :param n_datasets: Number of datasets in the pool.
+    :type n_datasets: int
+    :param n_targets: Number of target records.
+    :type n_targets: int
+    :param seed: Seed of the random assignment.
+    :type seed: int
+
+    :returns: Boolean array of shape (n_datasets, n_targets), True where the target is in the dataset.
+    :rtype: numpy.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    column = np.arange(n_datasets) < (n_datasets + 1) // 2
+    return np.stack([rng.permutation(column) for _ in range(n_targets)], axis=1)
+
+
+def pooled_training_sets(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    df_eval: pd.DataFrame,
+    target_records: list,
+    n_original: int,
+    n_datasets: int,
+    seed: int = 0,
+):
+    """
+    Describe the training sets of a pooled shadow design, as row positions (see `training_set`).
+
+    Shadow (MIA training) dataset `i` is a random subset of `df_aux` completed with the target records marked in row
+    `i` of the shadow membership matrix, so that it always has `n_original` records.
+    Evaluation dataset `i` is `df_target` where every target record not marked in row `i` of the evaluation
+    membership matrix is replaced by a record sampled from `df_eval`, so that it always has `len(df_target)` records
+    and a target record is a member exactly when its label says so.
+
+    :param df_aux: Auxiliary dataset the shadow datasets are sampled from.
+    :type df_aux: pandas.DataFrame
+    :param df_target: Target dataset.
+    :type df_target: pandas.DataFrame
+    :param df_eval: Evaluation pool to draw the reference records from.
+    :type df_eval: pandas.DataFrame
+    :param target_records: Indices of the target records in `df_target`.
+    :type target_records: list
+    :param n_original: Size of each shadow training set.
+    :type n_original: int
+    :param n_datasets: Number of shadow datasets, and again of evaluation datasets.
+    :type n_datasets: int
+    :param seed: Seed of the subset sampling and of the membership assignment.
+    :type seed: int
+
+    :returns: A tuple containing:
+        - the row positions of the shadow training sets (list of tuples),
+        - the shadow membership matrix, of shape (n_datasets, len(target_records)),
+        - the row positions of the evaluation training sets (list of tuples),
+        - the evaluation membership matrix, of shape (n_datasets, len(target_records)).
+    :rtype: tuple
+    """
+    n_targets = len(target_records)
+    if n_targets > n_original:
+        raise ValueError(
+            f"n_original ({n_original}) must be at least the number of target records ({n_targets})"
+        )
+    if len(df_eval) < n_targets:
+        raise ValueError(
+            f"df_eval has {len(df_eval)} records, fewer than the {n_targets} target records to replace"
+        )
+    rng = np.random.default_rng(seed)
+    membership_train = pooled_membership(n_datasets, n_targets, seed=seed)
+    membership_eval = pooled_membership(n_datasets, n_targets, seed=seed + 1)
+    none = np.empty(0, dtype=np.intp)
+    target_pos = df_target.index.get_indexer(list(target_records))
+    others_pos = np.setdiff1d(np.arange(len(df_target)), target_pos)
+
+    rows_train = []
+    for row in membership_train:
+        aux_pos = rng.choice(len(df_aux), size=n_original - row.sum(), replace=False)
+        rows_train.append((aux_pos, target_pos[row], none))
+
+    rows_eval = []
+    for row in membership_eval:
+        ref_pos = rng.choice(len(df_eval), size=(~row).sum(), replace=False)
+        rows_eval.append((none, np.concatenate([others_pos, target_pos[row]]), ref_pos))
+    return rows_train, membership_train, rows_eval, membership_eval
+
+
+def fit_generate_datasets(
+    df_train: pd.DataFrame,
+    meta_data: list,
+    generator_name: str,
+    n_synth: int,
+    seed: int,
+    epsilon: float,
+    n_samples: int = 1,
+    store: DatasetStore = None,
+    transform: Callable = None,
+):
+    """
+    Train one generator on `df_train` and draw `n_samples` synthetic datasets from it (see `Generator.fit_sample`).
+    Runs in a pool worker.
+    With a `store`, datasets already generated from the same training rows, metadata, generator, epsilon, seed and
+    size are loaded instead, and newly generated ones are written to the store right away.
+    With a `transform`, its result on each synthetic dataset is returned instead of the dataset.
+
+    :returns: The synthetic datasets.
+    :rtype: list
+    """
+    synthetic_datasets = None
+    if store is not None:
+        keys = [
+            store.key(
+                generator_name,
+                epsilon,
+                seed,
+                df_train,
+                meta_data,
+                n_synth,
+                i,
+                n_samples,
+            )
+            for i in range(n_samples)
+        ]
+        cached = [store.get(key) for key in keys]
+        if all(d is not None for d in cached):
+            synthetic_datasets = cached
+
+    if synthetic_datasets is None:
+        generator = get_generator(generator_name, epsilon=epsilon)
+        blockPrint()
+        synthetic_datasets = generator.fit_sample(
+            dataset=df_train,
+            metadata=meta_data,
+            size=n_synth,
+            seed=seed,
+            n_samples=n_samples,
+        )
+        enablePrint()
+        if store is not None:
+            for key, synthetic_dataset in zip(keys, synthetic_datasets):
+                store.put(key, synthetic_dataset)
+
+    if transform is not None:
+        return [transform(d) for d in synthetic_datasets]
+    return synthetic_datasets
+
+
+def generate_pooled_datasets(
+    df_aux: pd.DataFrame,
+    df_target: pd.DataFrame,
+    meta_data: list,
+    target_records: list,
+    df_eval: pd.DataFrame,
+    generator_name: str,
+    n_synth: int = 1000,
+    n_original: int = 1000,
+    n_datasets: int = 1000,
+    epsilon: float = 0.0,
+    seed: int = 0,
+    n_workers: int = None,
+    store: DatasetStore = None,
+    samples_per_fit: int = 1,
+    transform: Callable = None,
+    checkpoint: Checkpoint = None,
+    resources: ResourcePolicy = None,
+):
+    """
+    Generate the synthetic datasets of a pooled shadow design (see `pooled_training_sets`).
+
+    Only 2 * n_datasets generators are fitted, however many target records there are: every synthetic dataset is a
+    labelled sample for all target records at once, the label of target `j` in dataset `i` being the entry (i, j) of
+    the corresponding membership matrix.
+    Dataset `i` is generated with seed `i` (shadow) or `n_datasets + i` (evaluation), like `generate_datasets`.
+    With `samples_per_fit` > 1, each generator produces that many consecutive datasets, which share a training set
+    and thus a row of the membership matrix; at least two generators are always fitted for each side.
+
+    :param n_workers: Number of worker processes. Defaults to the number of CPUs.
+    :type n_workers: int
+    :param store: Shadow dataset cache, see `fit_generate_datasets`.
+    :type store: DatasetStore, optional
+    :param samples_per_fit: Number of synthetic datasets drawn from each fitted generator.
+    :type samples_per_fit: int
+    :param transform: Function applied to each synthetic dataset in the worker, with all the target records
+        (see `init_shadow_worker`); its results are returned in place of the synthetic datasets.
+    :type transform: Callable, optional
+    :param checkpoint: Where the result of each task is written as soon as it finishes; tasks already found in it
+        are not run again.
+    :type checkpoint: Checkpoint, optional
+    :param resources: Resource policy of the workers, see `shadow_pool`.
+    :type resources: ResourcePolicy, optional
+
+    The other parameters are the same as for `pooled_training_sets` and `generate_datasets`.
+
+    :returns: A tuple containing:
+        - the synthetic shadow datasets (list of pandas.DataFrame),
+        - the shadow membership matrix, of shape (n_datasets, len(target_records)),
+        - the synthetic evaluation datasets (list of pandas.DataFrame),
+        - the evaluation membership matrix, of shape (n_datasets, len(target_records)).
+    :rtype: tuple
+    """
+    samples_per_fit = effective_samples_per_fit(samples_per_fit, n_datasets)
+    starts = list(range(0, n_datasets, samples_per_fit))
+    counts = [min(samples_per_fit, n_datasets - start) for start in starts]
+    rows_train, membership_train, rows_eval, membership_eval = pooled_training_sets(
+        df_aux=df_aux,
+        df_target=df_target,
+        df_eval=df_eval,
+        target_records=target_records,
+        n_original=n_original,
+        n_datasets=len(starts),
+        seed=seed,
+    )
+    with shadow_pool(
+        df_aux, df_target, df_eval, meta_data, n_workers, store, transform, resources
+    ) as executor:
+        tasks = [
+            (rows, offset + start, count)
+            for offset, training_rows in ((0, rows_train), (n_datasets, rows_eval))
+            for rows, start, count in zip(training_rows, starts, counts)
+        ]
+        results = [None] * len(tasks)
+        futures = {}
+        for i, (rows, task_seed, count) in enumerate(tasks):
+            if checkpoint is not None:
+                found, results[i] = checkpoint.get(f"pooled_{i}")
+                if found:
+                    continue
+            future = executor.submit(
+                generate_from_rows,
+                rows=rows,
+                generator_name=generator_name,
+                n_synth=n_synth,
+                seed=task_seed,
+                epsilon=epsilon,
+                n_samples=count,
+                target_ids=list(target_records),
+            )
+            futures[future] = i
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            if checkpoint is not None:
+                checkpoint.put(f"pooled_{i}", results[i])
+        synthetic_datasets = [d for result in results for d in result]
+    return (
+        synthetic_datasets[:n_datasets],
+        np.repeat(membership_train, counts, axis=0),
+        synthetic_datasets[n_datasets:],
+        np.repeat(membership_eval, counts, axis=0),
     )
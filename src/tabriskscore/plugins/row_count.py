@@ -2,6 +2,11 @@
 
 from typing import Any, Dict
 
+from tabriskscore.adapters.chunked import ChunkedCSV, iter_chunks
+
+# 支持流式：data 里可以是 ChunkedCSV，逐块累加行数
+STREAMING = True
+
 
 def evaluate_privacy(data: Dict[str, Any], config: Dict) -> Dict[str, Any]:
     """
@@ -11,7 +16,10 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> Dict[str, Any]:
     counts: Dict[str, int] = {}
     for name, df in data.items():
         try:
-            counts[name] = df.shape[0]
+            if isinstance(df, ChunkedCSV):
+                counts[name] = sum(len(chunk) for chunk in iter_chunks(df))
+            else:
+                counts[name] = df.shape[0]
         except Exception:
             counts[name] = None
 
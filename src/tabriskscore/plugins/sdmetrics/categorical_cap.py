@@ -1,19 +1,27 @@
+import os
 from typing import Any, Dict, List
 
-import pandas as pd
 from sdmetrics.single_table.privacy import CategoricalCAP
 
+from tabriskscore.core.artifacts import artifacts_from_config
+
+
+def required_artifacts(config: Dict[str, Any]) -> List[tuple]:
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    return [
+        ("csv", os.path.join(sdmetrics_dir, "real.csv")),
+        ("csv", os.path.join(sdmetrics_dir, "synthetic.csv")),
+    ]
+
 
 def evaluate_privacy(
     data: Dict[str, Any], config: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
 
-    real = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/real.csv"
-    )
-    synth = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/synthetic.csv"
-    )
+    artifacts = artifacts_from_config(config)
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    real = artifacts.get("csv", os.path.join(sdmetrics_dir, "real.csv"))
+    synth = artifacts.get("csv", os.path.join(sdmetrics_dir, "synthetic.csv"))
 
     score = CategoricalCAP.compute(
         real_data=real,
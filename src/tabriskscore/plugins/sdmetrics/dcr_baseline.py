@@ -1,26 +1,30 @@
 # src/tabriskscore/plugins/sdmetrics_privacy/dcr_baseline.py
-import json
+import os
 from typing import Any, Dict, List
 
-import pandas as pd
 from sdmetrics.single_table.privacy import DCRBaselineProtection
 
+from tabriskscore.core.artifacts import artifacts_from_config
+
+
+def required_artifacts(config: Dict[str, Any]) -> List[tuple]:
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    return [
+        ("csv", os.path.join(sdmetrics_dir, "real.csv")),
+        ("csv", os.path.join(sdmetrics_dir, "synthetic.csv")),
+        ("json", os.path.join(sdmetrics_dir, "metadata.json")),
+    ]
+
 
 def evaluate_privacy(
     data: Dict[str, Any], config: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
 
-    real = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/real.csv"
-    )  # 按需指定日期列
-    synth = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/synthetic.csv"
-    )
-    with open(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/metadata.json",
-        encoding="utf-8",
-    ) as f:
-        metadata = json.load(f)
+    artifacts = artifacts_from_config(config)
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    real = artifacts.get("csv", os.path.join(sdmetrics_dir, "real.csv"))
+    synth = artifacts.get("csv", os.path.join(sdmetrics_dir, "synthetic.csv"))
+    metadata = artifacts.get("json", os.path.join(sdmetrics_dir, "metadata.json"))
 
     score = DCRBaselineProtection.compute(real, synth, metadata)  # 核心只这一行
 
@@ -1,28 +1,31 @@
-import json
+import os
 from typing import Any, Dict, List
 
-import pandas as pd
 from sdmetrics.single_table.privacy import DCROverfittingProtection
 
+from tabriskscore.core.artifacts import artifacts_from_config
+
+
+def required_artifacts(config: Dict[str, Any]) -> List[tuple]:
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    return [
+        ("csv", os.path.join(sdmetrics_dir, "real_train.csv")),
+        ("csv", os.path.join(sdmetrics_dir, "real_valid.csv")),
+        ("csv", os.path.join(sdmetrics_dir, "synthetic.csv")),
+        ("json", os.path.join(sdmetrics_dir, "metadata.json")),
+    ]
+
 
 def evaluate_privacy(
     data: Dict[str, Any], config: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
 
-    real_train = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/real_train.csv"
-    )
-    valid = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/real_valid.csv"
-    )
-    synth = pd.read_csv(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/synthetic.csv"
-    )
-    with open(
-        "/Users/changlong.ji/Desktop/project/TabRiskScore/data/sdmetrics/metadata.json",
-        encoding="utf-8",
-    ) as f:
-        metadata = json.load(f)
+    artifacts = artifacts_from_config(config)
+    sdmetrics_dir = config.get("sdmetrics_dir", "data/sdmetrics")
+    real_train = artifacts.get("csv", os.path.join(sdmetrics_dir, "real_train.csv"))
+    valid = artifacts.get("csv", os.path.join(sdmetrics_dir, "real_valid.csv"))
+    synth = artifacts.get("csv", os.path.join(sdmetrics_dir, "synthetic.csv"))
+    metadata = artifacts.get("json", os.path.join(sdmetrics_dir, "metadata.json"))
 
     score = DCROverfittingProtection.compute(
         real_data=real_train,
@@ -2,27 +2,44 @@
 
 from typing import Any, Dict
 
-import pandas as pd
+from tabriskscore.adapters.chunked import iter_chunks
+from tabriskscore.core.fingerprint import CopyCounter, RowIndex, row_fingerprints
+
+# 支持流式：只有 Xtrain / Xcontrol 的行指纹常驻内存，Xsyn 逐块比对
+STREAMING = True
 
 
 def evaluate_privacy(data: Dict[str, Any], config: Dict) -> Dict[str, Any]:
     """
     如果 data 中同时包含 'Xsyn' 和 'Xtrain' 两个 DataFrame，
     则统计它们**完全相同**的行有多少条，返回相应指标；否则跳过。
+    如果还有 'Xcontrol'（未参与训练的留出集），同一遍扫描里也和它比对，
+    两个复制率放在一起看：对训练集的复制率明显更高说明生成器在记忆训练数据。
     """
     df_syn = data.get("Xsyn")
     df_train = data.get("Xtrain")
+    df_control = data.get("Xcontrol")
 
     # 只有两个表都存在时才执行
     if df_syn is None or df_train is None:
         return None
 
-    # 方法：把每行当成一个 tuple，用集合交集来算完全相同的行数
+    # 方法：逐列向量化地算出每行的哈希指纹，排序后二分查找匹配
+    # （默认 128 位指纹，碰撞可忽略；fingerprint_bits 设为 64 省内存，但碰撞不会被发现）
     try:
-        set_syn = set(map(tuple, df_syn.values))
-        set_train = set(map(tuple, df_train.values))
-        common = set_syn.intersection(set_train)
-        count = len(common)
+        bits = int(config.get("fingerprint_bits", 128))
+        columns = list(df_train.columns)
+        references = {"train": df_train}
+        if df_control is not None:
+            references["control"] = df_control
+        counters = {
+            name: CopyCounter(RowIndex.from_frames(iter_chunks(df), columns, bits))
+            for name, df in references.items()
+        }
+        for chunk in iter_chunks(df_syn):
+            fps = row_fingerprints(chunk, columns, bits)
+            for counter in counters.values():
+                counter.update(fps)
     except Exception:
         # 如果中途失败，也不要整个流程挂掉，返回一个标记
         return {
@@ -31,4 +48,20 @@ def evaluate_privacy(data: Dict[str, Any], config: Dict) -> Dict[str, Any]:
             "details": {"error": "无法比较行内容"},
         }
 
-    return {"name": "similar_check", "value": count, "details": {"common_rows": count}}
+    train = counters["train"]
+    details = {
+        "common_rows": train.common,
+        "copied_rows": train.n_copied,
+        "copy_rate": train.copy_rate,
+        "max_copies": int(train.copies.max()) if len(train.copies) else 0,
+    }
+    if "control" in counters:
+        control = counters["control"]
+        details.update(
+            {
+                "control_common_rows": control.common,
+                "control_copied_rows": control.n_copied,
+                "control_copy_rate": control.copy_rate,
+            }
+        )
+    return {"name": "similar_check", "value": train.common, "details": details}
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from tabriskscore.plugins.lnb.distance import compute_achilles, compute_achilles_seq
+
+CATEGORICAL = ["workclass", "education"]
+CONTINUOUS = ["age", "hours"]
+META_DATA = [
+    {"name": "workclass", "type": "finite", "representation": ["0", "1", "2"]},
+    {"name": "education", "type": "finite", "representation": ["0", "1", "2", "3"]},
+    {"name": "age", "type": "interval"},
+    {"name": "hours", "type": "interval"},
+]
+
+
+def _frame(n=60):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "workclass": rng.choice(["0", "1", "2"], n),
+            "education": rng.choice(["0", "1", "2", "3"], n),
+            "age": rng.random(n),
+            "hours": rng.random(n),
+        },
+        index=np.arange(100, 100 + n),
+    )
+
+
+def test_blocked_and_sharded_achilles_match_sequential():
+    df = _frame()
+    expected = compute_achilles_seq(df, CATEGORICAL, CONTINUOUS, META_DATA, 5)
+
+    for block_size, n_workers in ((None, 1), (7, 1), (7, 2)):
+        scores = compute_achilles(
+            df,
+            CATEGORICAL,
+            CONTINUOUS,
+            META_DATA,
+            5,
+            block_size=block_size,
+            n_workers=n_workers,
+        )
+
+        np.testing.assert_allclose(scores, [expected[i] for i in df.index], atol=1e-12)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from tabriskscore.adapters.chunked import ChunkedCSV
+from tabriskscore.adapters.csv import load_csv, sidecar_path
+
+
+def _write_csv(tmp_path):
+    path = tmp_path / "data" / "train.csv"
+    path.parent.mkdir()
+    pd.DataFrame(
+        {
+            "age": [39, 50, 38, 53],
+            "workclass": ["State-gov", "Self-emp", None, "Private"],
+            "hours": [40.0, 13.5, np.nan, 40.0],
+            "flag": [True, False, True, True],
+        }
+    ).to_csv(path, index=False)
+    return str(path)
+
+
+def test_load_csv_same_dtypes_with_and_without_sidecar(tmp_path):
+    path = _write_csv(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    expected = load_csv(path, use_cache=False)
+
+    first = load_csv(path, cache_dir=cache_dir)
+    cached = load_csv(path, cache_dir=cache_dir)
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(cached, expected)
+    # string columns stay writable and comparable with other tables
+    cached.loc[0, "workclass"] = "Never-worked"
+    assert (first["workclass"] == expected["workclass"]).sum() == 3
+
+
+def test_sidecar_lives_in_cache_dir(tmp_path):
+    path = _write_csv(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    load_csv(path, cache_dir=cache_dir)
+
+    assert sorted(p.name for p in (tmp_path / "data").iterdir()) == ["train.csv"]
+    assert sidecar_path(path, cache_dir).startswith(cache_dir)
+
+
+def test_chunks_match_full_load(tmp_path):
+    path = _write_csv(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    expected = load_csv(path, use_cache=False)
+    load_csv(path, cache_dir=cache_dir)
+
+    chunks = list(ChunkedCSV(path, chunk_size=3, cache_dir=cache_dir))
+
+    assert [len(c) for c in chunks] == [3, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
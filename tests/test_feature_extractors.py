@@ -0,0 +1,92 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from tabriskscore.plugins.lnb.feature_extractors import (
+    apply_feature_extractor_to_datasets,
+    feature_pool,
+    fit_ohe,
+    get_queries,
+)
+
+CATEGORICAL = ["workclass", "education"]
+CONTINUOUS = ["age"]
+META_DATA = [
+    {"name": "workclass", "type": "finite", "representation": ["0", "1", "2"]},
+    {"name": "education", "type": "finite", "representation": ["0", "1", "2", "3"]},
+    {"name": "age", "type": "interval"},
+]
+
+
+def _frame(rng, n):
+    return pd.DataFrame(
+        {
+            "workclass": rng.choice(["0", "1", "2"], n),
+            "education": rng.choice(["0", "1", "2", "3"], n),
+            "age": rng.random(n),
+        }
+    )
+
+
+def test_parallel_features_match_sequential():
+    rng = np.random.default_rng(0)
+    ohe, ohe_column_names = fit_ohe(_frame(rng, 50), CATEGORICAL, META_DATA)
+    target_record = _frame(rng, 1)
+    datasets_train = [(_frame(rng, 30), k % 2) for k in range(4)]
+    datasets_eval = [(_frame(rng, 30), k % 2) for k in range(4)]
+    args = (
+        datasets_train,
+        datasets_eval,
+        target_record,
+        ohe,
+        CATEGORICAL,
+        ohe_column_names,
+        CONTINUOUS,
+    )
+
+    expected = apply_feature_extractor_to_datasets(*args, n_workers=1)
+    parallel = apply_feature_extractor_to_datasets(*args, n_workers=2)
+    with feature_pool(ohe, CATEGORICAL, ohe_column_names, CONTINUOUS, 2) as pool:
+        pooled = apply_feature_extractor_to_datasets(*args, n_workers=2, executor=pool)
+
+    for result in (parallel, pooled):
+        assert [r[1:] for r in result] == [r[1:] for r in expected]
+        for (features, *_), (expected_features, *_) in zip(result, expected):
+            pd.testing.assert_frame_equal(features, expected_features)
+
+
+def _all_queries(orders, categorical_indices, num_cols):
+    queries = set()
+    for order in orders:
+        for columns in itertools.combinations(range(num_cols), order):
+            options = [
+                (-1, 1) if c in categorical_indices else (3, -3) for c in columns
+            ]
+            for conditions in itertools.product(*options):
+                query = [0] * num_cols
+                for c, cond in zip(columns, conditions):
+                    query[c] = cond
+                queries.add(tuple(query))
+    return queries
+
+
+def test_get_queries_enumerates_everything_when_number_exceeds_total():
+    expected = _all_queries([1, 2, 3], [0, 2], 5)
+
+    queries = get_queries([1, 2, 3], [0, 2], [1, 3, 4], 5, number=len(expected))
+
+    assert len(queries) == len(expected)
+    assert set(queries) == expected
+    assert get_queries([1, 2, 3], [0, 2], [1, 3, 4], 5, number=10**6) == queries
+
+
+def test_get_queries_sample_is_reproducible():
+    space = _all_queries([2, 3], [0, 1, 4], 6)
+
+    queries = get_queries([2, 3], [0, 1, 4], [2, 3, 5], 6, number=50, random_state=7)
+
+    assert len(set(queries)) == 50
+    assert set(queries) <= space
+    assert get_queries([2, 3], [0, 1, 4], [2, 3, 5], 6, 50, random_state=7) == queries
+    assert get_queries([2, 3], [0, 1, 4], [2, 3, 5], 6, 50, random_state=8) != queries
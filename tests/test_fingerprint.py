@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from tabriskscore.core.fingerprint import (
+    CopyCounter,
+    RowIndex,
+    match_rows,
+    row_fingerprints,
+)
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+
+    def frame(n):
+        return pd.DataFrame(
+            {
+                "age": rng.integers(30, 34, n),
+                "sex": rng.choice(["F", "M"], n),
+                "hours": rng.choice([20.0, 40.0], n),
+            }
+        )
+
+    return frame(40), frame(60)
+
+
+def _rows(df):
+    return list(df.itertuples(index=False, name=None))
+
+
+def test_match_rows_agrees_with_set_of_tuples():
+    train, syn = _frames()
+    train_rows = _rows(train)
+
+    result = match_rows(syn, train)
+
+    assert result["common"] == len(set(train_rows) & set(_rows(syn)))
+    assert result["query_matched"].tolist() == [
+        r in set(train_rows) for r in _rows(syn)
+    ]
+    assert result["reference_copies"].tolist() == [
+        _rows(syn).count(r) for r in train_rows
+    ]
+
+
+def test_copy_counter_by_chunks_agrees_with_set_of_tuples():
+    train, syn = _frames()
+    train_rows = set(_rows(train))
+    # the same values with other dtypes are still the same rows
+    syn = syn.astype({"age": "float64", "sex": "category"})
+
+    for bits in (64, 128):
+        counter = CopyCounter(
+            RowIndex.from_frames([train[:25], train[25:]], list(train.columns), bits)
+        )
+        for start in range(0, len(syn), 16):
+            counter.update(
+                row_fingerprints(syn[start : start + 16], list(train.columns), bits)
+            )
+
+        assert counter.common == len(train_rows & set(_rows(syn)))
+        assert counter.n_copied == sum(r in train_rows for r in _rows(syn))
+        assert counter.n_query == len(syn)
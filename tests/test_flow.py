@@ -0,0 +1,42 @@
+import textwrap
+import time
+
+from tabriskscore.orchestrator.flow import run_all
+
+PLUGINS = {
+    # finishes after "last", so the results must not come back in completion order
+    "first": """
+        import time
+
+        def evaluate_privacy(data, config):
+            time.sleep(0.5)
+            return {"name": "first", "value": 1, "details": {}}
+    """,
+    "sleepy": """
+        import time
+
+        def evaluate_privacy(data, config):
+            time.sleep(60)
+            return {"name": "sleepy", "value": 2, "details": {}}
+    """,
+    "last": """
+        def evaluate_privacy(data, config):
+            return [
+                {"name": "last_a", "value": 3, "details": {}},
+                {"name": "last_b", "value": 4, "details": {}},
+            ]
+    """,
+}
+
+
+def test_timeout_keeps_other_plugins_in_registry_order(tmp_path, monkeypatch):
+    for name, source in PLUGINS.items():
+        (tmp_path / f"flow_plugin_{name}.py").write_text(textwrap.dedent(source))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    plugins = {name: f"flow_plugin_{name}" for name in PLUGINS}
+
+    start = time.monotonic()
+    results = run_all({}, {}, jobs=3, timeout=2, plugins=plugins)
+
+    assert time.monotonic() - start < 30
+    assert [r["name"] for r in results] == ["first", "last_a", "last_b"]
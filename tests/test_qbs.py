@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from optimqbs import qbs
+
+OPERATORS = [-3, -2, -1, 0, 0, 0, 1, 2, 3]
+
+
+def _dataset(rng, n=300):
+    return np.column_stack(
+        [
+            rng.integers(0, 3, n),
+            rng.integers(-2, 5, n),
+            rng.integers(0, 1000, n),
+            np.full(n, 7),
+            rng.integers(0, 2, n),
+        ]
+    ).astype(np.intc)
+
+
+def _queries(rng, dataset, n=500):
+    conditions = rng.choice(OPERATORS, (n, dataset.shape[1])).astype(np.intc)
+    # half the values are records of the dataset, so that many counts are not 0
+    values = dataset[rng.integers(0, len(dataset), n)]
+    values[::2] = rng.integers(-1, 8, (len(values[::2]), dataset.shape[1]))
+    return values, conditions
+
+
+def _count(dataset, values, conditions):
+    compare = {
+        1: np.equal,
+        -1: np.not_equal,
+        2: np.greater,
+        3: np.greater_equal,
+        -2: np.less,
+        -3: np.less_equal,
+    }
+    answers = []
+    for value, condition in zip(values, conditions):
+        match = np.ones(len(dataset), dtype=bool)
+        for a, (v, c) in enumerate(zip(value, condition)):
+            if c:
+                match &= compare[c](dataset[:, a], v)
+        answers.append(int(match.sum()))
+    return answers
+
+
+def test_buffer_and_list_construction_agree():
+    rng = np.random.default_rng(0)
+    dataset = _dataset(rng)
+    values, conditions = _queries(rng, dataset)
+    expected = _count(dataset, values, conditions)
+
+    # the list interface takes tuples
+    value_tuples = [tuple(v) for v in values.tolist()]
+    condition_tuples = [tuple(c) for c in conditions.tolist()]
+    from_list = qbs.SimpleQBS([tuple(row) for row in dataset.tolist()])
+    assert from_list.query(value_tuples, condition_tuples) == expected
+    for data in (dataset, dataset.astype(np.float64), pd.DataFrame(dataset)):
+        from_buffer = qbs.SimpleQBS(data)
+
+        assert from_buffer.query(values, conditions).tolist() == expected
+        assert from_buffer.query(value_tuples, condition_tuples) == expected
+
+    with pytest.raises(ValueError):
+        qbs.SimpleQBS(dataset + 0.5)
+
+
+@pytest.mark.parametrize(
+    "cls, kwargs",
+    [
+        (qbs.SimpleQBS, {}),
+        (qbs.SimpleQBS, {"bucket_threshold": 2, "noise_scale": 3.0, "seed": 3}),
+        (qbs.TableBuilder, {"seed": 2}),
+        (qbs.DPLaplace, {"epsilon": 1.0, "seed": 5}),
+    ],
+)
+def test_bitmap_index_answers_match_scan(cls, kwargs):
+    rng = np.random.default_rng(1)
+    dataset = _dataset(rng)
+    values, conditions = _queries(rng, dataset)
+    budgets = rng.uniform(0.1, 1, len(values)) if cls is qbs.DPLaplace else None
+    users = np.arange(0, len(dataset), 15)
+
+    try:
+        for num_threads in (1, 3):
+            qbs.set_num_threads(num_threads)
+            scan = cls(dataset, **kwargs)
+            expected = scan.query(values, conditions, budgets)
+            expected_structured = scan.structured_query(
+                users, conditions[:20], None if budgets is None else budgets[:20]
+            )
+            for bitmap_index in (1, 8, 64):
+                indexed = cls(dataset, bitmap_index=bitmap_index, **kwargs)
+
+                assert (indexed.query(values, conditions, budgets) == expected).all()
+                assert (
+                    indexed.structured_query(
+                        users,
+                        conditions[:20],
+                        None if budgets is None else budgets[:20],
+                    )
+                    == expected_structured
+                ).all()
+    finally:
+        qbs.set_num_threads(1)